@@ -42,6 +42,15 @@ class CreatePromptBody(BaseModel):
     is_active: Optional[bool] = False
 
 
+class InvalidateCacheBody(BaseModel):
+    hash_code: Optional[str] = None
+    audit_type: Optional[AuditTypeEnum] = None
+
+
+class InvalidateCacheResponse(BaseModel):
+    invalidated: int
+
+
 class PromptGroupedResponse(BaseModel):
     result: dict[str, dict[str, list[PromptSchema]]]
 
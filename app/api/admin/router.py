@@ -13,6 +13,8 @@ from .interface import (
     AdminQuerySearch,
     AdminUserPermissionSearch,
     CreatePromptBody,
+    InvalidateCacheBody,
+    InvalidateCacheResponse,
     PromptsResponse,
     UpdatePermissionsBody,
     UpdatePromptBody,
@@ -112,6 +114,19 @@ class AdminRouter(APIRouter):
                 )
             ],
         )
+        self.add_api_route(
+            "/cache/invalidate",
+            self.invalidate_cache,
+            methods=["POST"],
+            dependencies=[
+                Depends(
+                    Authentication(
+                        required_role=RoleEnum.APP_FIRST_PARTY,
+                        delegated_scope=AuthScopeEnum.ADMIN,
+                    )
+                )
+            ],
+        )
         self.add_api_route(
             "/audit/{id}",
             self.get_audit,
@@ -216,6 +231,16 @@ class AdminRouter(APIRouter):
             status_code=status.HTTP_202_ACCEPTED,
         )
 
+    async def invalidate_cache(self, body: Annotated[InvalidateCacheBody, Body()]):
+        admin_service = AdminService()
+
+        invalidated = await admin_service.invalidate_audit_cache(body=body)
+
+        return Response(
+            InvalidateCacheResponse(invalidated=invalidated).model_dump_json(),
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+
     async def get_audit(self, id: str):
         admin_service = AdminService()
 
@@ -3,7 +3,16 @@ from tortoise.expressions import Q
 from tortoise.transactions import in_transaction
 
 from app.api.audit.service import AuditService
-from app.db.models import App, Audit, Auth, Permission, Prompt, User
+from app.api.pipeline.prompt_registry import prompt_registry
+from app.db.models import (
+    App,
+    Audit,
+    Auth,
+    IntermediateResponse,
+    Permission,
+    Prompt,
+    User,
+)
 from app.utils.logger import get_logger
 from app.utils.schema.dependencies import AuthState
 from app.utils.schema.models import (
@@ -19,6 +28,7 @@ from .interface import (
     AdminUserPermission,
     AuditWithChildren,
     CreatePromptBody,
+    InvalidateCacheBody,
     UpdatePermissionsBody,
     UpdatePromptBody,
 )
@@ -177,6 +187,8 @@ class AdminService:
             if prompt_demote:
                 await prompt_demote.save()
 
+        await prompt_registry.notify(prompt.audit_type)
+
     async def add_prompt(self, body: CreatePromptBody) -> Prompt:
         prompt = Prompt(
             audit_type=body.audit_type.value,
@@ -203,8 +215,42 @@ class AdminService:
             if prompt_demote:
                 await prompt_demote.save()
 
+        await prompt_registry.notify(prompt.audit_type)
+
         return prompt
 
+    async def invalidate_audit_cache(self, body: InvalidateCacheBody) -> int:
+        """
+        Drop cache keys so matching audits, and their memoized candidate responses,
+        are no longer reused by the pipeline. Without filters, the entire cache is
+        invalidated. Returns the number of audits invalidated.
+        """
+        filter = {}
+        if body.hash_code:
+            filter["contract__hash_code"] = body.hash_code
+        if body.audit_type:
+            filter["audit_type"] = body.audit_type
+
+        ids = await Audit.filter(**filter, cache_key__isnull=False).values_list(
+            "id", flat=True
+        )
+        if ids:
+            await Audit.filter(id__in=ids).update(cache_key=None)
+
+        memo_filter = {f"audit__{k}": v for k, v in filter.items()}
+        memo_ids = await IntermediateResponse.filter(
+            **memo_filter, cache_key__isnull=False
+        ).values_list("id", flat=True)
+        if memo_ids:
+            await IntermediateResponse.filter(id__in=memo_ids).update(cache_key=None)
+
+        logger.info(
+            "invalidated audit cache",
+            extra={"count": len(ids), "memoized_count": len(memo_ids)},
+        )
+
+        return len(ids)
+
     async def get_audit_children(self, id: str):
 
         audit_service = AuditService()
@@ -225,9 +271,7 @@ class AdminService:
         for finding in audit.findings:
             findings.append(FindingSchema.from_tortoise(finding))
 
-        result = None
-        if audit.raw_output:
-            result = audit_service.sanitize_data(audit=audit, as_markdown=True)
+        result = await audit_service.get_markdown(audit)
 
         audit_response = AuditWithChildren(
             id=audit.id,
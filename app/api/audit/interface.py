@@ -27,6 +27,12 @@ class CreateEvalResponse(IdResponse):
     status: AuditStatusEnum = Field(description="initial status of created audit")
 
 
+class QuoteResponse(BaseModel):
+    input_tokens: int = Field(description="prompt tokens the audit is expected to use")
+    output_tokens: int = Field(description="upper bound of completion tokens")
+    credits: int = Field(description="credits the audit is expected to consume")
+
+
 class FeedbackBody(BaseModel):
     feedback: Optional[str] = Field(default=None)
     verified: bool
@@ -8,6 +8,7 @@ from .interface import (
     AuditsResponse,
     CreateEvalResponse,
     GetAuditStatusResponse,
+    QuoteResponse,
 )
 
 CREATE_AUDIT = OpenApiParams(
@@ -16,9 +17,24 @@ CREATE_AUDIT = OpenApiParams(
 Initializes an AI smart contract audit. `contract_id` is the referenced contract obtained
 from [`POST /contract`](/docs#tag/contract/operation/upload_contract_contract__post).
 `audit_type` is of type `AuditTypeEnum`.\n\n
-Note, that this **consumes credits**.
+Note, that this **consumes credits**, and is rejected if the audit's [quote](/docs#tag/audit/operation/get_quote_audit_quote_post)
+exceeds the remaining credits.
         """,
     response_model=CreateEvalResponse,
+    responses={
+        401: {"model": ErrorResponse},
+        402: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+    },
+)
+
+GET_AUDIT_QUOTE = OpenApiParams(
+    summary="Quote AI eval",
+    description="""
+Quotes the credits an AI eval of `contract_id` would consume, given its source and the current prompts. Tokens
+are counted locally, no eval is created. `output_tokens` is an upper bound, so the quote is too.
+        """,
+    response_model=QuoteResponse,
     responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
 )
 
@@ -1,5 +1,6 @@
 from typing import Annotated
 
+from arq.connections import ArqRedis
 from fastapi import (
     APIRouter,
     Body,
@@ -12,7 +13,7 @@ from fastapi import (
 )
 from tortoise.exceptions import DoesNotExist
 
-from app.api.dependencies import Authentication, RequireCredits
+from app.api.dependencies import Authentication, RequireCredits, get_job_pool
 from app.utils.constants.openapi_tags import AUDIT_TAG
 from app.utils.schema.shared import BooleanResponse
 from app.utils.types.enums import RoleEnum
@@ -21,6 +22,7 @@ from .interface import EvalBody, FeedbackBody, FilterParams
 from .openapi import (
     CREATE_AUDIT,
     GET_AUDIT,
+    GET_AUDIT_QUOTE,
     GET_AUDIT_STATUS,
     GET_AUDITS,
     SUBMIT_FEEDBACK,
@@ -38,10 +40,17 @@ class AuditRouter(APIRouter):
             methods=["POST"],
             dependencies=[
                 Depends(Authentication(required_role=RoleEnum.USER)),
-                Depends(RequireCredits()),
+                Depends(RequireCredits(quote_audit=True)),
             ],
             **CREATE_AUDIT,
         )
+        self.add_api_route(
+            "/quote",
+            self.get_quote,
+            methods=["POST"],
+            dependencies=[Depends(Authentication(required_role=RoleEnum.USER))],
+            **GET_AUDIT_QUOTE,
+        )
         self.add_api_route(
             "/list",
             self.list_audits,
@@ -80,13 +89,19 @@ class AuditRouter(APIRouter):
         self,
         request: Request,
         body: Annotated[EvalBody, Body()],
+        job_pool: Annotated[ArqRedis, Depends(get_job_pool)],
     ):
         audit_service = AuditService()
         response = await audit_service.process_evaluation(
-            auth=request.state.auth, data=body
+            auth=request.state.auth, data=body, job_pool=job_pool
         )
         return Response(response.model_dump_json(), status_code=status.HTTP_201_CREATED)
 
+    async def get_quote(self, body: Annotated[EvalBody, Body()]):
+        audit_service = AuditService()
+        response = await audit_service.get_quote(data=body)
+        return Response(response.model_dump_json(), status_code=status.HTTP_200_OK)
+
     async def list_audits(
         self,
         request: Request,
@@ -1,13 +1,13 @@
-import json
 import math
-import re
 
-from arq import create_pool
+from arq.connections import ArqRedis
 from fastapi import HTTPException, status
 from tortoise.timezone import now
 
-from app.config import redis_settings
+from app.api.pricing.estimator import quote_estimator
+from app.api.pricing.service import Usage
 from app.db.models import Audit, Contract, Finding
+from app.utils.helpers.findings_parser import decode_findings
 from app.utils.schema.dependencies import AuthState
 from app.utils.schema.models import (
     ContractSchema,
@@ -15,9 +15,12 @@ from app.utils.schema.models import (
     IntermediateResponseSchema,
     UserSchema,
 )
+from app.utils.schema.output import GasOutputStructure, SecurityOutputStructure
+from app.utils.templates import template_version
 from app.utils.templates.gas import gas_template
 from app.utils.templates.security import security_template
 from app.utils.types.enums import AuditTypeEnum, RoleEnum
+from app.worker.queues import audit_owner, fair_share, route_audit
 
 from .interface import (
     AuditMetadata,
@@ -28,6 +31,7 @@ from .interface import (
     FeedbackBody,
     FilterParams,
     GetAuditStatusResponse,
+    QuoteResponse,
 )
 
 
@@ -114,9 +118,7 @@ class AuditService:
             .prefetch_related("findings")
         )
 
-        result = None
-        if audit.raw_output:
-            result = self.sanitize_data(audit=audit, as_markdown=True)
+        result = await self.get_markdown(audit)
 
         findings = list(map(FindingSchema.from_tortoise, audit.findings))
         contract = ContractSchema.from_tortoise(audit.contract)
@@ -183,27 +185,40 @@ class AuditService:
         return True
 
     def sanitize_data(self, audit: Audit, as_markdown: bool):
-        # sanitizing backslashes/escapes for code blocks
-        pattern = r"<<(.*?)>>"
+        output_structure = (
+            GasOutputStructure
+            if audit.audit_type == AuditTypeEnum.GAS
+            else SecurityOutputStructure
+        )
+        parsed = decode_findings(audit.raw_output, output_structure)
 
-        # this parsing should not be required, but we'll include it for safety
-        raw_data = re.sub(pattern, r"`\1`", audit.raw_output)
+        if as_markdown:
+            return self.parse_branded_markdown(audit=audit, findings=parsed)
 
-        # corrects for occassional leading non-json text...
-        pattern = r"\{.*\}"
-        match = re.search(pattern, raw_data, re.DOTALL)
-        if match:
-            raw_data = match.group(0)
+        return parsed.model_dump()
 
-        parsed = json.loads(raw_data)
+    def render_markdown(self, audit: Audit):
+        """Renders the report onto the audit, for the caller to save."""
+        audit.markdown = self.sanitize_data(audit=audit, as_markdown=True)
+        audit.markdown_version = template_version
 
-        if as_markdown:
-            parsed = self.parse_branded_markdown(audit=audit, findings=parsed)
+    async def get_markdown(self, audit: Audit) -> str | None:
+        """
+        The report, as rendered when the audit completed. Reports rendered with an
+        older template version, or never rendered, are rendered and stored once.
+        """
+        if not audit.raw_output:
+            return None
 
-        return parsed
+        if audit.markdown is None or audit.markdown_version != template_version:
+            self.render_markdown(audit)
+            await audit.save(update_fields=["markdown", "markdown_version"])
 
-    def parse_branded_markdown(self, audit: Audit, findings: dict) -> str:
-        # See if i can cast it back to the expected Pydantic struct.
+        return audit.markdown
+
+    def parse_branded_markdown(
+        self, audit: Audit, findings: GasOutputStructure | SecurityOutputStructure
+    ) -> str:
         template_use = (
             gas_template if audit.audit_type == AuditTypeEnum.GAS else security_template
         )
@@ -212,36 +227,51 @@ class AuditService:
         formatter = {
             "address": audit.contract.address,
             "date": audit.created_at.strftime("%Y-%m-%d"),
-            "introduction": findings["introduction"],
-            "scope": findings["scope"],
-            "conclusion": findings["conclusion"],
+            "introduction": findings.introduction,
+            "scope": findings.scope,
+            "conclusion": findings.conclusion,
         }
 
-        pattern = r"<<(.*?)>>"
-
-        for k, v in findings["findings"].items():
+        for k, v in findings.findings:
             key = f"findings_{k}"
             finding_str = ""
             if not v:
                 finding_str = "None Identified"
             else:
                 for finding in v:
-                    name = re.sub(pattern, r"`\1`", finding["name"])
-                    explanation = re.sub(pattern, r"`\1`", finding["explanation"])
-                    recommendation = re.sub(pattern, r"`\1`", finding["recommendation"])
-                    reference = re.sub(pattern, r"`\1`", finding["reference"])
-
-                    finding_str += f"**{name}**\n"
-                    finding_str += f"- **Explanation**: {explanation}\n"
-                    finding_str += f"- **Recommendation**: {recommendation}\n"
-                    finding_str += f"- **Code Reference**: {reference}\n\n"
+                    finding_str += f"**{finding.name}**\n"
+                    finding_str += f"- **Explanation**: {finding.explanation}\n"
+                    finding_str += f"- **Recommendation**: {finding.recommendation}\n"
+                    finding_str += f"- **Code Reference**: {finding.reference}\n\n"
 
             formatter[key] = finding_str.strip()
 
         return result.format(**formatter)
 
+    async def get_quote(self, data: EvalBody) -> QuoteResponse:
+        contract = await Contract.get_or_none(id=data.contract_id)
+        if not contract:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=(
+                    "you must provide a valid internal contract_id, "
+                    "call POST /contract first"
+                ),
+            )
+
+        quote = await quote_estimator.quote(contract, data.audit_type)
+
+        return QuoteResponse(
+            input_tokens=quote["input_tokens"],
+            output_tokens=quote["output_tokens"],
+            credits=Usage.estimate_pricing(
+                input_tokens=quote["input_tokens"],
+                output_tokens=quote["output_tokens"],
+            ),
+        )
+
     async def process_evaluation(
-        self, auth: AuthState, data: EvalBody
+        self, auth: AuthState, data: EvalBody, job_pool: ArqRedis
     ) -> CreateEvalResponse:
         if not await Contract.exists(id=data.contract_id):
             raise HTTPException(
@@ -261,13 +291,15 @@ class AuditService:
             audit_type=audit_type,
         )
 
-        redis_pool = await create_pool(redis_settings)
+        queue = route_audit(auth)
 
         # the job_id is guaranteed to be unique, make it align with the audit.id
         # for simplicitly.
-        await redis_pool.enqueue_job(
+        await job_pool.enqueue_job(
             "process_eval",
             _job_id=str(audit.id),
+            _queue_name=queue,
+            _defer_until=await fair_share.schedule(queue, audit_owner(auth)),
         )
 
         return CreateEvalResponse(id=audit.id, status=audit.status)
@@ -1,11 +1,13 @@
-from arq import create_pool
-from fastapi import APIRouter, Response, status
+from typing import Annotated
+
+from arq.connections import ArqRedis
+from fastapi import APIRouter, Depends, Response, status
 from fastapi.openapi.docs import get_redoc_html
 from fastapi.responses import JSONResponse, RedirectResponse
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from tortoise import Tortoise
 
-from app.config import redis_settings
+from app.api.dependencies import get_job_pool
 
 
 class BaseRouter(APIRouter):
@@ -29,9 +31,8 @@ class BaseRouter(APIRouter):
         except Exception as e:
             return JSONResponse({"ok": False, "error": str(e)})
 
-    async def test(self):
-        redis_pool = await create_pool(redis_settings)
-        job = await redis_pool.enqueue_job(
+    async def test(self, job_pool: Annotated[ArqRedis, Depends(get_job_pool)]):
+        job = await job_pool.enqueue_job(
             "mock",
         )
 
@@ -1,5 +1,9 @@
+import asyncio
+
 import httpx
+from web3 import Web3
 
+from app.config import detect_networks
 from app.lib.clients import ExplorerClient, Web3Client
 from app.utils.helpers.code_parser import SourceCodeParser
 from app.utils.logger import get_logger
@@ -9,6 +13,8 @@ logger = get_logger("api")
 
 
 class BlockchainService:
+    # seconds, networks that don't answer by then are kept.
+    DETECTION_TIMEOUT = 5
 
     async def get_gas(self) -> dict:
         explorer_client = ExplorerClient()
@@ -55,11 +61,44 @@ class BlockchainService:
                 obj["code"] = parser.source if parser.source != "" else None
                 obj["contract_name"] = parser.contract_name
                 obj["is_proxy"] = parser.is_proxy
+            elif isinstance(result, str):
+                # ie. still rate limited after retrying, rather than not found.
+                logger.warning(f"explorer error on {network} for {address}: {result}")
         except Exception as err:
             logger.exception(err)
         finally:
             return obj
 
+    async def get_networks_with_code(
+        self, address: str, networks: list[NetworkEnum]
+    ) -> list[NetworkEnum]:
+        """
+        Narrows the networks down to those the address has bytecode on, with an
+        eth_getCode call to each network's RPC provider, so that only their
+        explorers are queried for its source code. Networks that can't be checked
+        are kept.
+        """
+        if not detect_networks or not Web3.is_address(address):
+            return networks
+
+        async def has_code(network: NetworkEnum) -> bool:
+            web3_client = Web3Client(network=network)
+            return await asyncio.wait_for(
+                web3_client.has_code(address), timeout=self.DETECTION_TIMEOUT
+            )
+
+        results = await asyncio.gather(*map(has_code, networks), return_exceptions=True)
+
+        detected = []
+        for network, result in zip(networks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"unable to detect code on {network}: {result}")
+            if result is not False:
+                detected.append(network)
+
+        logger.info(f"detected code for {address} on {detected}")
+        return detected
+
     async def get_credits(self, address: str) -> float:
         """
         Call the apiCredit contract directly.
@@ -68,15 +68,22 @@ class ContractService:
         if network:
             networks_scan = [network]
         else:
-            networks_scan = networks_by_type[NetworkTypeEnum.MAINNET]
+            # copied, rather than extending the mapper's list.
+            networks_scan = list(networks_by_type[NetworkTypeEnum.MAINNET])
             if self.allow_testnet:
                 networks_scan += networks_by_type[NetworkTypeEnum.TESTNET]
 
+        blockchain_service = BlockchainService()
+        if not network:
+            # usually deployed on a single one, skips the other explorers.
+            networks_scan = await blockchain_service.get_networks_with_code(
+                address=address, networks=networks_scan
+            )
+
         # Rather than calling these sequentially and breaking, we'll call them all.
         # For example, USDC contract on ETH mainnet is an address on BASE, so it early
         # exits without finding source code...
         tasks = []
-        blockchain_service = BlockchainService()
         async with httpx.AsyncClient() as client:
             for network in networks_scan:
                 tasks.append(
@@ -7,11 +7,21 @@ used without explicitly needing to whitelist / blacklist routes.
 from datetime import datetime
 from typing import Annotated, Optional
 
+from arq.connections import ArqRedis
 from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-
-from app.config import redis_client
-from app.db.models import Auth, User
+from redis.asyncio import BlockingConnectionPool
+
+from app.api.audit.interface import EvalBody
+from app.api.pricing.estimator import quote_estimator
+from app.api.pricing.service import Usage
+from app.config import (
+    job_pool_size,
+    job_pool_timeout,
+    redis_client,
+    redis_settings,
+)
+from app.db.models import Auth, Contract, User
 from app.utils.logger import get_logger, state_var
 from app.utils.schema.dependencies import AuthState
 from app.utils.types.enums import AppTypeEnum, AuthScopeEnum, ClientTypeEnum, RoleEnum
@@ -274,10 +284,32 @@ class RequireCredits:
     Dependency that dictates whether credits are required to take an action.
     Requires authentication, as we rely on the request.state.auth object to
     be injected into the request.
+
+    With `quote_audit`, the body is an EvalBody, and the audit's quote must be
+    affordable, so that no LLM work is queued for an audit that can't be paid for.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, quote_audit: bool = False):
+        self.quote_audit = quote_audit
+
+    async def get_cost(self, request: Request) -> int:
+        if not self.quote_audit:
+            return 0
+
+        try:
+            body = EvalBody.model_validate(await request.json())
+        except ValueError:
+            # rejected by the route's own validation.
+            return 0
+
+        contract = await Contract.get_or_none(id=body.contract_id)
+        if not contract:
+            return 0
+
+        quote = await quote_estimator.quote(contract, body.audit_type)
+        return Usage.estimate_pricing(
+            input_tokens=quote["input_tokens"], output_tokens=quote["output_tokens"]
+        )
 
     async def __call__(self, request: Request) -> None:
         if not request.state.auth:
@@ -290,9 +322,9 @@ class RequireCredits:
 
         if auth.credit_consumer_user_id:
             user = await User.get(id=auth.credit_consumer_user_id)
-            if user.total_credits > 0:
-                if user.used_credits < user.total_credits:
-                    return
+            remaining = user.total_credits - user.used_credits
+            if remaining > 0 and remaining >= await self.get_cost(request):
+                return
 
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
@@ -331,3 +363,26 @@ class RateLimit:
 
         await redis_client.rpush(redis_key, current_time)
         await redis_client.expire(redis_client, self.WINDOW_SECONDS)
+
+
+def create_job_pool(**connection_kwargs) -> ArqRedis:
+    """
+    The arq pool the API enqueues jobs on, shared for the lifetime of the app. Its
+    connections are capped, requests wait for a free one rather than opening more.
+    """
+    pool = BlockingConnectionPool(
+        host=redis_settings.host,
+        port=redis_settings.port,
+        username=redis_settings.username,
+        password=redis_settings.password,
+        socket_connect_timeout=redis_settings.conn_timeout,
+        max_connections=job_pool_size,
+        timeout=job_pool_timeout,
+        **connection_kwargs,
+    )
+    return ArqRedis(pool)
+
+
+async def get_job_pool(request: Request) -> ArqRedis:
+    """Dependency that injects the arq pool created on startup."""
+    return request.app.state.job_pool
@@ -1,34 +1,128 @@
 import asyncio
+import hashlib
 import json
-import re
+import random
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable
 from datetime import datetime
 
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
 from openai.types.chat import ChatCompletionMessageParam, ParsedChoice
+from tortoise.transactions import in_transaction
 
+from app.api.pipeline.checkpoint_writer import CheckpointWriter
+from app.api.pipeline.inflight import inflight_audits
+from app.api.pipeline.prompt_registry import prompt_registry
 from app.api.pricing.service import Usage
-from app.config import redis_client
+from app.config import (
+    candidate_deadline,
+    candidate_late_policy,
+    candidate_quorum,
+    hedge_candidates,
+    normalize_source,
+    redis_client,
+    structured_candidates,
+)
 from app.db.models import Audit, Finding, IntermediateResponse, Prompt
-from app.lib.clients import llm_client
+from app.lib.clients import llm_client, llm_limiter
+from app.lib.libraries import library_index_digest
+from app.prometheus import prom_logger
+from app.utils.helpers.code_normalizer import (
+    SourceNormalizer,
+    compose_line_maps,
+    remap_line_references,
+)
+from app.utils.helpers.code_sharder import (
+    SourceCodeSharder,
+    estimate_tokens,
+    fit_to_budget,
+)
+from app.utils.helpers.findings_merger import merge_findings
+from app.utils.helpers.findings_parser import decode_findings
+from app.utils.helpers.library_detector import LibraryDetector
+from app.utils.helpers.rate_limit import parse_reset_duration
+from app.utils.helpers.tokenizer import (
+    count_message_tokens,
+    count_tokens,
+    tokenizer_name,
+)
 from app.utils.logger import get_logger
-from app.utils.schema.output import GasOutputStructure, SecurityOutputStructure
+from app.utils.schema.llm import LlmAttempt, SourceShard, TokenQuote
+from app.utils.schema.output import (
+    CandidateOutputStructure,
+    GasOutputStructure,
+    SecurityOutputStructure,
+)
 from app.utils.types.enums import AuditStatusEnum, AuditTypeEnum, FindingLevelEnum
 
 logger = get_logger("worker")
 
+# transient failures, worth another attempt. Rate limits are queued separately.
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError)
+
+# recent successful latencies per step, within this worker process.
+step_latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=200))
+
 
 class LlmPipeline:
+    MODEL = "gpt-4o-mini"
+    MAX_COMPLETION_TOKENS = 2000
+    CANDIDATE_TEMPERATURE = 0.3
+    REVIEWER_TEMPERATURE = 0.2
+    # streamed token deltas are batched, flushing on whichever is hit first.
+    STREAM_FLUSH_INTERVAL = 0.25  # seconds
+    STREAM_FLUSH_CHARS = 512
+    # inputs larger than this are split into shards, audited concurrently.
+    SHARD_TOKEN_BUDGET = 48_000
+    # candidate findings are truncated to fit the reviewer's context window.
+    REVIEWER_TOKEN_BUDGET = 96_000
+    # jittered exponential backoff between attempts of a single call.
+    MAX_ATTEMPTS = 3
+    BACKOFF_BASE = 1.0  # seconds
+    BACKOFF_CAP = 10.0  # seconds
+    # calls slower than the p95 of this many recent calls are hedged.
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_MIN_DELAY = 1.0  # seconds
+    # calls still rejected with a 429 after this long are failed.
+    MAX_REQUEUE_SECONDS = 300
+    # identical in-flight audits waited on, before running regardless.
+    MAX_COALESCE_WAITS = 3
 
     def __init__(
         self,
         audit: Audit,
         input: str,
         should_publish: bool = False,  # **to pubsub channel**
+        should_stream: bool = False,  # publish token deltas as they're generated
+        should_normalize: bool = normalize_source,
+        should_hedge: bool = hedge_candidates,
+        quorum: int = candidate_quorum,  # 0 waits for every candidate
+        quorum_deadline: float = candidate_deadline,  # seconds
+        late_policy: str = candidate_late_policy,  # "discard" | "rereview"
+        structured: bool = structured_candidates,
     ):
-        self.input = input
-
         self.audit = audit
+        self.should_normalize = should_normalize
+        self.structured = structured
+
+        # original line number of every line of the source that's prompted with.
+        self.line_map: list[int] = []
+        self.input = self._stub_libraries(input or "")
+        if should_normalize:
+            self.input = self._normalize(self.input)
+        self.shards = SourceCodeSharder(
+            source=self.input, token_budget=self.SHARD_TOKEN_BUDGET
+        ).shard()
+
         self.audit_type = audit.audit_type
         self.usage = Usage()
+        self.checkpoints = CheckpointWriter()
 
         self.output_structure = (
             GasOutputStructure
@@ -37,6 +131,58 @@ class LlmPipeline:
         )
 
         self.should_publish = should_publish
+        self.should_stream = should_stream and should_publish
+        # hedged requests would publish duplicate token deltas.
+        self.should_hedge = should_hedge and not self.should_stream
+
+        self.candidate_prompts: list[Prompt] | None = None
+        self.reviewer_prompt: Prompt | None = None
+
+        self.quorum = quorum
+        self.quorum_deadline = quorum_deadline
+        self.late_policy = late_policy
+        # candidates still running once the quorum was met, by their position.
+        self.late_candidates: dict[int, asyncio.Task] = {}
+        self.candidate_calls: dict[str, asyncio.Task] = {}
+        self.n_discarded = 0
+        # candidates missing from the report, whether they failed or were discarded.
+        self.n_failed = 0
+        self.report: str | None = None
+        # cache key this audit claimed as in flight, see coalesce().
+        self.claimed_key: str | None = None
+        # steps that succeeded before the audit was interrupted, see resume().
+        self.resumed: dict = {}
+        self.n_resumed = 0
+
+    def _stub_libraries(self, source: str) -> str:
+        detector = LibraryDetector(source=source)
+        stubbed = detector.stub()
+        self.line_map = detector.line_map
+        if not detector.matches:
+            return stubbed
+
+        prom_logger.library_stub_bytes.inc(detector.bytes_saved)
+        prom_logger.library_stub_tokens.inc(detector.tokens_saved)
+        logger.info(
+            "stubbed known library files",
+            extra={
+                "audit_id": str(self.audit.id),
+                "n_files": len(detector.matches),
+                "bytes_saved": detector.bytes_saved,
+                "tokens_saved": detector.tokens_saved,
+            },
+        )
+
+        return stubbed
+
+    def _normalize(self, source: str) -> str:
+        normalizer = SourceNormalizer(source=source)
+        normalized = normalizer.normalize()
+        self.line_map = compose_line_maps(normalizer.line_map, self.line_map)
+
+        prom_logger.source_compression.observe(normalizer.compression_ratio)
+
+        return normalized
 
     def _parse_candidates(
         self, choices: list[ParsedChoice]
@@ -48,7 +194,13 @@ class LlmPipeline:
 
         return {"role": "assistant", "content": choice.message.content}
 
-    async def _publish_event(self, name: str, status: str):
+    async def _publish_event(
+        self,
+        name: str,
+        status: str,
+        content: str | None = None,
+        attempt: LlmAttempt | None = None,
+    ):
         if not self.should_publish:
             return
 
@@ -58,24 +210,534 @@ class LlmPipeline:
             "status": status,
             "job_id": str(self.audit.id),
         }
+        if content is not None:
+            message["content"] = content
+        if attempt is not None:
+            # streamed content is scoped to a single shard and attempt.
+            message["shard"] = attempt["shard"]
+            message["attempt"] = attempt["attempt"]
 
         await redis_client.publish(
             "evals",
             json.dumps(message),
         )
 
+    async def _stream_completion(
+        self, prompt: Prompt, attempt: LlmAttempt, restart: bool, **kwargs
+    ):
+        """
+        Streams the completion, publishing token deltas as "delta" events. Deltas
+        are batched by time and size to bound the pub/sub message rate. Returns the
+        final completion, which has the same shape as create() / parse().
+
+        When a call is restarted, ie. retried or requeued after a 429, a "reset"
+        event tells subscribers to drop the deltas already received for the shard.
+        """
+        if restart:
+            await self._publish_event(name=prompt.tag, status="reset", attempt=attempt)
+
+        buffer: list[str] = []
+        n_buffered = 0
+        last_flush = time.monotonic()
+
+        async with llm_client.beta.chat.completions.stream(
+            **kwargs, stream_options={"include_usage": True}
+        ) as stream:
+            async for event in stream:
+                if event.type != "content.delta":
+                    continue
+
+                buffer.append(event.delta)
+                n_buffered += len(event.delta)
+
+                now = time.monotonic()
+                if (
+                    n_buffered < self.STREAM_FLUSH_CHARS
+                    and now - last_flush < self.STREAM_FLUSH_INTERVAL
+                ):
+                    continue
+
+                await self._publish_event(
+                    name=prompt.tag,
+                    status="delta",
+                    content="".join(buffer),
+                    attempt=attempt,
+                )
+                buffer = []
+                n_buffered = 0
+                last_flush = now
+
+            if buffer:
+                await self._publish_event(
+                    name=prompt.tag,
+                    status="delta",
+                    content="".join(buffer),
+                    attempt=attempt,
+                )
+
+            return await stream.get_final_completion()
+
+    async def _complete(
+        self,
+        prompt: Prompt,
+        create,
+        attempt: LlmAttempt,
+        on_sent: Callable[[], None] | None = None,
+        **kwargs,
+    ):
+        """
+        Runs the completion through the shared rate limiter. Calls are queued while
+        the limits are exhausted, and requeued if rejected with a 429, for up to
+        MAX_REQUEUE_SECONDS. `on_sent` is called every time the limiter lets the
+        request through.
+        """
+        n_tokens = kwargs["max_completion_tokens"]
+        for message in kwargs["messages"]:
+            n_tokens += estimate_tokens(message["content"])
+
+        restart = attempt["attempt"] > 1
+        requeued_at = None
+        while True:
+            await llm_limiter.acquire(tokens=n_tokens)
+            if on_sent:
+                on_sent()
+            try:
+                if self.should_stream:
+                    return await self._stream_completion(
+                        prompt, attempt, restart, **kwargs
+                    )
+                return await create(**kwargs)
+            except RateLimitError as err:
+                # a rate limit won't resolve itself if the quota is exhausted.
+                if err.code == "insufficient_quota":
+                    raise err
+                requeued_at = requeued_at or time.monotonic()
+                if time.monotonic() - requeued_at >= self.MAX_REQUEUE_SECONDS:
+                    logger.warning(
+                        "rate limited by openai for too long, giving up",
+                        extra={"audit_id": str(self.audit.id), "step": prompt.tag},
+                    )
+                    raise err
+                retry_after = parse_reset_duration(
+                    f"{err.response.headers.get('retry-after', 1)}s"
+                )
+                logger.warning(
+                    "rate limited by openai, requeueing",
+                    extra={"audit_id": str(self.audit.id), "step": prompt.tag},
+                )
+                await llm_limiter.block(retry_after or 1)
+                restart = True
+
+    def _hedge_threshold(self, prompt: Prompt, hedge: bool) -> float | None:
+        latencies = step_latencies[prompt.tag]
+        if not hedge or not self.should_hedge:
+            return None
+        if len(latencies) < self.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return max(self.HEDGE_MIN_DELAY, ordered[int(len(ordered) * 0.95)])
+
+    async def _timed_complete(
+        self,
+        prompt: Prompt,
+        create,
+        attempts: list[LlmAttempt],
+        attempt: LlmAttempt,
+        sent: asyncio.Event,
+        **kwargs,
+    ):
+        """
+        Latency is measured from when the limiter lets the request through, so
+        time spent queued doesn't skew the hedging threshold. `sent` is set then.
+        """
+        started_at = None
+
+        def on_sent():
+            nonlocal started_at
+            started_at = time.monotonic()
+            sent.set()
+
+        try:
+            response = await self._complete(prompt, create, attempt, on_sent, **kwargs)
+        except asyncio.CancelledError:
+            attempt["status"] = "cancelled"
+            raise
+        except Exception as err:
+            attempt["status"] = "failed"
+            attempt["error"] = type(err).__name__
+            raise err
+        else:
+            attempt["status"] = "success"
+            step_latencies[prompt.tag].append(time.monotonic() - started_at)
+            return response
+        finally:
+            if started_at is not None:
+                attempt["latency"] = round(time.monotonic() - started_at, 3)
+            attempts.append(attempt)
+
+    async def _hedged_complete(
+        self,
+        prompt: Prompt,
+        create,
+        attempts: list[LlmAttempt],
+        shard: int | None,
+        n_attempt: int,
+        hedge: bool,
+        **kwargs,
+    ):
+        """
+        Sends a second, identical request once the first is slower than the p95 of
+        recent calls for this step. Whichever succeeds first is used, and the other
+        is cancelled. The threshold only runs once the first request is sent, and
+        requests aren't hedged while the rate limiter is queueing callers.
+        """
+
+        def start(hedge: bool, sent: asyncio.Event) -> asyncio.Task:
+            attempt = LlmAttempt(
+                shard=shard,
+                attempt=n_attempt,
+                hedge=hedge,
+                status="pending",
+                latency=0,
+                error=None,
+            )
+            return asyncio.ensure_future(
+                self._timed_complete(prompt, create, attempts, attempt, sent, **kwargs)
+            )
+
+        sent = asyncio.Event()
+        primary = start(hedge=False, sent=sent)
+        threshold = self._hedge_threshold(prompt, hedge)
+        if threshold is None:
+            return await primary
+
+        waiting = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({primary, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            if not primary.done():
+                await asyncio.wait({primary}, timeout=threshold)
+        except asyncio.CancelledError:
+            # asyncio.wait() doesn't cancel what it waits on.
+            primary.cancel()
+            await asyncio.wait({primary})
+            raise
+        finally:
+            waiting.cancel()
+        if primary.done():
+            return primary.result()
+
+        if llm_limiter.n_queued:
+            # a hedge would only add to the backlog, and wait behind it.
+            return await primary
+
+        logger.info(
+            "hedging slow llm call",
+            extra={"audit_id": str(self.audit.id), "step": prompt.tag},
+        )
+        pending = {primary, start(hedge=True, sent=asyncio.Event())}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.exception():
+                        return task.result()
+        finally:
+            # openai still bills a cancelled request, but never reports its usage, so
+            # it's missing from self.usage.
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        # both failed, surface the original failure.
+        raise primary.exception()
+
+    async def _complete_with_retries(
+        self,
+        prompt: Prompt,
+        create,
+        attempts: list[LlmAttempt],
+        shard: int | None = None,
+        hedge: bool = False,
+        **kwargs,
+    ):
+        """
+        Retries transient failures with full jitter exponential backoff. Every
+        attempt, including hedges, is recorded in `attempts`.
+        """
+        for n_attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                return await self._hedged_complete(
+                    prompt, create, attempts, shard, n_attempt, hedge, **kwargs
+                )
+            except RETRYABLE_ERRORS as err:
+                if n_attempt == self.MAX_ATTEMPTS:
+                    raise err
+                backoff = min(
+                    self.BACKOFF_CAP, self.BACKOFF_BASE * 2 ** (n_attempt - 1)
+                )
+                logger.warning(
+                    f"retrying llm call: {err}",
+                    extra={"audit_id": str(self.audit.id), "step": prompt.tag},
+                )
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def load_prompts(self):
+        self.candidate_prompts, self.reviewer_prompt = await prompt_registry.get(
+            self.audit_type
+        )
+
+    async def quote(self) -> TokenQuote:
+        """
+        Tokens the audit is expected to be billed for, without calling the LLM.
+        Prompts of candidates are counted exactly, the reviewer's is bounded by the
+        candidates' max output, as is every completion.
+        """
+        if self.candidate_prompts is None:
+            await self.load_prompts()
+
+        input_tokens = 0
+        n_calls = 0
+        for prompt in self.candidate_prompts:
+            for shard in self.shards:
+                input_tokens += count_message_tokens(
+                    [{"content": prompt.content}, {"content": shard["content"]}]
+                )
+                n_calls += 1
+        candidate_output = n_calls * self.MAX_COMPLETION_TOKENS
+
+        output_tokens = candidate_output
+        if self.reviewer_prompt:
+            schema = json.dumps(self.output_structure.model_json_schema())
+            input_tokens += (
+                count_message_tokens(
+                    [{"content": self.reviewer_prompt.content}, {"content": ""}]
+                )
+                + min(candidate_output, self.REVIEWER_TOKEN_BUDGET)
+                + count_tokens(schema)
+            )
+            output_tokens += self.MAX_COMPLETION_TOKENS
+
+        return TokenQuote(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            tokenizer=tokenizer_name(),
+        )
+
+    @property
+    def cache_key(self) -> str | None:
+        """
+        Content address of everything that determines the pipeline output. Two
+        audits sharing a key would send identical requests to the LLM.
+        """
+        if self.candidate_prompts is None:
+            raise NotImplementedError("must run load_prompts() first")
+
+        if not self.audit.contract.hash_code or not self.reviewer_prompt:
+            return None
+
+        prompts = sorted(
+            [*self.candidate_prompts, self.reviewer_prompt], key=lambda x: str(x.id)
+        )
+
+        parts = [
+            *self._input_parts(),
+            str(self.CANDIDATE_TEMPERATURE),
+            str(self.REVIEWER_TEMPERATURE),
+        ]
+        for prompt in prompts:
+            parts.append(self._prompt_part(prompt))
+
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def candidate_cache_key(self, prompt: Prompt) -> str | None:
+        """
+        Content address of a single candidate's response, the per-candidate
+        counterpart of cache_key.
+        """
+        if not self.audit.contract.hash_code:
+            return None
+
+        parts = [
+            *self._input_parts(),
+            str(self.CANDIDATE_TEMPERATURE),
+            self._prompt_part(prompt),
+        ]
+
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def _input_parts(self) -> list[str]:
+        # everything, other than the prompts, that shapes what the LLM is sent.
+        return [
+            self.audit.contract.hash_code,
+            self.audit_type.value,
+            self.MODEL,
+            str(self.SHARD_TOKEN_BUDGET),
+            str(self.should_normalize),
+            library_index_digest,
+            # only when set, keys of free text candidates are unchanged.
+            *(["structured"] if self.structured else []),
+        ]
+
+    def _prompt_part(self, prompt: Prompt) -> str:
+        content_hash = hashlib.sha256(prompt.content.encode()).hexdigest()
+        return f"{prompt.id}:{prompt.version}:{content_hash}"
+
+    @property
+    def is_complete(self) -> bool:
+        """
+        Whether every candidate made it into the report. Partial results shouldn't
+        be reused in place of a complete one.
+        """
+        return not self.n_failed and not self.late_candidates
+
+    async def restore_from_cache(self) -> str | None:
+        """
+        Reuse the results of a previous successful audit with the same cache key.
+        Intermediate responses and findings are cloned onto the current audit, so it
+        reads exactly like a freshly generated one. Returns the raw output on a hit.
+        """
+        cache_key = self.cache_key
+        if not cache_key:
+            return None
+
+        source = (
+            await Audit.filter(
+                cache_key=cache_key,
+                status=AuditStatusEnum.SUCCESS,
+                raw_output__isnull=False,
+            )
+            .exclude(id=self.audit.id)
+            .order_by("-created_at")
+            .first()
+            .prefetch_related("intermediate_responses", "findings")
+        )
+
+        if not source:
+            prom_logger.audit_cache.labels(result="miss").inc()
+            return None
+
+        prom_logger.audit_cache.labels(result="hit").inc()
+        logger.info(
+            "reusing cached audit result",
+            extra={"audit_id": str(self.audit.id), "source_audit_id": str(source.id)},
+        )
+
+        intermediate_responses = []
+        for intermediate in source.intermediate_responses:
+            intermediate_responses.append(
+                IntermediateResponse(
+                    audit=self.audit,
+                    prompt_id=intermediate.prompt_id,
+                    step=intermediate.step,
+                    status=intermediate.status,
+                    result=intermediate.result,
+                    processing_time_seconds=intermediate.processing_time_seconds,
+                    cache_key=intermediate.cache_key,
+                )
+            )
+
+        findings = []
+        for finding in source.findings:
+            findings.append(
+                Finding(
+                    audit=self.audit,
+                    audit_type=finding.audit_type,
+                    level=finding.level,
+                    name=finding.name,
+                    explanation=finding.explanation,
+                    recommendation=finding.recommendation,
+                    reference=finding.reference,
+                )
+            )
+
+        if intermediate_responses:
+            # a resumed audit already has steps of its own.
+            await IntermediateResponse.bulk_create(
+                objects=intermediate_responses,
+                on_conflict=["audit_id", "prompt_id"],
+                update_fields=CheckpointWriter.UPDATE_FIELDS,
+            )
+        if findings:
+            await Finding.bulk_create(objects=findings)
+
+        for intermediate in intermediate_responses:
+            await self._publish_event(name=intermediate.step, status="done")
+
+        return source.raw_output
+
+    async def resume(self):
+        """
+        Picks up an audit that was interrupted, ie. its worker died. Steps that
+        already succeeded are reused rather than run again, only the missing or
+        failed ones are. Findings are cleared, as the report is written again.
+        """
+        checkpoints = await IntermediateResponse.filter(
+            audit_id=self.audit.id,
+            status=AuditStatusEnum.SUCCESS,
+            result__isnull=False,
+        )
+        self.resumed = {checkpoint.prompt_id: checkpoint for checkpoint in checkpoints}
+        await Finding.filter(audit_id=self.audit.id).delete()
+
+        logger.info(
+            "resuming interrupted audit",
+            extra={"audit_id": str(self.audit.id), "n_steps": len(self.resumed)},
+        )
+
+    def _get_resumed(self, prompt: Prompt) -> IntermediateResponse | None:
+        checkpoint = self.resumed.get(prompt.id)
+        # the prompt may have been edited since.
+        if checkpoint and checkpoint.cache_key == self.candidate_cache_key(prompt):
+            return checkpoint
+        return None
+
+    async def coalesce(self) -> str | None:
+        """
+        Waits for an identical audit already in flight, and restores its result,
+        rather than running the same LLM calls. Returns None if this audit should
+        run, in which case it holds the claim until release() is called.
+        """
+        cache_key = self.cache_key
+        if not cache_key:
+            return None
+
+        for _ in range(self.MAX_COALESCE_WAITS):
+            holder = await inflight_audits.claim(cache_key, str(self.audit.id))
+            if holder is None:
+                self.claimed_key = cache_key
+                return None
+
+            logger.info(
+                "identical audit in flight, waiting for its result",
+                extra={"audit_id": str(self.audit.id), "source_audit_id": holder},
+            )
+            await inflight_audits.wait(cache_key, holder)
+
+            # None if it failed, or is missing candidates.
+            response = await self.restore_from_cache()
+            if response is not None:
+                return response
+
+        return None
+
+    async def release(self):
+        if self.claimed_key:
+            await inflight_audits.release(self.claimed_key, str(self.audit.id))
+            self.claimed_key = None
+
     async def _checkpoint(
         self,
         prompt: Prompt,
         status: AuditStatusEnum,
         result: str | None = None,
         processing_time: int | None = None,
+        attempts: list[LlmAttempt] | None = None,
+        cache_key: str | None = None,
     ):
 
-        checkpoint = await IntermediateResponse.filter(
-            audit_id=self.audit.id, prompt_id=prompt.id
-        ).first()
-
         logger.info(
             "Checkpointing audit intermediate response",
             extra={
@@ -86,46 +748,31 @@ class LlmPipeline:
             },
         )
 
-        if checkpoint:
-            checkpoint.status = status
-            checkpoint.result = result
-            checkpoint.processing_time_seconds = processing_time
-            await checkpoint.save()
-            return
-
-        await IntermediateResponse.create(
-            audit_id=self.audit.id,
-            prompt=prompt,
-            step=prompt.tag,
-            status=status,
-            result=result,
-            processing_time_seconds=processing_time,
+        await self.checkpoints.write(
+            IntermediateResponse(
+                audit_id=self.audit.id,
+                prompt_id=prompt.id,
+                step=prompt.tag,
+                status=status,
+                result=result,
+                processing_time_seconds=processing_time,
+                attempts=attempts,
+                cache_key=cache_key,
+            ),
+            # a step reads as processing before its LLM calls are sent.
+            durable=status == AuditStatusEnum.PROCESSING,
         )
 
     async def _write_findings(self, response):
-
-        pattern = r"<<(.*?)>>"
-
-        # this parsing should not be required, but we'll include it for safety
-        raw_data = re.sub(pattern, r"`\1`", response)
-
-        # corrects for occassional leading non-json text...
-        pattern = r"\{.*\}"
-        match = re.search(pattern, raw_data, re.DOTALL)
-        if match:
-            raw_data = match.group(0)
-
         try:
-            parsed = json.loads(raw_data)
-        except Exception:
+            model = decode_findings(response, self.output_structure)
+        except ValueError:
             logger.warning(
                 "unable to parse json for audit findings, skipping",
                 extra={"audit_id": str(self.audit.id)},
             )
             return
 
-        model = self.output_structure(**parsed)
-
         to_create = []
         for severity in FindingLevelEnum:
             findings = getattr(model.findings, severity.value, None)
@@ -146,105 +793,368 @@ class LlmPipeline:
         if to_create:
             await Finding.bulk_create(objects=to_create)
 
+    async def _get_memoized_candidate(
+        self, prompt: Prompt
+    ) -> IntermediateResponse | None:
+        """
+        Find a successful response for this exact prompt against the same inputs.
+        The key covers the prompt's content, as update_prompt() can modify it in
+        place. Invalidating the audit cache clears these keys too.
+        """
+        cache_key = self.candidate_cache_key(prompt)
+        if not cache_key:
+            return None
+
+        memoized = (
+            await IntermediateResponse.filter(
+                cache_key=cache_key,
+                status=AuditStatusEnum.SUCCESS,
+                result__isnull=False,
+            )
+            .exclude(audit_id=self.audit.id)
+            .order_by("-created_at")
+            .first()
+        )
+
+        result = "hit" if memoized else "miss"
+        prom_logger.candidate_memo.labels(result=result).inc()
+
+        return memoized
+
+    async def _generate_candidate_shard(
+        self,
+        prompt: Prompt,
+        shard: SourceShard,
+        index: int | None,
+        attempts: list[LlmAttempt],
+    ):
+        params = dict(
+            model=self.MODEL,
+            max_completion_tokens=self.MAX_COMPLETION_TOKENS,
+            temperature=self.CANDIDATE_TEMPERATURE,
+            messages=[
+                {
+                    "role": "developer",
+                    "content": prompt.content,
+                },
+                {
+                    "role": "user",
+                    "content": shard["content"],
+                },
+            ],
+        )
+        create = llm_client.chat.completions.create
+        if self.structured:
+            create = llm_client.beta.chat.completions.parse
+            params["response_format"] = CandidateOutputStructure
+
+        response = await self._complete_with_retries(
+            prompt,
+            create,
+            attempts,
+            shard=index,
+            hedge=True,
+            **params,
+        )
+
+        usage = response.usage
+        self.usage.add_input(usage.prompt_tokens)
+        self.usage.add_output(usage.completion_tokens)
+
+        # line numbers are relative to the shard, resolve them to the original
+        # source before results of different shards are merged.
+        line_map = compose_line_maps(shard["line_map"], self.line_map)
+        return remap_line_references(response.choices[0].message.content, line_map)
+
+    def _merge_shard_results(self, results: list[str]) -> str:
+        if len(results) == 1:
+            return results[0]
+
+        if self.structured:
+            findings = []
+            for result in results:
+                output = CandidateOutputStructure.model_validate_json(result)
+                findings.extend(output.findings)
+            return CandidateOutputStructure(findings=findings).model_dump_json()
+
+        merged = ""
+        for i, (shard, result) in enumerate(zip(self.shards, results)):
+            scope = ", ".join(shard["files"]) or "partial source"
+            merged += f"\n\nShard {i + 1}/{len(results)} ({scope}):\n{result}"
+
+        return merged.strip()
+
     async def _generate_candidate(self, prompt: Prompt):
         await self._publish_event(name=prompt.tag, status="start")
 
+        resumed = self._get_resumed(prompt)
+        if resumed:
+            self.n_resumed += 1
+            prom_logger.resumed_steps.inc()
+            await self._publish_event(name=prompt.tag, status="done")
+            return resumed.result
+
+        memoized = await self._get_memoized_candidate(prompt)
+        if memoized:
+            await self._checkpoint(
+                prompt=prompt,
+                status=AuditStatusEnum.SUCCESS,
+                result=memoized.result,
+                processing_time=0,
+                cache_key=memoized.cache_key,
+            )
+            await self._publish_event(name=prompt.tag, status="done")
+            return memoized.result
+
         # allows for some fault tolerance.
         now = datetime.now()
+        attempts: list[LlmAttempt] = []
         try:
             await self._checkpoint(prompt=prompt, status=AuditStatusEnum.PROCESSING)
-            response = await llm_client.chat.completions.create(
-                model="gpt-4o-mini",
-                max_completion_tokens=2000,
-                temperature=0.3,
-                messages=[
-                    {
-                        "role": "developer",
-                        "content": prompt.content,
-                    },
-                    {
-                        "role": "user",
-                        "content": self.input,
-                    },
-                ],
+
+            # LLM calls run in their own task, so discarding a late candidate only
+            # cancels the calls, never a checkpoint write.
+            calls = asyncio.ensure_future(
+                self._generate_candidate_shards(prompt, attempts)
             )
-            usage = response.usage
-            self.usage.add_input(usage.prompt_tokens)
-            self.usage.add_output(usage.completion_tokens)
-            result = response.choices[0].message.content
+            self.candidate_calls[prompt.id] = calls
+            shard_results = await calls
+
+            result = self._merge_shard_results(shard_results)
             await self._publish_event(name=prompt.tag, status="done")
             await self._checkpoint(
                 prompt=prompt,
                 status=AuditStatusEnum.SUCCESS,
                 result=result,
                 processing_time=(datetime.now() - now).seconds,
+                attempts=attempts,
+                cache_key=self.candidate_cache_key(prompt),
             )
 
             return result
 
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            # discarded, the quorum was met without it.
+            self.n_failed += 1
+            await self._publish_event(name=prompt.tag, status="discarded")
+            await self._checkpoint(
+                prompt=prompt,
+                status=AuditStatusEnum.FAILED,
+                processing_time=(datetime.now() - now).seconds,
+                attempts=attempts,
+            )
+            return None
+
         except Exception as err:
             logger.warning(err)
+            self.n_failed += 1
             await self._publish_event(name=prompt.tag, status="error")
             await self._checkpoint(
                 prompt=prompt,
                 status=AuditStatusEnum.FAILED,
                 processing_time=(datetime.now() - now).seconds,
+                attempts=attempts,
             )
             return None
 
+    async def _generate_candidate_shards(
+        self, prompt: Prompt, attempts: list[LlmAttempt]
+    ) -> list[str]:
+        # shards are audited concurrently, then merged into a single response.
+        # a failed shard fails the candidate, so its siblings are cancelled.
+        async with asyncio.TaskGroup() as group:
+            tasks = []
+            for i, shard in enumerate(self.shards):
+                index = i if len(self.shards) > 1 else None
+                tasks.append(
+                    group.create_task(
+                        self._generate_candidate_shard(prompt, shard, index, attempts)
+                    )
+                )
+        return [task.result() for task in tasks]
+
+    async def _wait_for_quorum(self, tasks: list[asyncio.Task]):
+        """
+        Waits until `quorum` candidates succeeded, or every candidate finished. The
+        deadline (since candidates started) caps the wait, once any succeeded.
+        """
+        n_required = min(self.quorum, len(tasks)) if self.quorum else len(tasks)
+        deadline = None
+        if self.quorum_deadline:
+            deadline = time.monotonic() + self.quorum_deadline
+
+        pending = set(tasks)
+        while pending:
+            n_success = sum(
+                1 for task in tasks if task.done() and task.result() is not None
+            )
+            if n_success >= n_required:
+                break
+
+            timeout = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    timeout = remaining
+                elif n_success:
+                    break
+
+            _, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+    async def discard_late_candidates(self):
+        if not self.late_candidates:
+            return
+
+        for i in self.late_candidates:
+            calls = self.candidate_calls.get(self.candidate_prompts[i].id)
+            if calls:
+                calls.cancel()
+        await asyncio.wait(self.late_candidates.values())
+
+        self.n_discarded += len(self.late_candidates)
+        self.late_candidates = {}
+
+    def _construct_findings_digest(
+        self, responses: dict[int, str | None], token_budget: int
+    ) -> str:
+        """
+        Structured counterpart of the candidate prompt: the findings of every
+        candidate, near-duplicates merged, as compact JSON. The least severe
+        findings are dropped to fit the reviewer's budget.
+        """
+        candidates: dict[int, CandidateOutputStructure] = {}
+        for i, response in responses.items():
+            if response is None:
+                continue
+            try:
+                candidates[i + 1] = CandidateOutputStructure.model_validate_json(
+                    response
+                )
+            except ValueError:
+                logger.warning(
+                    "unable to parse candidate findings, skipping",
+                    extra={"audit_id": str(self.audit.id), "auditor": i + 1},
+                )
+
+        if not candidates:
+            return ""
+
+        auditors = ", ".join(f"#{i}" for i in candidates)
+        header = (
+            f"\n\nFindings of auditors {auditors}, near-duplicates merged. `auditors` "
+            "lists the auditors that reported each finding:\n"
+        )
+
+        findings = merge_findings(candidates)
+        entries = []
+        n_tokens = estimate_tokens(header)
+        for finding in findings:
+            entry = json.dumps(finding, separators=(",", ":"))
+            n_tokens += estimate_tokens(entry)
+            if n_tokens > token_budget:
+                logger.warning(
+                    "candidate findings exceed the reviewer budget, truncating",
+                    extra={"audit_id": str(self.audit.id)},
+                )
+                break
+            entries.append(entry)
+
+        return f"{header}[{','.join(entries)}]"
+
+    def _construct_candidate_prompt(
+        self, responses: dict[int, str | None], token_budget: int | None = None
+    ) -> str:
+        if token_budget is None:
+            token_budget = self.REVIEWER_TOKEN_BUDGET
+
+        if self.structured:
+            return self._construct_findings_digest(responses, token_budget)
+
+        sections = [
+            f"\n\nAuditor #{i + 1} Findings:\n{response}"
+            for i, response in sorted(responses.items())
+            if response is not None
+        ]
+        fitted = fit_to_budget(sections, token_budget)
+        if fitted != sections:
+            logger.warning(
+                "candidate findings exceed the reviewer budget, truncating",
+                extra={"audit_id": str(self.audit.id)},
+            )
+
+        return "".join(fitted)
+
     async def generate_candidates(self):
+        if self.candidate_prompts is None:
+            await self.load_prompts()
+
         tasks = []
-        candidate_prompts = await Prompt.filter(
-            audit_type=self.audit_type, is_active=True, tag__not="reviewer"
-        )
-        for prompt in candidate_prompts:
-            task = self._generate_candidate(prompt)
+        for prompt in self.candidate_prompts:
+            task = asyncio.ensure_future(self._generate_candidate(prompt))
             tasks.append(task)
 
-        responses: list[str | None] = await asyncio.gather(*tasks)
+        await self._wait_for_quorum(tasks)
 
-        constructed_prompt = ""
-
-        for i, response in enumerate(responses):
-            if response is not None:
-                constructed_prompt += f"\n\nAuditor #{i + 1} Findings:\n{response}"
+        responses: dict[int, str | None] = {}
+        for i, task in enumerate(tasks):
+            if task.done():
+                responses[i] = task.result()
+            else:
+                self.late_candidates[i] = task
 
-        self.candidate_prompt = constructed_prompt
+        if self.late_candidates:
+            logger.info(
+                "candidate quorum met, reviewing early",
+                extra={
+                    "audit_id": str(self.audit.id),
+                    "n_late": len(self.late_candidates),
+                    "late_policy": self.late_policy,
+                },
+            )
 
-    async def generate_report(self):
-        if not self.candidate_prompt:
-            raise NotImplementedError("must run generate_candidates() first")
+        if self.late_candidates and self.late_policy == "discard":
+            await self.discard_late_candidates()
+        await self.checkpoints.flush()
 
-        prompt = await Prompt.filter(
-            audit_type=self.audit_type, is_active=True, tag="reviewer"
-        ).first()
+        self.candidate_prompt = self._construct_candidate_prompt(responses)
 
+    async def _review(self, prompt: Prompt, content: str) -> str:
         await self._publish_event(name=prompt.tag, status="start")
 
         now = datetime.now()
+        attempts: list[LlmAttempt] = []
         await self._checkpoint(prompt=prompt, status=AuditStatusEnum.PROCESSING)
 
         try:
-            response = await llm_client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                max_completion_tokens=2000,
-                temperature=0.2,
+            params = dict(
+                model=self.MODEL,
+                max_completion_tokens=self.MAX_COMPLETION_TOKENS,
+                temperature=self.REVIEWER_TEMPERATURE,
                 messages=[
                     {
                         "role": "developer",
                         "content": prompt.content,
                     },
-                    {"role": "user", "content": self.candidate_prompt},
+                    {"role": "user", "content": content},
                 ],
                 response_format=self.output_structure,
             )
+            response = await self._complete_with_retries(
+                prompt, llm_client.beta.chat.completions.parse, attempts, **params
+            )
         except Exception as err:
             await self._publish_event(name=prompt.tag, status="error")
             await self._checkpoint(
                 prompt=prompt,
                 status=AuditStatusEnum.FAILED,
                 processing_time=(datetime.now() - now).seconds,
+                attempts=attempts,
             )
+            await self.checkpoints.flush()
             raise err
 
         result = response.choices[0].message.content
@@ -258,7 +1168,71 @@ class LlmPipeline:
             status=AuditStatusEnum.SUCCESS,
             result=result,
             processing_time=(datetime.now() - now).seconds,
+            attempts=attempts,
         )
-        await self._write_findings(result)
+        await self.checkpoints.flush()
 
         return result
+
+    async def generate_report(self):
+        if not self.candidate_prompt:
+            raise NotImplementedError("must run generate_candidates() first")
+
+        if self.reviewer_prompt is None:
+            await self.load_prompts()
+
+        # reviewed the same candidates already, before being interrupted.
+        resumed = self.resumed.get(self.reviewer_prompt.id)
+        if resumed and self.n_resumed == len(self.candidate_prompts):
+            prom_logger.resumed_steps.inc()
+            self.report = resumed.result
+        else:
+            self.report = await self._review(
+                self.reviewer_prompt, self.candidate_prompt
+            )
+        await self._write_findings(self.report)
+
+        return self.report
+
+    async def rereview(self) -> str | None:
+        """
+        Folds candidates that finished after the quorum into the report, which was
+        already delivered. The reviewer is given its prior report, and only the
+        late findings. Returns the revised report, if any.
+        """
+        if not self.report:
+            raise NotImplementedError("must run generate_report() first")
+
+        late = self.late_candidates
+        self.late_candidates = {}
+        if not late:
+            return None
+
+        results = await asyncio.gather(*late.values())
+        prior = f"Prior Review:\n{self.report}"
+        late_prompt = self._construct_candidate_prompt(
+            dict(zip(late.keys(), results)),
+            token_budget=self.REVIEWER_TOKEN_BUDGET - estimate_tokens(prior),
+        )
+        if not late_prompt:
+            return None
+
+        prompt = self.reviewer_prompt
+        try:
+            report = await self._review(prompt, f"{prior}{late_prompt}")
+        except Exception as err:
+            # the prior report still stands on its own, without the late candidates.
+            logger.warning(err, extra={"audit_id": str(self.audit.id)})
+            self.n_failed += len(late)
+            await self._checkpoint(
+                prompt=prompt, status=AuditStatusEnum.SUCCESS, result=self.report
+            )
+            await self.checkpoints.flush()
+            return None
+
+        async with in_transaction():
+            await Finding.filter(audit_id=self.audit.id).delete()
+            await self._write_findings(report)
+
+        self.report = report
+        return report
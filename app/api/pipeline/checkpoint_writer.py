@@ -0,0 +1,77 @@
+import asyncio
+
+from app.config import checkpoint_flush_interval
+from app.db.models import IntermediateResponse
+from app.utils.logger import get_logger
+
+logger = get_logger("worker")
+
+
+class CheckpointWriter:
+    """
+    Write-behind buffer for IntermediateResponse checkpoints. A checkpoint is
+    upserted on (audit, prompt), so each transition is a single statement, and
+    checkpoints written within `flush_interval` of the first are coalesced into one
+    batch, keeping only the latest state of each prompt.
+
+    Durable writes wait until they're flushed, joining whichever checkpoints are
+    pending at the time. Other checkpoints aren't visible to readers until flushed,
+    so flush() must be awaited before the audit is reported as complete.
+    """
+
+    UPDATE_FIELDS = [
+        "status",
+        "result",
+        "processing_time_seconds",
+        "attempts",
+        "cache_key",
+        "updated_at",
+    ]
+
+    def __init__(self, flush_interval: float = checkpoint_flush_interval):
+        self.flush_interval = flush_interval
+        self.pending: dict[tuple, IntermediateResponse] = {}
+        self._scheduled: asyncio.Task | None = None
+        # batches are written in order, an older state never overwrites a newer one.
+        self._lock = asyncio.Lock()
+
+    async def write(self, checkpoint: IntermediateResponse, durable: bool = False):
+        self.pending[(checkpoint.audit_id, checkpoint.prompt_id)] = checkpoint
+
+        if durable or not self.flush_interval:
+            await self.flush()
+            return
+
+        if self._scheduled is None or self._scheduled.done():
+            self._scheduled = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._scheduled = None
+        try:
+            await self.flush()
+        except Exception as err:
+            # left pending, the next flush retries them.
+            logger.warning(f"unable to flush checkpoints: {err}")
+
+    async def flush(self):
+        if self._scheduled:
+            self._scheduled.cancel()
+            self._scheduled = None
+
+        async with self._lock:
+            # already written by the flush this one waited on.
+            if not self.pending:
+                return
+
+            batch, self.pending = self.pending, {}
+            try:
+                await IntermediateResponse.bulk_create(
+                    objects=list(batch.values()),
+                    on_conflict=["audit_id", "prompt_id"],
+                    update_fields=self.UPDATE_FIELDS,
+                )
+            except BaseException:
+                # states written in the meantime are newer, keep those.
+                self.pending = {**batch, **self.pending}
+                raise
@@ -0,0 +1,80 @@
+import asyncio
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from app.config import coalesce_ttl, redis_client
+from app.utils.logger import get_logger
+
+logger = get_logger("worker")
+
+
+class InflightAudits:
+    """
+    Claims on the cache keys of audits being generated, so that an identical audit
+    submitted meanwhile waits for the first one's result rather than running the
+    same LLM calls. A claim holds the id of the audit generating it, and expires
+    after `ttl` seconds in case its worker dies.
+    """
+
+    POLL_INTERVAL = 1.0  # seconds
+
+    def __init__(self, redis: Redis = redis_client, ttl: int = coalesce_ttl):
+        self.redis = redis
+        self.ttl = ttl
+
+    def _key(self, cache_key: str) -> str:
+        return f"inflight|{cache_key}"
+
+    async def claim(self, cache_key: str, audit_id: str) -> str | None:
+        """
+        Claims the cache key for `audit_id`. Returns None once claimed, or the id of
+        the audit already holding the claim.
+        """
+        key = self._key(cache_key)
+        try:
+            if await self.redis.set(key, audit_id, nx=True, ex=self.ttl):
+                return None
+            holder = await self.redis.get(key)
+        except RedisError as err:
+            # identical audits may run twice, rather than not at all.
+            logger.warning(f"unable to claim in-flight audit: {err}")
+            return None
+
+        # released in the meantime.
+        if holder is None:
+            return await self.claim(cache_key, audit_id)
+        return holder.decode()
+
+    async def wait(self, cache_key: str, holder: str):
+        """Waits until `holder` releases its claim, or it expires."""
+        key = self._key(cache_key)
+        while True:
+            try:
+                current = await self.redis.get(key)
+            except RedisError as err:
+                logger.warning(f"unable to poll in-flight audit: {err}")
+                return
+            if current is None or current.decode() != holder:
+                return
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def release(self, cache_key: str, audit_id: str):
+        key = self._key(cache_key)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                # the claim may have expired, and been taken by another audit.
+                current = await pipe.get(key)
+                if current is None or current.decode() != audit_id:
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+        except WatchError:
+            pass
+        except RedisError as err:
+            logger.warning(f"unable to release in-flight audit: {err}")
+
+
+inflight_audits = InflightAudits()
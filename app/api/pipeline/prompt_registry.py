@@ -0,0 +1,126 @@
+import asyncio
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import redis_client
+from app.db.models import Prompt
+from app.utils.logger import get_logger
+from app.utils.types.enums import AuditTypeEnum
+
+logger = get_logger("worker")
+
+PROMPTS_CHANNEL = "prompts"
+
+
+class PromptRegistry:
+    """
+    In-process cache of the active prompts of each audit type, as
+    (candidates, reviewer). Prompts only change through admin edits, which publish
+    the audit type on the "prompts" channel to invalidate every process' cache.
+
+    Prompts are only cached while subscribed, otherwise an edit could go unnoticed,
+    so processes that never start() the registry query the database every time.
+    """
+
+    RESUBSCRIBE_DELAY = 1.0  # seconds
+
+    def __init__(self, redis: Redis = redis_client):
+        self.redis = redis
+        self.prompts: dict[AuditTypeEnum, tuple[list[Prompt], Prompt | None]] = {}
+        self.is_subscribed = False
+        # bumped on every invalidation, so a load that raced one isn't cached.
+        self._generation = 0
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+
+    async def _query(
+        self, audit_type: AuditTypeEnum
+    ) -> tuple[list[Prompt], Prompt | None]:
+        prompts = await Prompt.filter(audit_type=audit_type, is_active=True)
+        candidates = [prompt for prompt in prompts if prompt.tag != "reviewer"]
+        reviewer = next(
+            (prompt for prompt in prompts if prompt.tag == "reviewer"), None
+        )
+        return candidates, reviewer
+
+    async def get(
+        self, audit_type: AuditTypeEnum
+    ) -> tuple[list[Prompt], Prompt | None]:
+        if audit_type not in self.prompts:
+            generation = self._generation
+            prompts = await self._query(audit_type)
+            if not self.is_subscribed or generation != self._generation:
+                return prompts
+            self.prompts[audit_type] = prompts
+
+        candidates, reviewer = self.prompts[audit_type]
+        return list(candidates), reviewer
+
+    def invalidate(self, audit_type: AuditTypeEnum | None = None):
+        self._generation += 1
+        if audit_type is None:
+            self.prompts = {}
+        else:
+            self.prompts.pop(audit_type, None)
+
+    async def notify(self, audit_type: AuditTypeEnum):
+        """Invalidates the prompts of `audit_type` in every process."""
+        self.invalidate(audit_type)
+        try:
+            await self.redis.publish(PROMPTS_CHANNEL, AuditTypeEnum(audit_type).value)
+        except RedisError as err:
+            logger.warning(f"unable to publish prompt invalidation: {err}")
+
+    async def _subscribe(self):
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(PROMPTS_CHANNEL)
+        # edits may have been missed while unsubscribed.
+        self.invalidate()
+        self.is_subscribed = True
+
+    async def _unsubscribe(self):
+        self.is_subscribed = False
+        self.invalidate()
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except RedisError:
+                pass
+            self._pubsub = None
+
+    async def _listen(self):
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1
+                )
+                if message and message["type"] == "message":
+                    self.invalidate(AuditTypeEnum(message["data"].decode()))
+            except (RedisError, OSError) as err:
+                logger.warning(f"prompt registry unsubscribed, retrying: {err}")
+                await self._unsubscribe()
+                await asyncio.sleep(self.RESUBSCRIBE_DELAY)
+
+    async def start(self):
+        """Subscribes to prompt edits, and warms the cache of every audit type."""
+        try:
+            await self._subscribe()
+        except RedisError as err:
+            logger.warning(f"prompt registry unsubscribed, retrying: {err}")
+            await self._unsubscribe()
+        self._listener = asyncio.create_task(self._listen())
+
+        for audit_type in AuditTypeEnum:
+            await self.get(audit_type)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self._unsubscribe()
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import json
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.api.pipeline.audit_generation import LlmPipeline
+from app.api.pipeline.prompt_registry import prompt_registry
+from app.config import normalize_source, quote_cache_ttl, redis_client
+from app.db.models import Audit, Contract
+from app.utils.helpers.tokenizer import tokenizer_name
+from app.utils.logger import get_logger
+from app.utils.schema.llm import TokenQuote
+from app.utils.types.enums import AuditTypeEnum
+
+logger = get_logger("api")
+
+
+class QuoteEstimator:
+    """
+    Quotes the tokens an audit of a contract would use, by preparing its prompts as
+    the pipeline would, and counting their tokens locally. Quotes are cached in
+    redis per contract hash and active prompt set, as preparing a large source
+    takes a while.
+    """
+
+    def __init__(self, redis: Redis = redis_client, ttl: int = quote_cache_ttl):
+        self.redis = redis
+        self.ttl = ttl
+
+    def _cache_key(
+        self, contract: Contract, audit_type: AuditTypeEnum, prompts: list
+    ) -> str | None:
+        if not contract.hash_code:
+            return None
+
+        parts = [
+            contract.hash_code,
+            AuditTypeEnum(audit_type).value,
+            str(normalize_source),
+            tokenizer_name(),
+        ]
+        for prompt in sorted(prompts, key=lambda x: str(x.id)):
+            content_hash = hashlib.sha256(prompt.content.encode()).hexdigest()
+            parts.append(f"{prompt.id}:{prompt.version}:{content_hash}")
+
+        digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+        return f"quote|{digest}"
+
+    async def quote(self, contract: Contract, audit_type: AuditTypeEnum) -> TokenQuote:
+        candidates, reviewer = await prompt_registry.get(audit_type)
+        prompts = [*candidates, *([reviewer] if reviewer else [])]
+        key = self._cache_key(contract, audit_type, prompts)
+
+        if key:
+            try:
+                cached = await self.redis.get(key)
+                if cached:
+                    return TokenQuote(**json.loads(cached))
+            except RedisError as err:
+                logger.warning(f"unable to read cached quote: {err}")
+
+        # sources are stubbed, normalized and sharded on construction, off the loop.
+        pipeline = await asyncio.to_thread(
+            LlmPipeline,
+            audit=Audit(contract=contract, audit_type=audit_type),
+            input=contract.raw_code,
+        )
+        pipeline.candidate_prompts = candidates
+        pipeline.reviewer_prompt = reviewer
+        quote = await pipeline.quote()
+
+        if key:
+            try:
+                await self.redis.set(key, json.dumps(quote), ex=self.ttl)
+            except RedisError as err:
+                logger.warning(f"unable to cache quote: {err}")
+
+        return quote
+
+
+quote_estimator = QuoteEstimator()
@@ -32,14 +32,12 @@ class Usage:
         return max(floor_cost, math.ceil(credit_cost))
 
     @classmethod
-    def estimate_pricing(self):
-        standard_output_tokens = 5_000  # historically what we've seen per audit
-        standard_input_tokens = 22_000  # historically, given an ERC-20 input
-
-        compute_cost = (
-            standard_input_tokens * self.INPUT_COST
-            + standard_output_tokens * self.OUTPUT_COST
-        )
+    def estimate_pricing(
+        self,
+        input_tokens: int = 22_000,  # historically, given an ERC-20 input
+        output_tokens: int = 5_000,  # historically what we've seen per audit
+    ):
+        compute_cost = input_tokens * self.INPUT_COST + output_tokens * self.OUTPUT_COST
         base_compute = compute_cost / self.BASE_FACTOR
 
         token_value = base_compute / self.PRICE_PEG
@@ -20,6 +20,91 @@ redis_client = Redis(
     password=redis_settings.password,
 )
 
+# connections the API shares to enqueue jobs. Requests wait up to the timeout, in
+# seconds, for a free one.
+job_pool_size = int(os.getenv("JOB_POOL_SIZE", 10))
+job_pool_timeout = float(os.getenv("JOB_POOL_TIMEOUT", 5))
+
+# jobs run concurrently by a worker of each queue, see app/worker/queues.py.
+interactive_max_jobs = int(os.getenv("INTERACTIVE_MAX_JOBS", 10))
+bulk_max_jobs = int(os.getenv("BULK_MAX_JOBS", 4))
+scan_max_jobs = int(os.getenv("SCAN_MAX_JOBS", 2))
+
+# within a queue, every job of an app or user pushes its next ones back by the slot,
+# in seconds. Owners that have been quiet get ahead by up to the window.
+fair_share_slot = float(os.getenv("FAIR_SHARE_SLOT", 30))
+fair_share_window = float(os.getenv("FAIR_SHARE_WINDOW", 600))
+
+# networks scanned for deployments of verified contracts, every minute. Only blocks
+# this many confirmations deep are scanned, fetching receipts of SCAN_BATCH_SIZE
+# blocks per JSON-RPC batch with up to SCAN_CONCURRENCY batches at once, and at
+# most SCAN_MAX_BLOCKS per run while catching up.
+scan_networks = [
+    network.strip()
+    for network in os.getenv("SCAN_NETWORKS", "eth,eth_sepolia").split(",")
+    if network.strip()
+]
+scan_confirmations = int(os.getenv("SCAN_CONFIRMATIONS", 12))
+scan_batch_size = int(os.getenv("SCAN_BATCH_SIZE", 20))
+scan_concurrency = int(os.getenv("SCAN_CONCURRENCY", 5))
+scan_max_blocks = int(os.getenv("SCAN_MAX_BLOCKS", 500))
+
+# publish audit progress, including streamed LLM output, on the "evals" channel.
+stream_audits = os.getenv("STREAM_AUDITS", "false").lower() == "true"
+
+# strip comments, indentation and blank lines from source code before prompting.
+normalize_source = os.getenv("NORMALIZE_SOURCE", "true").lower() == "true"
+
+# send a second request for candidate calls slower than their recent p95 latency.
+# off by default, as the usage of cancelled requests is still billed by openai.
+hedge_candidates = os.getenv("HEDGE_CANDIDATES", "false").lower() == "true"
+
+# review once this many candidates succeeded (0 waits for all), rather than waiting
+# on the slowest. The deadline in seconds caps the wait, once any succeeded (0 for
+# none). Late candidates are either discarded, or folded into the delivered report
+# by a second review.
+candidate_quorum = int(os.getenv("CANDIDATE_QUORUM", 0))
+candidate_deadline = float(os.getenv("CANDIDATE_DEADLINE", 0))
+candidate_late_policy = os.getenv("CANDIDATE_LATE_POLICY", "discard")
+if candidate_late_policy not in ("discard", "rereview"):
+    raise ValueError(
+        f"CANDIDATE_LATE_POLICY must be discard or rereview: {candidate_late_policy}"
+    )
+
+# candidates answer with structured findings rather than free text, which are
+# merged locally into a compact digest for the reviewer. Requires candidate prompts
+# that don't ask for a specific format.
+structured_candidates = os.getenv("STRUCTURED_CANDIDATES", "false").lower() == "true"
+
+# an audit identical to one in flight waits for its result, rather than running
+# the same LLM calls. The claim expires after this many seconds, arq's default job
+# timeout, in case the worker running it dies.
+coalesce_ttl = int(os.getenv("COALESCE_TTL", 300))
+
+# intermediate responses written within this many seconds of each other are batched
+# into a single write (0 writes each immediately). Always flushed before an audit
+# completes.
+checkpoint_flush_interval = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", 0.5))
+
+# when looking up an address without a network, only query the explorers of the
+# networks it has bytecode on, as reported by their RPC providers. Requires
+# ALCHEMY_API_KEY, every explorer is queried otherwise.
+detect_networks = os.getenv("DETECT_NETWORKS", "true").lower() == "true" and bool(
+    os.getenv("ALCHEMY_API_KEY")
+)
+
+# requests per second to each explorer host, shared by every process. 5 is the
+# quota of free etherscan-like API keys.
+explorer_rps = int(os.getenv("EXPLORER_RPS", 5))
+
+# explorer responses are cached per network and address, for this many seconds when
+# source code is verified, or the negative TTL when it isn't.
+explorer_cache_ttl = int(os.getenv("EXPLORER_CACHE_TTL", 604_800))
+explorer_negative_cache_ttl = int(os.getenv("EXPLORER_NEGATIVE_CACHE_TTL", 600))
+
+# audit quotes are cached per contract hash and prompt set, for this many seconds.
+quote_cache_ttl = int(os.getenv("QUOTE_CACHE_TTL", 86_400))
+
 db_user = os.getenv("POSTGRES_USER")
 db_pswd = os.getenv("POSTGRES_PASSWORD")
 db_name = os.getenv("POSTGRES_DB")
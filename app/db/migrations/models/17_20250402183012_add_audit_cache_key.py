@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "audit" ADD "cache_key" VARCHAR(64);
+        CREATE INDEX IF NOT EXISTS "idx_audit_cache_k_7cc377" ON "audit" ("cache_key");
+        COMMENT ON COLUMN "audit"."cache_key" IS 'digest of the pipeline inputs, used to reuse prior results';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_audit_cache_k_7cc377";
+        ALTER TABLE "audit" DROP COLUMN "cache_key";"""
@@ -0,0 +1,12 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "intermediate_response" ADD "attempts" JSONB;
+        COMMENT ON COLUMN "intermediate_response"."attempts" IS 'per attempt outcome of the LLM calls';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "intermediate_response" DROP COLUMN "attempts";"""
@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "intermediate_response" ADD "cache_key" VARCHAR(64);
+        CREATE INDEX IF NOT EXISTS "idx_intermediat_cache_k_b07f68" ON "intermediate_response" ("cache_key");
+        COMMENT ON COLUMN "intermediate_response"."cache_key" IS 'digest of the candidate inputs, used to reuse prior responses';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_intermediat_cache_k_b07f68";
+        ALTER TABLE "intermediate_response" DROP COLUMN "cache_key";"""
@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "intermediate_response" AS "older"
+            USING "intermediate_response" AS "newer"
+            WHERE "older"."audit_id" = "newer"."audit_id"
+            AND "older"."prompt_id" = "newer"."prompt_id"
+            AND "older"."updated_at" < "newer"."updated_at";
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_intermediat_audit_i_169c6c" ON "intermediate_response" ("audit_id", "prompt_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_intermediat_audit_i_169c6c";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "audit" ADD "markdown" TEXT;
+        ALTER TABLE "audit" ADD "markdown_version" VARCHAR(16);
+        COMMENT ON COLUMN "audit"."markdown" IS 'report rendered from raw_output';
+        COMMENT ON COLUMN "audit"."markdown_version" IS 'template version the markdown was rendered with';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "audit" DROP COLUMN "markdown";
+        ALTER TABLE "audit" DROP COLUMN "markdown_version";"""
@@ -178,6 +178,21 @@ class Audit(AbstractModel):
         enum_type=AuditStatusEnum, null=True, default=AuditStatusEnum.WAITING
     )
     raw_output = fields.TextField(null=True, default=None)
+    cache_key = fields.CharField(
+        max_length=64,
+        null=True,
+        default=None,
+        description="digest of the pipeline inputs, used to reuse prior results",
+    )
+    markdown = fields.TextField(
+        null=True, default=None, description="report rendered from raw_output"
+    )
+    markdown_version = fields.CharField(
+        max_length=16,
+        null=True,
+        default=None,
+        description="template version the markdown was rendered with",
+    )
 
     intermediate_responses: fields.ReverseRelation["IntermediateResponse"]
     findings: fields.ReverseRelation["Finding"]
@@ -189,6 +204,7 @@ class Audit(AbstractModel):
             ("user_id", "audit_type", "contract_id"),
             ("user_id", "audit_type"),
             ("audit_type", "contract_id"),
+            ("cache_key",),
         )
 
     def __str__(self):
@@ -205,6 +221,14 @@ class IntermediateResponse(AbstractModel):
     )
     processing_time_seconds = fields.IntField(null=True, default=None)
     result = fields.TextField(null=True, default=None)
+    attempts = fields.JSONField(
+        null=True, default=None, description="per attempt outcome of the LLM calls"
+    )
+    cache_key = fields.CharField(
+        max_length=64,
+        null=True,
+        description="digest of the candidate inputs, used to reuse prior responses",
+    )
     prompt: fields.ForeignKeyNullableRelation["Prompt"] = fields.ForeignKeyField(
         "models.Prompt",
         on_delete=fields.SET_NULL,
@@ -214,6 +238,9 @@ class IntermediateResponse(AbstractModel):
 
     class Meta:
         table = "intermediate_response"
+        indexes = (("cache_key",),)
+        # checkpoints are upserted on it.
+        unique_together = (("audit", "prompt"),)
 
     def __str__(self):
         return f"{str(self.id)} | {self.audit_id}"
@@ -1,5 +1,12 @@
-from .explorer import ExplorerClient
-from .llm import llm_client
-from .web3 import Web3Client
+from .explorer import ExplorerClient, source_code_cache
+from .llm import llm_client, llm_limiter
+from .web3 import Web3Client, close_providers
 
-__all__ = ["ExplorerClient", "llm_client", "Web3Client"]
+__all__ = [
+    "close_providers",
+    "ExplorerClient",
+    "llm_client",
+    "llm_limiter",
+    "source_code_cache",
+    "Web3Client",
+]
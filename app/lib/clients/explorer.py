@@ -2,16 +2,52 @@ from urllib.parse import urlencode
 
 import httpx
 
+from app.config import explorer_rps
+from app.prometheus import prom_logger
 from app.utils.constants.mappers import (
     network_chainid_mapper,
     network_explorer_apikey_mapper,
     network_explorer_mapper,
     networks_by_type,
 )
+from app.utils.helpers.rate_limit import RateLimiter
+from app.utils.helpers.source_code_cache import SourceCodeCache
+from app.utils.logger import get_logger
 from app.utils.types.enums import NetworkEnum, NetworkTypeEnum
 
+logger = get_logger("api")
+
+# shared by every API and worker process.
+source_code_cache = SourceCodeCache()
+
+# per explorer host, as quotas are enforced per API key, and so per host.
+explorer_limiters = {
+    host: RateLimiter(name=host, rpm=explorer_rps, window=1, prefix="explorer_limit")
+    for host in set(network_explorer_mapper.values())
+}
+
+
+def _is_rate_limited(response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    # rejections are small, unlike source code.
+    if response.status_code != 200 or len(response.content) > 1024:
+        return False
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    # ie. "Max calls per sec rate limit reached (5/sec)"
+    return (
+        isinstance(data, dict)
+        and data.get("status") == "0"
+        and "rate limit" in str(data.get("result")).lower()
+    )
+
 
 class ExplorerClient:
+    # rejected requests are retried, once the explorer's quota is available again.
+    MAX_RETRIES = 3
 
     def _get_base_url(self, network: NetworkEnum) -> str:
         platform_route = network_explorer_mapper[network]
@@ -43,7 +79,14 @@ class ExplorerClient:
         url = self._get_base_url(network=network)
         params_encoded = urlencode(params)
 
-        return await client.get(f"{url}?{params_encoded}")
+        url = f"{url}?{params_encoded}"
+
+        return await source_code_cache.fetch(
+            url=url,
+            network=network,
+            address=address,
+            request=lambda: self._request(client, network=network, url=url),
+        )
 
     async def get_gas(
         self, client: httpx.AsyncClient, network: NetworkEnum
@@ -59,4 +102,28 @@ class ExplorerClient:
         url = self._get_base_url(network=network)
         params_encoded = urlencode(params)
 
-        return await client.get(f"{url}?${params_encoded}")
+        return await self._request(
+            client, network=network, url=f"{url}?{params_encoded}"
+        )
+
+    async def _request(
+        self, client: httpx.AsyncClient, network: NetworkEnum, url: str
+    ) -> httpx.Response:
+        """
+        Queues until the explorer's quota allows for the request, rather than
+        being rejected, as limiters are shared by every process calling it.
+        """
+        limiter = explorer_limiters[network_explorer_mapper[network]]
+
+        for _ in range(self.MAX_RETRIES):
+            await limiter.acquire()
+            response = await client.get(url)
+            if not _is_rate_limited(response):
+                return response
+
+            # ie. used by another app with the same key, hold every caller back.
+            prom_logger.rate_limit_rejections.labels(limiter=limiter.name).inc()
+            logger.warning(f"rate limited by {limiter.name}, retrying")
+            await limiter.block(limiter.window)
+
+        return response
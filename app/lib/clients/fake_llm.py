@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+
+from openai.lib.streaming.chat import ContentDeltaEvent
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionMessage,
+    ParsedChatCompletion,
+    ParsedChatCompletionMessage,
+    ParsedChoice,
+)
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+
+from app.utils.helpers.code_sharder import estimate_tokens
+from app.utils.schema.output import CandidateOutputStructure
+
+# used when no recordings are given. The reviewer output is valid for both the gas
+# and security output structures.
+DEFAULT_RECORDINGS = {
+    "candidates": [
+        "1. Unchecked return value of `token.transfer` in `withdraw()`, line 12.\n"
+        "2. State is updated after the external call in `withdraw()`, line 14, "
+        "allowing reentrancy.",
+        "No critical issues found. `owner` could be `immutable`, line 3.",
+    ],
+    "structured_candidates": [
+        json.dumps(
+            {
+                "findings": [
+                    {
+                        "severity": "medium",
+                        "name": "Unchecked transfer return value",
+                        "explanation": "The return value of `token.transfer` is "
+                        "ignored.",
+                        "reference": "line 12, `withdraw()`",
+                    },
+                    {
+                        "severity": "high",
+                        "name": "Reentrancy in withdraw",
+                        "explanation": "State is updated after the external call.",
+                        "reference": "line 14, `withdraw()`",
+                    },
+                ]
+            }
+        ),
+        json.dumps(
+            {
+                "findings": [
+                    {
+                        "severity": "high",
+                        "name": "Reentrancy in withdraw()",
+                        "explanation": "Balances are updated after the external "
+                        "call, so the caller can re-enter `withdraw()`.",
+                        "reference": "line 14",
+                    }
+                ]
+            }
+        ),
+    ],
+    "reviewer": [
+        json.dumps(
+            {
+                "introduction": "The contract holds user deposits.",
+                "scope": "All contracts in the submitted source.",
+                "findings": {
+                    "critical": [],
+                    "high": [
+                        {
+                            "name": "Reentrancy in withdraw",
+                            "explanation": "State is updated after the external "
+                            "call.",
+                            "recommendation": "Follow checks-effects-interactions.",
+                            "reference": "line 14, `withdraw()`",
+                        }
+                    ],
+                    "medium": [
+                        {
+                            "name": "Unchecked transfer",
+                            "explanation": "The return value is ignored.",
+                            "recommendation": "Use SafeERC20.",
+                            "reference": "line 12, `withdraw()`",
+                        }
+                    ],
+                    "low": [],
+                },
+                "conclusion": "One high and one medium severity issue.",
+            }
+        )
+    ],
+}
+
+
+class FakeCompletionStream:
+    def __init__(self, completion: ChatCompletion, latency: float, n_chunks: int):
+        self.completion = completion
+        self.latency = latency
+        self.n_chunks = n_chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def __aiter__(self):
+        content = self.completion.choices[0].message.content
+        size = max(len(content) // self.n_chunks, 1)
+        snapshot = ""
+        for i in range(0, len(content), size):
+            await asyncio.sleep(self.latency / self.n_chunks)
+            delta = content[i : i + size]
+            snapshot += delta
+            yield ContentDeltaEvent(
+                type="content.delta", delta=delta, snapshot=snapshot, parsed=None
+            )
+
+    async def get_final_completion(self):
+        return self.completion
+
+
+class FakeCompletions:
+    def __init__(self, client: "FakeLlmClient"):
+        self.client = client
+
+    async def create(self, **kwargs) -> ChatCompletion:
+        completion = self.client.complete(**kwargs)
+        await asyncio.sleep(self.client.sample_latency())
+        return completion
+
+    async def parse(self, **kwargs) -> ParsedChatCompletion:
+        completion = await self.create(**kwargs)
+        content = completion.choices[0].message.content
+        response_format = kwargs.get("response_format")
+        return ParsedChatCompletion(
+            **completion.model_dump(exclude={"choices"}),
+            choices=[
+                ParsedChoice(
+                    index=0,
+                    finish_reason="stop",
+                    message=ParsedChatCompletionMessage(
+                        role="assistant",
+                        content=content,
+                        parsed=(
+                            response_format.model_validate_json(content)
+                            if response_format
+                            else None
+                        ),
+                    ),
+                )
+            ],
+        )
+
+    def stream(self, **kwargs) -> FakeCompletionStream:
+        kwargs.pop("stream_options", None)
+        return FakeCompletionStream(
+            completion=self.client.complete(**kwargs),
+            latency=self.client.sample_latency(),
+            n_chunks=self.client.STREAM_CHUNKS,
+        )
+
+
+class FakeChat:
+    def __init__(self, client: "FakeLlmClient"):
+        self.completions = FakeCompletions(client)
+
+
+class FakeBeta:
+    def __init__(self, client: "FakeLlmClient"):
+        self.chat = FakeChat(client)
+
+
+class FakeLlmClient:
+    """
+    Offline stand-in for AsyncOpenAI, covering what the pipeline uses of it:
+    chat.completions.create(), beta.chat.completions.parse() and
+    beta.chat.completions.stream().
+
+    Replays recorded completions in order, keeping the reviewer's and structured
+    candidates' outputs apart from free text candidates'. Latency is sampled from a
+    log-normal distribution around `latency` seconds, and usage is derived from the
+    messages, so runs are reproducible for a given seed.
+    """
+
+    STREAM_CHUNKS = 20
+
+    def __init__(
+        self,
+        recordings: dict[str, list[str]] | None = None,
+        latency: float = 0.5,
+        latency_sigma: float = 0.5,
+        completion_tokens: int | None = None,
+        seed: int = 0,
+    ):
+        recordings = {**DEFAULT_RECORDINGS, **(recordings or {})}
+        self.candidates = itertools.cycle(recordings["candidates"])
+        self.structured_candidates = itertools.cycle(
+            recordings["structured_candidates"]
+        )
+        self.reviews = itertools.cycle(recordings["reviewer"])
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        # derived from the recorded content, unless fixed.
+        self.completion_tokens = completion_tokens
+        self.random = random.Random(seed)
+
+        self.chat = FakeChat(self)
+        self.beta = FakeBeta(self)
+
+    @classmethod
+    def from_file(cls, path: str | None, **kwargs) -> "FakeLlmClient":
+        recordings = None
+        if path:
+            with open(path) as f:
+                recordings = json.load(f)
+        return cls(recordings=recordings, **kwargs)
+
+    def sample_latency(self) -> float:
+        if not self.latency:
+            return 0
+        return self.random.lognormvariate(0, self.latency_sigma) * self.latency
+
+    def complete(self, **kwargs) -> ChatCompletion:
+        response_format = kwargs.get("response_format")
+        if response_format is None:
+            content = next(self.candidates)
+        elif response_format is CandidateOutputStructure:
+            content = next(self.structured_candidates)
+        else:
+            content = next(self.reviews)
+
+        prompt_tokens = sum(
+            estimate_tokens(message["content"]) for message in kwargs["messages"]
+        )
+        completion_tokens = self.completion_tokens or estimate_tokens(content)
+
+        return ChatCompletion(
+            id=f"fake-{uuid.uuid4()}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=kwargs["model"],
+            choices=[
+                Choice(
+                    index=0,
+                    finish_reason="stop",
+                    message=ChatCompletionMessage(role="assistant", content=content),
+                )
+            ],
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
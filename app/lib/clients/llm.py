@@ -1,9 +1,44 @@
 import os
 
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
-llm_client = AsyncOpenAI(
-    organization=os.getenv("OPENAI_ORG_ID"),
-    project=os.getenv("OPENAI_PROJECT_ID"),
-    api_key=os.getenv("OPENAI_API_KEY"),
+from app.lib.clients.fake_llm import FakeLlmClient
+from app.utils.helpers.rate_limit import RateLimiter
+
+# shared by every worker process. Defaults are conservative, the actual limits are
+# learned from the x-ratelimit-* response headers.
+llm_limiter = RateLimiter(
+    name="openai",
+    rpm=int(os.getenv("OPENAI_RPM_LIMIT", 500)),
+    tpm=int(os.getenv("OPENAI_TPM_LIMIT", 200_000)),
 )
+
+
+async def _adapt_rate_limits(response: httpx.Response):
+    await llm_limiter.adapt(response.headers)
+
+
+# "openai", or "fake" to replay recorded completions offline, ie. for benchmarks.
+llm_backend = os.getenv("LLM_BACKEND", "openai")
+
+if llm_backend == "openai":
+    llm_client = AsyncOpenAI(
+        organization=os.getenv("OPENAI_ORG_ID"),
+        project=os.getenv("OPENAI_PROJECT_ID"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # retries are handled by the pipeline, with backoff and hedging.
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            event_hooks={"response": [_adapt_rate_limits]}
+        ),
+    )
+elif llm_backend == "fake":
+    llm_client = FakeLlmClient.from_file(
+        os.getenv("FAKE_LLM_RECORDINGS"),
+        latency=float(os.getenv("FAKE_LLM_LATENCY", 0.5)),
+        latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.5)),
+        seed=int(os.getenv("FAKE_LLM_SEED", 0)),
+    )
+else:
+    raise ValueError(f"LLM_BACKEND must be openai or fake: {llm_backend}")
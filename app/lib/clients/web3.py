@@ -1,4 +1,5 @@
 import os
+from typing import Iterable
 
 from eth_typing import BlockNumber
 from web3 import AsyncWeb3
@@ -10,6 +11,25 @@ from app.utils.types.enums import NetworkEnum
 
 logger = get_logger("api")
 
+# providers are shared per RPC url, so that clients reuse their session, and its
+# keep-alive connections, rather than opening new ones on every instantiation.
+_providers: dict[str, AsyncWeb3] = {}
+
+
+def _get_pooled_provider(url: str) -> AsyncWeb3:
+    provider = _providers.get(url)
+    if provider is None:
+        provider = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+        _providers[url] = provider
+    return provider
+
+
+async def close_providers():
+    """Closes the sessions of pooled providers, on shutdown."""
+    for provider in _providers.values():
+        await provider.provider.disconnect()
+    _providers.clear()
+
 
 class Web3Client:
 
@@ -19,7 +39,8 @@ class Web3Client:
 
     @classmethod
     def from_deployment(cls):
-        instance = cls._new_(cls)
+        instance = cls.__new__(cls)
+        instance.ENV = os.getenv("RAILWAY_ENVIRONMENT_NAME", "development")
         instance.provider = instance.get_deployed_provider()
         return instance
 
@@ -33,7 +54,7 @@ class Web3Client:
     def _get_provider(self, network: NetworkEnum) -> AsyncWeb3:
         url = self._get_base_url(network)
 
-        return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+        return _get_pooled_provider(url)
 
     def get_deployed_provider(self) -> AsyncWeb3:
         url_mappper = {
@@ -44,7 +65,7 @@ class Web3Client:
 
         url = url_mappper[self.ENV]
 
-        return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+        return _get_pooled_provider(url)
 
     async def get_block_number(self) -> BlockNumber:
         block = await self.provider.eth.get_block_number()
@@ -54,6 +75,20 @@ class Web3Client:
         receipts = await self.provider.eth.get_block_receipts(block)
         return receipts
 
+    async def has_code(self, address: str) -> bool:
+        address = self.provider.to_checksum_address(address)
+        code = await self.provider.eth.get_code(address)
+        return len(code) > 0
+
+    async def get_blocks_receipts(
+        self, blocks: Iterable[BlockNumber]
+    ) -> list[BlockReceipts]:
+        """Receipts of each of the blocks, fetched in a single JSON-RPC batch."""
+        async with self.provider.batch_requests() as batch:
+            for block in blocks:
+                batch.add(self.provider.eth.get_block_receipts(block))
+            return await batch.async_execute()
+
     async def get_user_credits(self, user_address: str) -> int:
 
         contract_mapper = {
@@ -0,0 +1,16 @@
+import hashlib
+import json
+import os
+
+from app.utils.schema.llm import LibraryFingerprint
+
+# Content hashes of known, unmodified library files. Generated with
+# `python -m scripts.library_index`, see the README.
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "index.json")
+
+with open(INDEX_PATH, "rb") as f:
+    raw_index = f.read()
+
+library_index: dict[str, LibraryFingerprint] = json.loads(raw_index)
+# changes whenever the index does, as it determines what gets stubbed.
+library_index_digest = hashlib.sha256(raw_index).hexdigest()
@@ -1,11 +1,15 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
-from tortoise.contrib.fastapi import register_tortoise
+from tortoise.contrib.fastapi import RegisterTortoise
 
+from app.api.dependencies import create_job_pool
 from app.api.middlewares import PrometheusMiddleware
 from app.api.urls import router
 from app.config import TORTOISE_ORM
+from app.lib.clients import close_providers
 from app.openapi import OPENAPI_SCHEMA
 
 # from app.api.middlewares.auth import AuthenticationMiddleware
@@ -14,7 +18,19 @@ from app.openapi import OPENAPI_SCHEMA
 load_dotenv()
 
 
-app = FastAPI(debug=False, docs_url=None, redoc_url=None)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # a single pool to enqueue jobs on, rather than a connection per request.
+    app.state.job_pool = create_job_pool()
+    try:
+        async with orm:
+            yield
+    finally:
+        await app.state.job_pool.aclose(close_connection_pool=True)
+        await close_providers()
+
+
+app = FastAPI(debug=False, docs_url=None, redoc_url=None, lifespan=lifespan)
 
 
 def custom_openapi():
@@ -39,7 +55,7 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 
-register_tortoise(
+orm = RegisterTortoise(
     app=app, config=TORTOISE_ORM, generate_schemas=False, add_exception_handlers=True
 )
 
@@ -8,7 +8,20 @@ class PromLogger:
         # Intuitively a lot of these can be Counters, but I'm a bit limited
         # in terms of what Arq reports to me via its healthcheck
         self.tasks_info = Gauge(
-            "tasks_total", "Total number of tasks by type", ["type"]
+            "tasks_total", "Total number of tasks by type", ["type", "queue"]
+        )
+
+        self.queue_depth = Gauge(
+            "queue_depth",
+            "Jobs queued, including those scheduled behind other owners' jobs",
+            ["queue"],
+        )
+
+        self.queue_wait = Histogram(
+            "queue_wait_seconds",
+            "Time jobs waited in their queue until started in seconds",
+            ["queue"],
+            buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, INF),
         )
 
         self.tasks_enqueue_duration = Histogram(
@@ -58,5 +71,84 @@ class PromLogger:
 
         self.websockets = Gauge("websockets_active_total", "Total active websockets")
 
+        # Pipeline metrics
+        self.audit_cache = Counter(
+            "audit_cache_requests_total",
+            "Audit result cache lookups",
+            ["result"],
+        )
+
+        self.candidate_memo = Counter(
+            "candidate_memo_requests_total",
+            "Candidate response memoization lookups",
+            ["result"],
+        )
+
+        self.resumed_steps = Counter(
+            "resumed_steps_total",
+            "Steps reused from the checkpoints of an interrupted audit",
+        )
+
+        self.library_stub_bytes = Counter(
+            "library_stub_bytes_saved_total",
+            "Input bytes removed by stubbing known library files",
+        )
+
+        self.library_stub_tokens = Counter(
+            "library_stub_tokens_saved_total",
+            "Estimated input tokens removed by stubbing known library files",
+        )
+
+        self.source_compression = Histogram(
+            "source_compression_ratio",
+            "Size of normalized source code relative to the original",
+            buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+        )
+
+        self.explorer_cache = Counter(
+            "explorer_cache_requests_total",
+            "Explorer source code cache lookups",
+            ["result"],
+        )
+
+        # Deployment scanner metrics
+        self.scan_blocks = Counter(
+            "scan_blocks_total",
+            "Blocks scanned for contract deployments",
+            ["network"],
+        )
+
+        self.scan_rate = Gauge(
+            "scan_blocks_per_second",
+            "Blocks scanned per second by the last scan",
+            ["network"],
+        )
+
+        self.scan_lag = Gauge(
+            "scan_lag_blocks",
+            "Blocks between the chain head and the last one scanned",
+            ["network"],
+        )
+
+        # Rate limiting metrics, for outbound calls to third parties
+        self.rate_limit_queue_depth = Gauge(
+            "rate_limit_queue_depth",
+            "Calls currently queued by a rate limiter",
+            ["limiter"],
+        )
+
+        self.rate_limit_wait = Histogram(
+            "rate_limit_wait_seconds",
+            "Time spent queued by a rate limiter in seconds",
+            ["limiter"],
+            buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, INF),
+        )
+
+        self.rate_limit_rejections = Counter(
+            "rate_limit_rejections_total",
+            "Calls rejected by the third party for exceeding its rate limit",
+            ["limiter"],
+        )
+
 
 prom_logger = PromLogger()
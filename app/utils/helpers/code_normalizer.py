@@ -0,0 +1,125 @@
+import re
+
+from app.utils.helpers.code_sharder import FILE_MARKER
+from app.utils.helpers.library_detector import LIBRARY_STUB
+
+# comments that carry meaning for the model.
+PRESERVED_COMMENTS = (FILE_MARKER, LIBRARY_STUB)
+
+# "Line 42", "lines 10-12", "line #7", ...
+LINE_REFERENCE = re.compile(
+    r"\b(lines?\s*#?)(\d+)(?:(\s*[-–]\s*)(\d+))?", re.IGNORECASE
+)
+
+
+def compose_line_maps(outer: list[int], inner: list[int]) -> list[int]:
+    """
+    Composes line maps of two consecutive stages, where `outer` maps the output of
+    the latter stage onto the output of the former, and `inner` maps that onto the
+    original source.
+    """
+    return [inner[line - 1] for line in outer]
+
+
+def remap_line_references(text: str, line_map: list[int]) -> str:
+    """
+    Rewrites line numbers referenced in `text` through the line map. References
+    outside of the map are left as is.
+    """
+
+    def resolve(line: str) -> str:
+        n = int(line)
+        if 1 <= n <= len(line_map):
+            return str(line_map[n - 1])
+        return line
+
+    def replace(match: re.Match) -> str:
+        prefix, start, sep, end = match.groups()
+        remapped = f"{prefix}{resolve(start)}"
+        if end:
+            remapped += f"{sep}{resolve(end)}"
+        return remapped
+
+    return LINE_REFERENCE.sub(replace, text)
+
+
+class SourceNormalizer:
+    """
+    Compacts source code before prompting. Comments (including NatSpec and SPDX
+    banners), indentation and blank lines are removed, none of which affect the
+    semantics the model reasons about. File markers and library stubs are kept.
+
+    Keeps a line map, so line numbers referencing the compacted source can be
+    resolved to the original.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.normalized = source
+        # original (1-indexed) line number of every line in the normalized output.
+        self.line_map = list(range(1, source.count("\n") + 2))
+
+    def _strip_comments(self) -> str:
+        """
+        Removes comments, while preserving the line count. Comment markers inside
+        strings are skipped.
+        """
+        output: list[str] = []
+        source = self.source
+        i = 0
+        n = len(source)
+
+        while i < n:
+            char = source[i]
+            nxt = source[i + 1] if i + 1 < n else ""
+
+            if char == "/" and nxt == "/":
+                end = source.find("\n", i)
+                end = n if end == -1 else end
+                line_start = source.rfind("\n", 0, i) + 1
+                if any(
+                    pattern.match(source, line_start, end)
+                    for pattern in PRESERVED_COMMENTS
+                ):
+                    output.append(source[i:end])
+                i = end
+                continue
+            if char == "/" and nxt == "*":
+                end = source.find("*/", i + 2)
+                end = n if end == -1 else end + 2
+                output.append("\n" * source.count("\n", i, end))
+                i = end
+                continue
+            if char in "\"'":
+                j = i + 1
+                while j < n and source[j] != char and source[j] != "\n":
+                    j += 2 if source[j] == "\\" else 1
+                output.append(source[i : j + 1])
+                i = j + 1
+                continue
+
+            output.append(char)
+            i += 1
+
+        return "".join(output)
+
+    def normalize(self) -> str:
+        output: list[str] = []
+        line_map: list[int] = []
+
+        for i, line in enumerate(self._strip_comments().split("\n")):
+            line = line.strip()
+            if not line:
+                continue
+            output.append(line)
+            line_map.append(i + 1)
+
+        self.normalized = "\n".join(output)
+        self.line_map = line_map
+        return self.normalized
+
+    @property
+    def compression_ratio(self) -> float:
+        if not self.source:
+            return 1.0
+        return len(self.normalized) / len(self.source)
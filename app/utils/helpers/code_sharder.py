@@ -0,0 +1,301 @@
+import re
+
+from app.utils.schema.llm import SourceShard
+
+FILE_MARKER = re.compile(r"^// File: (.+)$", re.MULTILINE)
+
+HEADER_KEYWORDS = ("pragma", "import")
+INTERFACE_KEYWORD = "interface"
+
+
+def split_files(source: str) -> list[tuple[str, str, tuple[int, int]]]:
+    """
+    Splits aggregated source code on its "// File: <path>" markers. Returns the path,
+    content and span of content within the source, for every file.
+    """
+    matches = list(FILE_MARKER.finditer(source))
+    if not matches:
+        return [("", source, (0, len(source)))]
+
+    files = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(source)
+        files.append(
+            (match.group(1).strip(), source[match.end() : end], (match.end(), end))
+        )
+
+    return files
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for solidity source on the o200k/cl100k encodings.
+    return len(text) // 4 + 1
+
+
+TRUNCATION_NOTE = "\n[truncated]"
+
+
+def fit_to_budget(texts: list[str], token_budget: int) -> list[str]:
+    """
+    Truncates texts so that together they fit within the token budget. The budget is
+    split evenly, and whatever a short text doesn't use is shared among the longer
+    ones. Texts are cut on a line boundary where possible.
+    """
+    if sum(estimate_tokens(text) for text in texts) <= token_budget:
+        return texts
+
+    fitted = list(texts)
+    remaining = token_budget
+    by_size = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for n, i in enumerate(by_size):
+        share = remaining // (len(texts) - n)
+        text = texts[i]
+        if estimate_tokens(text) > share:
+            limit = max(share * 4 - len(TRUNCATION_NOTE), 0)
+            cut = text.rfind("\n", 0, limit)
+            text = text[: cut if cut > 0 else limit] + TRUNCATION_NOTE
+        fitted[i] = text
+        remaining -= estimate_tokens(text)
+
+    return fitted
+
+
+class SourceCodeSharder:
+    """
+    Splits aggregated source code (as produced by SourceCodeParser) into shards that
+    each fit within a token budget. Every shard is prefixed by a shared header of
+    pragmas, imports and interfaces, so definitions stay resolvable in isolation.
+
+    Source code that fits within the budget is returned as a single, untouched shard.
+    """
+
+    def __init__(self, source: str, token_budget: int):
+        self.source = source
+        self.token_budget = token_budget
+
+    def _split_files(self) -> list[tuple[str, str, int]]:
+        files = []
+        for path, content, (start, _) in split_files(self.source):
+            # offset of the stripped content within the source.
+            offset = start + len(content) - len(content.lstrip())
+            files.append((path, content.strip(), offset))
+        return files
+
+    def _line_number(self, offset: int) -> int:
+        return self.source.count("\n", 0, offset) + 1
+
+    def _split_statements(self, content: str) -> list[str]:
+        """
+        Splits a file into its top-level statements, ie pragmas, imports and
+        contract / interface / library definitions. Leading comments are kept with
+        the statement that follows them. Braces inside comments and strings are
+        skipped.
+        """
+        statements = []
+        depth = 0
+        start = 0
+        i = 0
+        n = len(content)
+
+        while i < n:
+            char = content[i]
+            nxt = content[i + 1] if i + 1 < n else ""
+
+            if char == "/" and nxt == "/":
+                end = content.find("\n", i)
+                i = n if end == -1 else end
+                continue
+            if char == "/" and nxt == "*":
+                end = content.find("*/", i + 2)
+                i = n if end == -1 else end + 2
+                continue
+            if char in "\"'":
+                j = i + 1
+                while j < n and content[j] != char:
+                    j += 2 if content[j] == "\\" else 1
+                i = j + 1
+                continue
+
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    statements.append(content[start : i + 1].strip())
+                    start = i + 1
+            elif char == ";" and depth == 0:
+                statements.append(content[start : i + 1].strip())
+                start = i + 1
+
+            i += 1
+
+        remainder = content[start:].strip()
+        if remainder:
+            statements.append(remainder)
+
+        return statements
+
+    def _strip_leading_comments(self, statement: str) -> str:
+        lines = statement.splitlines()
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if line and not line.startswith(("//", "/*", "*")):
+                return "\n".join(lines[i:])
+        return ""
+
+    def _keyword(self, statement: str) -> str:
+        words = self._strip_leading_comments(statement).split()
+        if not words:
+            return ""
+        if words[0] == "abstract" and len(words) > 1:
+            return words[1]
+        return words[0]
+
+    def _chunk_lines(self, text: str, line: int, budget: int) -> list[tuple[str, int]]:
+        """Splits text starting at source line `line` into chunks of whole lines."""
+        chunks = []
+        current: list[str] = []
+        n_current = 0
+        for i, text_line in enumerate(text.split("\n")):
+            n_line = estimate_tokens(text_line)
+            if current and n_current + n_line > budget:
+                chunks.append(("\n".join(current), line + i - len(current)))
+                current = []
+                n_current = 0
+            current.append(text_line)
+            n_current += n_line
+        if current:
+            chunks.append(
+                ("\n".join(current), line + len(text.split("\n")) - len(current))
+            )
+        return chunks
+
+    def shard(self) -> list[SourceShard]:
+        n_tokens = estimate_tokens(self.source)
+        files = self._split_files()
+
+        if n_tokens <= self.token_budget:
+            return [
+                SourceShard(
+                    files=[path for path, _, _ in files if path],
+                    content=self.source,
+                    n_tokens=n_tokens,
+                    line_map=list(range(1, self.source.count("\n") + 2)),
+                )
+            ]
+
+        # statements are kept with the source line they start on.
+        header: list[tuple[str, int]] = []
+        interfaces: list[tuple[str, str, int]] = []
+        units: list[tuple[str, str, int]] = []
+
+        for path, content, offset in files:
+            cursor = 0
+            for statement in self._split_statements(content):
+                cursor = content.find(statement, cursor)
+                line = self._line_number(offset + cursor)
+                cursor += len(statement)
+
+                keyword = self._keyword(statement)
+                if keyword in HEADER_KEYWORDS:
+                    # license banners and other comments aren't worth repeating.
+                    stripped = self._strip_leading_comments(statement)
+                    line += statement[: statement.find(stripped)].count("\n")
+                    if stripped not in [text for text, _ in header]:
+                        header.append((stripped, line))
+                elif keyword == INTERFACE_KEYWORD:
+                    interfaces.append((path, statement, line))
+                else:
+                    units.append((path, statement, line))
+
+        # interfaces are shared context, unless they'd crowd out the actual code.
+        shared = header + [(text, line) for _, text, line in interfaces]
+        if (
+            estimate_tokens("\n".join(text for text, _ in shared))
+            > self.token_budget // 2
+        ):
+            shared = header
+            units = interfaces + units
+
+        header_lines: list[tuple[str, int | None]] = []
+        for text, line in shared:
+            header_lines += self._numbered_lines(text, line)
+        header_content = "\n".join(text for text, _ in header_lines)
+
+        budget = self.token_budget - estimate_tokens(header_content)
+
+        shards: list[SourceShard] = []
+        current: list[tuple[str, str, int]] = []
+        n_current = 0
+
+        def flush():
+            if not current:
+                return
+            lines = header_lines + [("", None)]
+            cur_path = None
+            for path, text, line in current:
+                if path and path != cur_path:
+                    lines += [(f"// File: {path}", None), ("", None)]
+                    cur_path = path
+                lines += self._numbered_lines(text, line) + [("", None)]
+            # surrounding blank lines are dropped, as with strip().
+            while lines and not lines[0][0]:
+                lines.pop(0)
+            while lines and not lines[-1][0]:
+                lines.pop()
+
+            content = "\n".join(text for text, _ in lines)
+            shards.append(
+                SourceShard(
+                    files=list(dict.fromkeys(path for path, _, _ in current if path)),
+                    content=content,
+                    n_tokens=estimate_tokens(content),
+                    line_map=self._fill_line_map([line for _, line in lines]),
+                )
+            )
+
+        for path, text, line in units:
+            n_marker = estimate_tokens(f"// File: {path}\n\n")
+            n_unit = estimate_tokens(text) + n_marker
+            if n_unit > budget:
+                # a single definition exceeds the budget, fall back to line chunks.
+                for chunk, chunk_line in self._chunk_lines(
+                    text, line, budget - n_marker
+                ):
+                    flush()
+                    current = [(path, chunk, chunk_line)]
+                    n_current = estimate_tokens(chunk)
+                continue
+            if current and n_current + n_unit > budget:
+                flush()
+                current = []
+                n_current = 0
+            current.append((path, text, line))
+            n_current += n_unit
+
+        flush()
+
+        return shards
+
+    def _numbered_lines(self, text: str, line: int) -> list[tuple[str, int | None]]:
+        return [(text_line, line + i) for i, text_line in enumerate(text.split("\n"))]
+
+    def _fill_line_map(self, lines: list[int | None]) -> list[int]:
+        """
+        Lines added by sharding (file markers, blank separators) take the number
+        of the next line from the source, or the previous one at the end.
+        """
+        line_map: list[int] = []
+        following = None
+        for line in reversed(lines):
+            following = line or following
+            line_map.append(following)
+        line_map.reverse()
+
+        preceding = 1
+        for i, line in enumerate(line_map):
+            if line is None:
+                line_map[i] = preceding
+            preceding = line_map[i]
+
+        return line_map
@@ -0,0 +1,75 @@
+import re
+
+from app.utils.schema.output import CandidateOutputStructure
+from app.utils.types.enums import FindingLevelEnum
+
+SEVERITY_RANK = {level: rank for rank, level in enumerate(FindingLevelEnum)}
+
+WORD = re.compile(r"[a-z0-9_]+")
+NUMBER = re.compile(r"\d+")
+
+# share of words two names need in common to be considered the same finding.
+NAME_SIMILARITY = 0.6
+
+
+def _words(text: str) -> set[str]:
+    return set(WORD.findall(text.lower()))
+
+
+def _is_duplicate(a: dict, b: dict) -> bool:
+    union = a["words"] | b["words"]
+    if not union or len(a["words"] & b["words"]) / len(union) < NAME_SIMILARITY:
+        return False
+    # both point at specific lines, but different ones.
+    if a["lines"] and b["lines"] and not a["lines"] & b["lines"]:
+        return False
+    return True
+
+
+def merge_findings(candidates: dict[int, CandidateOutputStructure]) -> list[dict]:
+    """
+    Pools the findings of every candidate, keyed by auditor number, and merges
+    near-duplicates: findings whose names share most of their words, and whose
+    references don't point at different lines. A merged finding keeps the highest
+    severity and the longest explanation, and lists every auditor that reported
+    it. Sorted by severity, then by how many auditors reported it.
+    """
+    merged: list[dict] = []
+    for auditor, output in sorted(candidates.items()):
+        for finding in output.findings:
+            entry = {
+                "words": _words(finding.name),
+                "lines": set(NUMBER.findall(finding.reference)),
+                "severity": finding.severity,
+                "name": finding.name,
+                "explanation": finding.explanation,
+                "reference": finding.reference,
+                "auditors": [auditor],
+            }
+
+            duplicate = next((m for m in merged if _is_duplicate(m, entry)), None)
+            if duplicate is None:
+                merged.append(entry)
+                continue
+
+            if auditor not in duplicate["auditors"]:
+                duplicate["auditors"].append(auditor)
+            duplicate["lines"] |= entry["lines"]
+            if SEVERITY_RANK[entry["severity"]] < SEVERITY_RANK[duplicate["severity"]]:
+                duplicate["severity"] = entry["severity"]
+            if len(entry["explanation"]) > len(duplicate["explanation"]):
+                duplicate["explanation"] = entry["explanation"]
+                duplicate["reference"] = entry["reference"]
+
+    merged.sort(key=lambda m: (SEVERITY_RANK[m["severity"]], -len(m["auditors"])))
+
+    return [
+        {
+            "severity": m["severity"].value,
+            "name": m["name"],
+            "explanation": m["explanation"],
+            "reference": m["reference"],
+            "auditors": m["auditors"],
+        }
+        for m in merged
+    ]
@@ -0,0 +1,41 @@
+import re
+from typing import TypeVar
+
+from app.utils.schema.output import GasOutputStructure, SecurityOutputStructure
+
+OutputStructure = TypeVar(
+    "OutputStructure", GasOutputStructure, SecurityOutputStructure
+)
+
+# the reviewer is asked to wrap code in <<...>>, rendered as markdown code spans. A
+# span can't cross an unescaped quote, so it never spans two JSON strings.
+CODE_SPAN = re.compile(r'<<((?:[^"\\\n]|\\.)*?)>>')
+
+
+def _render_code_span(match: re.Match) -> str:
+    return f"`{match[1]}`"
+
+
+def decode_findings(
+    raw: str, output_structure: type[OutputStructure]
+) -> OutputStructure:
+    """
+    Decodes a reviewer's output into `output_structure`. Text before the first "{"
+    or after the last "}" is ignored, as the reviewer occasionally adds some, and
+    <<code>> spans are rendered in the same pass over the text. The JSON is then
+    parsed and validated at once by pydantic-core, without an intermediate dict.
+
+    Raises a ValueError (ie. pydantic's ValidationError) if the output is invalid.
+    """
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in the reviewer output")
+    # only copy when there's text to skip, the output usually is the object.
+    if start or end != len(raw) - 1:
+        raw = raw[start : end + 1]
+
+    if "<<" in raw:
+        raw = CODE_SPAN.sub(_render_code_span, raw)
+
+    return output_structure.model_validate_json(raw)
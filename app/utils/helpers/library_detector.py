@@ -0,0 +1,89 @@
+import hashlib
+import re
+
+from app.lib.libraries import library_index
+from app.utils.helpers.code_sharder import estimate_tokens, split_files
+from app.utils.schema.llm import LibraryFingerprint
+
+LIBRARY_STUB = re.compile(r"^// (.+), unmodified$", re.MULTILINE)
+
+
+def fingerprint(content: str) -> str:
+    """
+    Content hash of a source file, insensitive to line endings and trailing
+    whitespace, which explorers don't preserve consistently.
+    """
+    lines = content.replace("\r\n", "\n").strip().split("\n")
+    normalized = "\n".join(line.rstrip() for line in lines)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class LibraryDetector:
+    """
+    Replaces vendored, unmodified library files (OpenZeppelin, Solmate, ...) with a
+    one-line stub. These are well known to the model, and otherwise dominate the
+    input tokens of most verified contracts.
+    """
+
+    def __init__(self, source: str, index: dict[str, LibraryFingerprint] | None = None):
+        self.source = source
+        self.index = library_index if index is None else index
+        self.matches: list[LibraryFingerprint] = []
+        self.stubbed = source
+        # original (1-indexed) line number of every line in the stubbed output.
+        self.line_map = list(range(1, source.count("\n") + 2))
+
+    def stub(self) -> str:
+        if not self.index:
+            return self.source
+
+        lines = self.source.split("\n")
+        # first content line of a matched file -> (line after its content, stub).
+        replaced: dict[int, tuple[int, str]] = {}
+        for path, content, (start, end) in split_files(self.source):
+            if not path:
+                # single file source, there's nothing vendored to strip.
+                continue
+
+            match = self.index.get(fingerprint(content))
+            if not match:
+                continue
+
+            self.matches.append(match)
+            first = self.source.count("\n", 0, start) + 1
+            last = (
+                self.source.count("\n", 0, end)
+                if end < len(self.source)
+                else len(lines)
+            )
+            stub = f"{match['library']} {match['path']} v{match['version']}"
+            replaced[first] = (last, f"// {stub}, unmodified")
+
+        if not self.matches:
+            return self.source
+
+        output: list[str] = []
+        line_map: list[int] = []
+        i = 0
+        while i < len(lines):
+            if i in replaced:
+                last, stub = replaced[i]
+                output.extend(["", stub, ""])
+                line_map.extend([i + 1] * 3)
+                i = last
+                continue
+            output.append(lines[i])
+            line_map.append(i + 1)
+            i += 1
+
+        self.stubbed = "\n".join(output)
+        self.line_map = line_map
+        return self.stubbed
+
+    @property
+    def bytes_saved(self) -> int:
+        return len(self.source.encode()) - len(self.stubbed.encode())
+
+    @property
+    def tokens_saved(self) -> int:
+        return estimate_tokens(self.source) - estimate_tokens(self.stubbed)
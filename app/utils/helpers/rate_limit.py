@@ -0,0 +1,178 @@
+import asyncio
+import random
+import re
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import redis_client
+from app.prometheus import prom_logger
+from app.utils.logger import get_logger
+
+logger = get_logger("worker")
+
+# "1s", "6m0s", "120ms", "1h2m3.5s"
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset_duration(value: str | None) -> float | None:
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class RateLimiter:
+    """
+    Fixed window limiter on requests and tokens per minute, or per `window` seconds,
+    shared across processes through Redis. acquire() queues the caller until the
+    current window has capacity, rather than failing.
+
+    Limits start from the configured values, and are adapted to what the provider
+    reports via adapt(), ie. OpenAI's x-ratelimit-* response headers. If Redis is
+    unavailable, calls are let through.
+    """
+
+    WINDOW_SECONDS = 60
+    # limits learned from response headers are re-learned periodically.
+    LIMITS_TTL = 3600
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int,
+        tpm: int | None = None,
+        redis: Redis = redis_client,
+        window: int = WINDOW_SECONDS,
+        prefix: str = "llm_limit",
+    ):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.redis = redis
+        self.window = window
+        self.prefix = prefix
+        # callers of this process currently waiting for capacity.
+        self.n_queued = 0
+
+    def _key(self, *parts) -> str:
+        return "|".join([self.prefix, self.name, *map(str, parts)])
+
+    async def _get_limits(self) -> tuple[int, int | None]:
+        limits = await self.redis.hgetall(self._key("limits"))
+        rpm = int(limits.get(b"rpm", self.rpm))
+        tpm = int(limits[b"tpm"]) if b"tpm" in limits else self.tpm
+        return rpm, tpm
+
+    async def _try_acquire(self, tokens: int) -> float:
+        """
+        Reserves capacity in the current window. Returns 0 on success, otherwise
+        the number of seconds to wait before trying again.
+        """
+        blocked_ms = await self.redis.pttl(self._key("blocked"))
+        if blocked_ms > 0:
+            return blocked_ms / 1000
+
+        rpm, tpm = await self._get_limits()
+        if tpm:
+            # a single request can never exceed the entire budget.
+            tokens = min(tokens, tpm)
+
+        now = time.time()
+        window = int(now // self.window)
+        requests_key = self._key("requests", window)
+        tokens_key = self._key("tokens", window)
+
+        pipe = self.redis.pipeline()
+        pipe.incr(requests_key)
+        pipe.incrby(tokens_key, tokens)
+        pipe.expire(requests_key, self.window * 2)
+        pipe.expire(tokens_key, self.window * 2)
+        n_requests, n_tokens, *_ = await pipe.execute()
+
+        if n_requests <= rpm and (not tpm or n_tokens <= tpm):
+            return 0
+
+        # give back the reservation, and wait for the next window.
+        pipe = self.redis.pipeline()
+        pipe.decr(requests_key)
+        pipe.decrby(tokens_key, tokens)
+        await pipe.execute()
+
+        return (window + 1) * self.window - now
+
+    async def acquire(self, tokens: int = 0):
+        start = time.monotonic()
+        queued = False
+
+        try:
+            while True:
+                try:
+                    wait = await self._try_acquire(tokens)
+                except RedisError as err:
+                    logger.warning(f"rate limiter unavailable, skipping: {err}")
+                    return
+
+                if not wait:
+                    return
+
+                if not queued:
+                    queued = True
+                    self.n_queued += 1
+                    prom_logger.rate_limit_queue_depth.labels(limiter=self.name).inc()
+
+                # jitter avoids every queued caller retrying at the same instant.
+                await asyncio.sleep(wait + random.uniform(0, 0.25))
+        finally:
+            if queued:
+                self.n_queued -= 1
+                prom_logger.rate_limit_queue_depth.labels(limiter=self.name).dec()
+            prom_logger.rate_limit_wait.labels(limiter=self.name).observe(
+                time.monotonic() - start
+            )
+
+    async def block(self, seconds: float):
+        """Holds back all callers, ie. after the provider rejected a request."""
+        try:
+            await self.redis.set(
+                self._key("blocked"), 1, px=max(int(seconds * 1000), 1)
+            )
+        except RedisError as err:
+            logger.warning(f"rate limiter unavailable, skipping: {err}")
+
+    async def adapt(self, headers):
+        """
+        Adapts to the provider's reported limits. When either budget is exhausted,
+        callers are held back until it resets.
+        """
+        limits = {}
+        if "x-ratelimit-limit-requests" in headers:
+            limits["rpm"] = int(headers["x-ratelimit-limit-requests"])
+        if "x-ratelimit-limit-tokens" in headers:
+            limits["tpm"] = int(headers["x-ratelimit-limit-tokens"])
+
+        resets = []
+        for kind in ["requests", "tokens"]:
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and int(remaining) <= 0:
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                resets.append(reset or 1)
+
+        if not limits and not resets:
+            return
+
+        try:
+            if limits:
+                pipe = self.redis.pipeline()
+                pipe.hset(self._key("limits"), mapping=limits)
+                pipe.expire(self._key("limits"), self.LIMITS_TTL)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning(f"rate limiter unavailable, skipping: {err}")
+
+        if resets:
+            await self.block(max(resets))
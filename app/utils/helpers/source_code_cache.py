@@ -0,0 +1,107 @@
+import asyncio
+from typing import Awaitable, Callable
+
+import httpx
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import (
+    explorer_cache_ttl,
+    explorer_negative_cache_ttl,
+    redis_client,
+)
+from app.prometheus import prom_logger
+from app.utils.logger import get_logger
+from app.utils.types.enums import NetworkEnum
+
+logger = get_logger("api")
+
+
+class SourceCodeCache:
+    """
+    Caches explorers' getsourcecode responses in redis, per network and address.
+    Verified source code is kept for `ttl` seconds. Addresses without it, ie.
+    unverified contracts or accounts, are kept for `negative_ttl` seconds only, as
+    they may be verified meanwhile. Errors, like rate limits, aren't cached.
+
+    Concurrent lookups of the same address within a process share a single request.
+    """
+
+    def __init__(
+        self,
+        redis: Redis = redis_client,
+        ttl: int = explorer_cache_ttl,
+        negative_ttl: int = explorer_negative_cache_ttl,
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.inflight: dict[str, asyncio.Future] = {}
+
+    def _key(self, network: NetworkEnum, address: str) -> str:
+        return f"source_code|{network.value}|{address.lower()}"
+
+    async def fetch(
+        self,
+        url: str,
+        network: NetworkEnum,
+        address: str,
+        request: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        """The response to `url`, cached or from `request` on a miss."""
+        key = self._key(network, address)
+        inflight = self.inflight.get(key)
+        if inflight is not None:
+            prom_logger.explorer_cache.labels(result="shared").inc()
+        else:
+            inflight = asyncio.ensure_future(self._fetch(url, key, request))
+            self.inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self.inflight.pop(key, None))
+
+        # a cancelled caller doesn't cancel the request for the others.
+        return await asyncio.shield(inflight)
+
+    async def _fetch(
+        self,
+        url: str,
+        key: str,
+        request: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        try:
+            cached = await self.redis.get(key)
+        except RedisError as err:
+            logger.warning(f"unable to read cached source code: {err}")
+            cached = None
+
+        if cached is not None:
+            prom_logger.explorer_cache.labels(result="hit").inc()
+            return httpx.Response(
+                status_code=200, content=cached, request=httpx.Request("GET", url)
+            )
+
+        prom_logger.explorer_cache.labels(result="miss").inc()
+        response = await request()
+
+        ttl = self._get_ttl(response)
+        if ttl:
+            try:
+                await self.redis.set(key, response.content, ex=ttl)
+            except RedisError as err:
+                logger.warning(f"unable to cache source code: {err}")
+
+        return response
+
+    def _get_ttl(self, response: httpx.Response) -> int | None:
+        if response.status_code != 200:
+            return None
+        try:
+            result = response.json().get("result")
+        except ValueError:
+            return None
+
+        # errors are given as a string result instead.
+        if not isinstance(result, list):
+            return None
+        if result and isinstance(result[0], dict) and result[0].get("SourceCode"):
+            return self.ttl
+        return self.negative_ttl
@@ -0,0 +1,53 @@
+import os
+from functools import cache
+
+from app.utils.helpers.code_sharder import estimate_tokens
+from app.utils.logger import get_logger
+
+logger = get_logger("api")
+
+# the encoding of gpt-4o-mini.
+ENCODING = "o200k_base"
+
+# chat formatting added to every message, and to prime the reply.
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+
+@cache
+def _get_encoding():
+    """
+    The tiktoken encoding, or None to estimate from the length instead. tiktoken
+    downloads encodings on first use, so it's only loaded from TIKTOKEN_CACHE_DIR,
+    which the image populates at build time.
+    """
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        return None
+
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(ENCODING)
+    except Exception as err:
+        logger.warning(f"unable to load the {ENCODING} encoding, estimating: {err}")
+        return None
+
+
+def tokenizer_name() -> str:
+    return ENCODING if _get_encoding() else "estimate"
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    # prompts and sources may contain special tokens verbatim, count them as text.
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """Prompt tokens of a chat completion request, as billed by openai."""
+    n_tokens = REPLY_OVERHEAD
+    for message in messages:
+        n_tokens += MESSAGE_OVERHEAD + count_tokens(message["content"])
+    return n_tokens
@@ -12,3 +12,33 @@ class VersionDict(TypedDict):
     markdown: str
     prompts: Candidates
     response: BaseModel
+
+
+class SourceShard(TypedDict):
+    files: list[str]
+    content: str
+    n_tokens: int
+    # source (1-indexed) line number of every line in content.
+    line_map: list[int]
+
+
+class LibraryFingerprint(TypedDict):
+    library: str
+    version: str
+    path: str
+
+
+class LlmAttempt(TypedDict):
+    shard: int | None
+    attempt: int
+    hedge: bool
+    status: str  # success | failed | cancelled
+    latency: float
+    error: str | None
+
+
+class TokenQuote(TypedDict):
+    input_tokens: int
+    # upper bound, every call may use up to its max completion tokens.
+    output_tokens: int
+    tokenizer: str
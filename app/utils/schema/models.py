@@ -109,6 +109,7 @@ class IntermediateResponseSchema(BaseInstance):
     status: AuditStatusEnum
     processing_time_seconds: Optional[int] = None
     result: Optional[str] = None
+    attempts: Optional[list[dict]] = None
 
     @field_serializer("audit_id", "prompt_id")
     def convert_owner_to_string(self, id):
@@ -2,6 +2,8 @@
 
 from pydantic import BaseModel, Field
 
+from app.utils.types.enums import FindingLevelEnum
+
 
 class SecurityFindingType(BaseModel):
     name: str = Field(description="Name of the vulnerability or finding")
@@ -83,3 +85,18 @@ class GasOutputStructure(BaseModel):
         description="a detailed object of gas optimization findings"
     )
     conclusion: str = Field(description="a brief summary of the audit report")
+
+
+class CandidateFindingType(BaseModel):
+    severity: FindingLevelEnum = Field(description="Severity of the finding")
+    name: str = Field(description="Short name of the finding")
+    explanation: str = Field(description="Concise description of the finding")
+    reference: str = Field(
+        description="The line(s) of code and variable/function related to the finding"
+    )
+
+
+class CandidateOutputStructure(BaseModel):
+    findings: list[CandidateFindingType] = Field(
+        description="A list of findings, if any"
+    )
@@ -0,0 +1,12 @@
+from hashlib import sha256
+
+from .gas import gas_template
+from .security import security_template
+
+# bump when the rendering of reports changes, template edits are picked up by
+# their digest. Reports rendered with another version are re-rendered when read.
+RENDERER_VERSION = "1"
+
+template_version = sha256(
+    f"{RENDERER_VERSION}{gas_template}{security_template}".encode()
+).hexdigest()[:16]
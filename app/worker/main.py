@@ -3,18 +3,29 @@ import re
 from datetime import datetime
 from typing import Optional, TypedDict
 
-from arq import ArqRedis, Retry
+from arq import ArqRedis, cron
 from arq.constants import default_queue_name, health_check_key_suffix
 from prometheus_client import start_http_server
 from tortoise import Tortoise
 
-from app.config import TORTOISE_ORM, redis_settings
+from app.api.pipeline.prompt_registry import prompt_registry
+from app.config import (
+    TORTOISE_ORM,
+    bulk_max_jobs,
+    interactive_max_jobs,
+    redis_settings,
+    scan_max_jobs,
+    scan_networks,
+)
+from app.lib.clients import close_providers
 from app.prometheus import prom_logger
 from app.utils.logger import get_logger
 from app.utils.types.enums import NetworkEnum
 
 # from app.prometheus import logger
-from .tasks import get_deployment_contracts, handle_eval
+from .queues import BULK_QUEUE, INTERACTIVE_QUEUE, QUEUES, SCAN_QUEUE
+from .scanner import DeploymentScanner
+from .tasks import handle_eval
 
 logger = get_logger("api")
 
@@ -25,7 +36,12 @@ class PrometheusMiddleware:
     def __init__(self, ctx: dict):
         self.ctx = ctx
         self.scan = re.compile(self.HEALTH_REGEX)
-        self.health_check_key = default_queue_name + health_check_key_suffix
+        self.queue_name = ctx.get("queue_name", default_queue_name)
+        self.queue_label = next(
+            (name for name, queue in QUEUES.items() if queue == self.queue_name),
+            self.queue_name,
+        )
+        self.health_check_key = self.queue_name + health_check_key_suffix
         self._metrics_task: Optional[asyncio.Task] = None
 
     async def start(self):
@@ -52,6 +68,7 @@ class PrometheusMiddleware:
 
     def log_enqueue_time(self, duration: float):
         prom_logger.tasks_enqueue_duration.observe(duration)
+        prom_logger.queue_wait.labels(queue=self.queue_label).observe(duration)
 
     def log_process_time(self, duration: float):
         prom_logger.tasks_duration.observe(duration)
@@ -74,13 +91,18 @@ class PrometheusMiddleware:
             await self._handle_health_logging()
 
     async def _handle_health_logging(self):
+        # every queue, so one worker reports the backlog of the others too.
+        for name, queue in QUEUES.items():
+            depth = await self.ctx["redis"].zcard(queue)
+            prom_logger.queue_depth.labels(queue=name).set(depth)
+
         data = await self._parse()
         if not data:
             return
 
         for k, v in data.items():
             value = int(v)
-            prom_logger.tasks_info.labels(type=k).set(value)
+            prom_logger.tasks_info.labels(type=k, queue=self.queue_label).set(value)
 
 
 class JobContext(TypedDict):
@@ -95,21 +117,26 @@ class JobContext(TypedDict):
 
 async def on_startup(ctx: JobContext):
     await Tortoise.init(config=TORTOISE_ORM)
+    await prompt_registry.start()
     ctx["prometheus"] = PrometheusMiddleware(ctx)
     await ctx["prometheus"].start()
 
 
 async def on_shutdown(ctx: JobContext):
+    await prompt_registry.stop()
+    await close_providers()
     await Tortoise.close_connections()
     ctx["prometheus"].stop()
 
 
-async def scan_contracts(ctx: JobContext):
-    try:
-        for network in [NetworkEnum.ETH, NetworkEnum.ETH_SEPOLIA]:
-            await get_deployment_contracts(network)
-    except Exception:
-        raise Retry(defer=ctx["job_try"] * 5)
+def scan_contracts(network: NetworkEnum):
+    async def scan_contracts(ctx: JobContext):
+        return await DeploymentScanner(network=network).run()
+
+    name = f"cron:scan_contracts:{network.value}"
+    # every minute. The fixed job id skips runs while the previous one is still
+    # scanning, and a failed run is resumed by the next from the cursor.
+    return cron(scan_contracts, name=name, job_id=name, second=0)
 
 
 async def on_job_start(ctx: JobContext):
@@ -147,7 +174,45 @@ async def mock(ctx: JobContext):
 
 
 class WorkerSettings:
+    """Audits of users and first-party apps."""
+
     functions = [process_eval, mock]
+    queue_name = INTERACTIVE_QUEUE
+    max_jobs = interactive_max_jobs
+    ctx = {"queue_name": INTERACTIVE_QUEUE}
+    on_startup = on_startup
+    on_shutdown = on_shutdown
+    on_job_start = on_job_start
+    on_job_end = on_job_end
+    redis_settings = redis_settings
+    allow_abort_jobs = True
+    health_check_interval = 10
+
+
+class BulkWorkerSettings:
+    """Audits of third-party apps, kept from starving interactive ones."""
+
+    functions = [process_eval]
+    queue_name = BULK_QUEUE
+    max_jobs = bulk_max_jobs
+    ctx = {"queue_name": BULK_QUEUE}
+    on_startup = on_startup
+    on_shutdown = on_shutdown
+    on_job_start = on_job_start
+    on_job_end = on_job_end
+    redis_settings = redis_settings
+    allow_abort_jobs = True
+    health_check_interval = 10
+
+
+class ScanWorkerSettings:
+    """Deployment scans, see app/worker/scanner.py."""
+
+    functions = []
+    cron_jobs = [scan_contracts(NetworkEnum(network)) for network in scan_networks]
+    queue_name = SCAN_QUEUE
+    max_jobs = scan_max_jobs
+    ctx = {"queue_name": SCAN_QUEUE}
     on_startup = on_startup
     on_shutdown = on_shutdown
     on_job_start = on_job_start
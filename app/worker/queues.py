@@ -0,0 +1,93 @@
+import time
+from datetime import datetime, timezone
+
+from arq.constants import default_queue_name
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from app.config import fair_share_slot, fair_share_window, redis_client
+from app.utils.logger import get_logger
+from app.utils.schema.dependencies import AuthState
+from app.utils.types.enums import RoleEnum
+
+logger = get_logger("api")
+
+# audits of users and first-party apps. arq's default, so that jobs enqueued before
+# queues were split are still processed.
+INTERACTIVE_QUEUE = default_queue_name
+# audits submitted by third-party apps, often in bulk.
+BULK_QUEUE = f"{default_queue_name}:bulk"
+# deployment scans.
+SCAN_QUEUE = f"{default_queue_name}:scan"
+
+QUEUES = {
+    "interactive": INTERACTIVE_QUEUE,
+    "bulk": BULK_QUEUE,
+    "scan": SCAN_QUEUE,
+}
+
+
+def route_audit(auth: AuthState) -> str:
+    if auth.role == RoleEnum.APP:
+        return BULK_QUEUE
+    return INTERACTIVE_QUEUE
+
+
+def audit_owner(auth: AuthState) -> str:
+    # apps share their quota among their users.
+    return str(auth.app_id or auth.user_id)
+
+
+class FairShareScheduler:
+    """
+    Orders the jobs of a queue fairly between their owners, ie. apps or users, with
+    a virtual clock per owner. Every job advances its owner's clock by `slot`
+    seconds, and a clock never lags more than `window` seconds behind. A job is
+    scheduled at its owner's clock, but never in the future, as arq doesn't pick up
+    jobs scheduled ahead of time.
+
+    An owner that's been quiet jumps ahead of one that just enqueued a batch, while
+    any owner's jobs run immediately when the queue is otherwise empty.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(
+        self,
+        redis: Redis = redis_client,
+        slot: float = fair_share_slot,
+        window: float = fair_share_window,
+    ):
+        self.redis = redis
+        self.slot_ms = slot * 1000
+        self.window_ms = window * 1000
+
+    async def schedule(self, queue: str, owner: str) -> datetime:
+        """When to schedule the next job of `owner` on `queue`, for arq's defer."""
+        key = f"fair_share|{queue}"
+        now = time.time() * 1000
+        clock = now
+        try:
+            for _ in range(self.MAX_RETRIES):
+                try:
+                    async with self.redis.pipeline(transaction=True) as pipe:
+                        await pipe.watch(key)
+                        last = await pipe.hget(key, owner)
+                        clock = max(float(last or 0), now - self.window_ms)
+                        clock += self.slot_ms
+                        pipe.multi()
+                        pipe.hset(key, owner, clock)
+                        pipe.pexpire(key, int(self.window_ms))
+                        await pipe.execute()
+                    break
+                except WatchError:
+                    # another job was scheduled on the queue meanwhile.
+                    continue
+        except RedisError as err:
+            logger.warning(f"unable to schedule fairly, queueing in order: {err}")
+            clock = now
+
+        return datetime.fromtimestamp(min(clock, now) / 1000, tz=timezone.utc)
+
+
+fair_share = FairShareScheduler()
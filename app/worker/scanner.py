@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import httpx
+from redis.asyncio import Redis
+from web3.types import BlockReceipts
+
+from app.api.blockchain.service import BlockchainService
+from app.config import (
+    redis_client,
+    scan_batch_size,
+    scan_concurrency,
+    scan_confirmations,
+    scan_max_blocks,
+)
+from app.db.models import Contract
+from app.lib.clients import Web3Client
+from app.prometheus import prom_logger
+from app.utils.logger import get_logger
+from app.utils.types.enums import ContractMethodEnum, NetworkEnum
+
+logger = get_logger("worker")
+
+
+def deployment_addresses(receipts: BlockReceipts) -> list[str]:
+    # contracts deployed by other contracts don't have a receipt of their own.
+    return [
+        receipt["contractAddress"]
+        for receipt in receipts
+        if receipt["to"] is None and receipt.get("contractAddress")
+    ]
+
+
+class DeploymentScanner:
+    """
+    Walks the blocks of a network for contract deployments, and saves those with
+    verified source code. The last block scanned is persisted in redis, so blocks
+    missed while no worker was running are backfilled by the next runs, up to
+    `max_blocks` per run. Only blocks `confirmations` deep are scanned, as the ones
+    above may still be reorganized.
+
+    Receipts are fetched `batch_size` blocks per JSON-RPC batch, with up to
+    `concurrency` batches in flight.
+    """
+
+    def __init__(
+        self,
+        network: NetworkEnum,
+        redis: Redis = redis_client,
+        web3_client: Web3Client | None = None,
+        confirmations: int = scan_confirmations,
+        batch_size: int = scan_batch_size,
+        concurrency: int = scan_concurrency,
+        max_blocks: int = scan_max_blocks,
+    ):
+        self.network = network
+        self.redis = redis
+        self.web3_client = web3_client or Web3Client(network=network)
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_blocks = max_blocks
+        self.cursor_key = f"scan_cursor|{network.value}"
+
+    async def get_cursor(self) -> int | None:
+        cursor = await self.redis.get(self.cursor_key)
+        return int(cursor) if cursor is not None else None
+
+    async def run(self) -> int:
+        """Scans the confirmed blocks past the cursor, returns how many were."""
+        head = await self.web3_client.get_block_number()
+        confirmed = head - self.confirmations
+
+        cursor = await self.get_cursor()
+        if cursor is None:
+            # first run, earlier deployments aren't backfilled.
+            cursor = confirmed
+            await self.redis.set(self.cursor_key, cursor)
+
+        start = time.perf_counter()
+        n_blocks = 0
+        async with httpx.AsyncClient() as client:
+            while cursor < confirmed and n_blocks < self.max_blocks:
+                end = min(
+                    cursor + self.batch_size * self.concurrency,
+                    cursor + self.max_blocks - n_blocks,
+                    confirmed,
+                )
+                blocks = range(cursor + 1, end + 1)
+                batches = await asyncio.gather(
+                    *(
+                        self.web3_client.get_blocks_receipts(
+                            blocks[i : i + self.batch_size]
+                        )
+                        for i in range(0, len(blocks), self.batch_size)
+                    )
+                )
+                addresses = [
+                    address
+                    for receipts in batches
+                    for block_receipts in receipts
+                    for address in deployment_addresses(block_receipts)
+                ]
+                await self._save_contracts(client, addresses)
+
+                # only once saved, so that a failed range is scanned again.
+                cursor = end
+                await self.redis.set(self.cursor_key, cursor)
+                n_blocks += len(blocks)
+
+        elapsed = time.perf_counter() - start
+        prom_logger.scan_blocks.labels(network=self.network.value).inc(n_blocks)
+        prom_logger.scan_lag.labels(network=self.network.value).set(head - cursor)
+        if n_blocks:
+            prom_logger.scan_rate.labels(network=self.network.value).set(
+                n_blocks / elapsed
+            )
+
+        logger.info(
+            "scanned blocks for deployments",
+            extra={
+                "network": self.network.value,
+                "n_blocks": n_blocks,
+                "cursor": cursor,
+                "lag": head - cursor,
+            },
+        )
+        return n_blocks
+
+    async def _save_contracts(self, client: httpx.AsyncClient, addresses: list[str]):
+        if not addresses:
+            return
+
+        # saved already, if a range is scanned again.
+        existing = await Contract.filter(
+            method=ContractMethodEnum.SCAN,
+            network=self.network,
+            address__in=addresses,
+        ).values_list("address", flat=True)
+        addresses = [
+            address for address in dict.fromkeys(addresses) if address not in existing
+        ]
+
+        blockchain_service = BlockchainService()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def get_source_code(address: str) -> dict:
+            async with semaphore:
+                return await blockchain_service.get_source_code(
+                    client, address=address, network=self.network
+                )
+
+        results = await asyncio.gather(*map(get_source_code, addresses))
+        for result in results:
+            if not result["is_available"]:
+                continue
+            await Contract.create(
+                method=ContractMethodEnum.SCAN,
+                address=result["address"],
+                network=self.network,
+                is_available=True,
+                raw_code=result["code"],
+                contract_name=result["contract_name"],
+                is_proxy=result["is_proxy"],
+            )
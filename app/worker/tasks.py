@@ -1,25 +1,32 @@
-import asyncio
 from datetime import datetime
 
-import httpx
-
-from app.api.blockchain.service import BlockchainService
+from app.api.audit.service import AuditService
 from app.api.pipeline.audit_generation import LlmPipeline
-from app.db.models import Audit, Auth, Contract, Transaction
-from app.lib.clients import Web3Client
+from app.config import stream_audits
+from app.db.models import Audit, Auth, Transaction
 from app.utils.logger import get_logger
 from app.utils.types.enums import (
     AppTypeEnum,
     AuditStatusEnum,
     ClientTypeEnum,
-    ContractMethodEnum,
-    NetworkEnum,
     TransactionTypeEnum,
 )
 
 logger = get_logger("worker")
 
 
+def _render_markdown(audit: Audit):
+    # rendered once, rather than on every read of the audit.
+    try:
+        AuditService().render_markdown(audit)
+    except ValueError as err:
+        # rendered on read instead, which surfaces the error.
+        audit.markdown = None
+        logger.warning(
+            f"unable to render audit report: {err}", extra={"audit_id": str(audit.id)}
+        )
+
+
 async def handle_eval(audit_id: str):
     now = datetime.now()
     audit = await Audit.get(id=audit_id).select_related("contract")
@@ -34,29 +41,63 @@ async def handle_eval(audit_id: str):
     pipeline = LlmPipeline(
         input=audit.contract.raw_code,
         audit=audit,
-        should_publish=False,
+        should_publish=stream_audits,
+        should_stream=stream_audits,
     )
 
+    # still processing, its worker died. arq retries the job, which picks up where
+    # the audit was interrupted.
+    if audit.status == AuditStatusEnum.PROCESSING:
+        await pipeline.resume()
+
     audit.status = AuditStatusEnum.PROCESSING
     await audit.save()
 
     try:
-        await pipeline.generate_candidates()
+        await pipeline.load_prompts()
 
-        response = await pipeline.generate_report()
+        # identical inputs were already audited, skip the LLM calls entirely.
+        response = await pipeline.restore_from_cache()
+        if response is None:
+            response = await pipeline.coalesce()
+        if response is None:
+            await pipeline.generate_candidates()
+            response = await pipeline.generate_report()
 
         audit.raw_output = response
         audit.status = AuditStatusEnum.SUCCESS
+        _render_markdown(audit)
 
         audit.processing_time_seconds = (datetime.now() - now).seconds
         await audit.save()
     except Exception as err:
         logger.exception(err, extra={"audit_id": str(audit.id)})
+        await pipeline.discard_late_candidates()
+        await pipeline.checkpoints.flush()
         audit.status = AuditStatusEnum.FAILED
         audit.processing_time_seconds = (datetime.now() - now).seconds
         await audit.save()
+        await pipeline.release()
         raise err
 
+    # the report is already delivered, candidates that missed the quorum revise it.
+    if pipeline.late_candidates:
+        revised = await pipeline.rereview()
+        if revised:
+            audit.raw_output = revised
+            _render_markdown(audit)
+
+    # late candidates may have checkpointed since, every step is written before the
+    # audit reads as complete.
+    await pipeline.checkpoints.flush()
+
+    # only complete reports are reused, a failed candidate would be missing from it.
+    if pipeline.is_complete:
+        audit.cache_key = pipeline.cache_key
+    await audit.save()
+    # identical audits waiting on this one restore its result from here.
+    await pipeline.release()
+
     # NOTE: could remove this if condition in the future. Free via the app.
 
     cost = pipeline.usage.get_cost()
@@ -103,60 +144,3 @@ async def handle_eval(audit_id: str):
             await transaction.save()
 
     return {"audit_id": audit_id, "audit_status": audit.status}
-
-
-async def get_deployment_contracts(network: NetworkEnum):
-    logger.info(f"RUNNING contract scan for {network}")
-    web3_client = Web3Client()
-    current_block = await web3_client.get_block_number()
-    logger.info(f"Network: {network} --- Current block: {current_block}")
-    receipts = await web3_client.get_block_receipts(current_block)
-
-    logger.info(f"RECEIPTS FOUND {len(receipts)}")
-
-    deployment_addresses = []
-    for receipt in receipts:
-        if not receipt["to"]:
-            logs = receipt["logs"]
-            if logs:
-                initial_log = logs[0]
-                address = initial_log["address"]
-                deployment_addresses.append(address)
-
-    logger.info(f"DEPLOYMENT ADDRESSES {deployment_addresses}")
-
-    if not deployment_addresses:
-        logger.info("no deployment addresses found")
-        return
-
-    tasks = []
-    blockchain_service = BlockchainService()
-    async with httpx.AsyncClient() as client:
-        for address in deployment_addresses:
-            tasks.append(
-                asyncio.create_task(
-                    blockchain_service.get_source_code(
-                        client, address=address, network=network
-                    )
-                )
-            )
-        results: list[dict] = await asyncio.gather(*tasks)
-
-    logger.info(f"RESULTS {results}")
-
-    to_create = []
-    for result in results:
-        if result["found"]:
-            if result["has_source_code"]:
-                obj = {
-                    "method": ContractMethodEnum.SCAN,
-                    "address": address,
-                    "is_available": result["has_source_code"],
-                    "network": result["network"],
-                    "raw_code": result["source_code"],
-                }
-                to_create.append(obj)
-
-    if to_create:
-        await Contract.bulk_create(objects=to_create)
-    logger.info(f"Added {len(to_create)} contracts from {network}")
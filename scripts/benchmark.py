@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Drives concurrent audits through the worker's handle_eval against the offline LLM
+backend, and reports throughput, latency, DB queries and peak memory.
+
+    python scripts/benchmark.py --audits 50 --concurrency 10 --latency 0.2
+
+Runs against an in-memory sqlite database and an in-memory redis by default, pass
+--db to use a real database (schemas are generated if missing).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Add the parent directory to Python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--audits", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--audit-type", choices=["security", "gas"], default="security")
+    parser.add_argument(
+        "--source-lines",
+        type=int,
+        default=200,
+        help="size of the synthesized contract, larger sources are sharded",
+    )
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--recordings", help="JSON file of recorded completions")
+    parser.add_argument(
+        "--structured", action="store_true", help="structured candidate outputs"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default="sqlite://:memory:")
+    # high enough not to throttle by default, lower them to benchmark queueing.
+    parser.add_argument("--rpm", type=int, default=1_000_000)
+    parser.add_argument("--tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--verbose", action="store_true", help="keep worker logs")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# the backend is picked when the clients are imported.
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_RECORDINGS"] = args.recordings or ""
+os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+os.environ["FAKE_LLM_LATENCY_SIGMA"] = str(args.sigma)
+os.environ["FAKE_LLM_SEED"] = str(args.seed)
+os.environ["STRUCTURED_CANDIDATES"] = str(args.structured).lower()
+
+# flake8: noqa: E402
+import fakeredis
+from tortoise import Tortoise
+
+from app.api.pipeline import audit_generation
+from app.api.pipeline.inflight import inflight_audits
+from app.api.pipeline.prompt_registry import prompt_registry
+from app.db.models import Audit, Auth, Contract, Prompt, User
+from app.lib.clients import llm_limiter
+from app.lib.gas import structure as gas_structure
+from app.lib.security import structure as sec_structure
+from app.utils.types.enums import AuditTypeEnum, ClientTypeEnum, ContractMethodEnum
+from app.worker.tasks import handle_eval
+
+FUNCTION_TEMPLATE = """
+    function withdraw{i}(uint256 amount) external {{
+        require(balances[msg.sender] >= amount, "insufficient");
+        (bool ok, ) = msg.sender.call{{value: amount}}("");
+        require(ok);
+        balances[msg.sender] -= amount;
+    }}
+"""
+
+
+class QueryCounter(logging.Handler):
+    """Counts the queries tortoise logs, regardless of the database backend."""
+
+    def __init__(self):
+        super().__init__(level=logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record):
+        if not record.msg.startswith(("Created connection", "Closed connection")):
+            self.count += 1
+
+
+def synthesize_source(n_lines: int, i: int) -> str:
+    body = "".join(
+        FUNCTION_TEMPLATE.format(i=j)
+        for j in range(max(n_lines // FUNCTION_TEMPLATE.count("\n"), 1))
+    )
+    return (
+        "// SPDX-License-Identifier: MIT\n"
+        "pragma solidity ^0.8.20;\n\n"
+        f"contract Vault{i} {{\n"
+        "    mapping(address => uint256) public balances;\n"
+        f"{body}}}\n"
+    )
+
+
+async def seed(audit_type: AuditTypeEnum) -> User:
+    for prompt_type, structure in [
+        (AuditTypeEnum.SECURITY, sec_structure),
+        (AuditTypeEnum.GAS, gas_structure),
+    ]:
+        if await Prompt.exists(audit_type=prompt_type, is_active=True):
+            continue
+        prompts = {
+            **structure["prompts"]["candidates"],
+            "reviewer": structure["prompts"]["reviewer"],
+        }
+        for tag, content in prompts.items():
+            await Prompt.create(
+                audit_type=prompt_type, tag=tag, version="0.1", content=content
+            )
+
+    user = await User.create(address=f"0xbenchmark{time.time_ns()}")
+    await Auth.create(
+        user=user,
+        client_type=ClientTypeEnum.USER,
+        hashed_key=Auth.hash_key(str(user.id)),
+        consumes_credits=False,
+    )
+    return user
+
+
+async def create_audits(user: User, audit_type: AuditTypeEnum) -> list[Audit]:
+    audits = []
+    run = time.time_ns()
+    for i in range(args.audits):
+        # distinct hashes, so audits aren't served from the cache.
+        contract = await Contract.create(
+            method=ContractMethodEnum.UPLOAD,
+            raw_code=synthesize_source(args.source_lines, i),
+            hash_code=f"benchmark-{run}-{i}",
+        )
+        audits.append(
+            await Audit.create(user=user, contract=contract, audit_type=audit_type)
+        )
+    return audits
+
+
+async def main():
+    await Tortoise.init(
+        db_url=args.db, modules={"models": ["app.db.models", "aerich.models"]}
+    )
+    await Tortoise.generate_schemas(safe=True)
+
+    redis = fakeredis.FakeAsyncRedis()
+    audit_generation.redis_client = redis
+    inflight_audits.redis = redis
+    llm_limiter.redis = redis
+    llm_limiter.rpm = args.rpm
+    llm_limiter.tpm = args.tpm
+
+    if not args.verbose:
+        logging.getLogger("worker").setLevel(logging.WARNING)
+
+    audit_type = AuditTypeEnum(args.audit_type)
+    user = await seed(audit_type)
+    audits = await create_audits(user, audit_type)
+
+    # as on worker startup.
+    prompt_registry.redis = redis
+    await prompt_registry.start()
+
+    counter = QueryCounter()
+    db_logger = logging.getLogger("tortoise.db_client")
+    db_logger.addHandler(counter)
+    db_logger.setLevel(logging.DEBUG)
+    db_logger.propagate = False
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async def run(audit: Audit):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await handle_eval(str(audit.id))
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(run(audit) for audit in audits))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await prompt_registry.stop()
+    await Tortoise.close_connections()
+
+    latencies.sort()
+    print(f"audits:       {args.audits} ({failures} failed)")
+    print(f"concurrency:  {args.concurrency}")
+    print(f"elapsed:      {elapsed:.2f}s")
+    print(f"audits/sec:   {len(latencies) / elapsed:.2f}")
+    if latencies:
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        print(f"p50 latency:  {statistics.median(latencies):.2f}s")
+        print(f"p99 latency:  {p99:.2f}s")
+    print(f"db queries:   {counter.count} ({counter.count / args.audits:.1f}/audit)")
+    print(f"peak memory:  {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compares decoding large reviewer outputs with decode_findings() against the
+previous regex + json.loads + pydantic path, both when findings are written and
+when the report is read (which also rendered code spans in every finding).
+
+    python scripts/findings_benchmark.py --findings 200 --number 200
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+# Add the parent directory to Python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# flake8: noqa: E402
+from app.utils.helpers.findings_parser import decode_findings
+from app.utils.schema.output import SecurityOutputStructure
+
+
+def reviewer_output(n_findings: int) -> str:
+    finding = {
+        "name": "Reentrancy in <<withdraw>>",
+        "explanation": "The balance of <<msg.sender>> is updated after the "
+        "external call. A malicious receiver can re-enter and drain the vault. " * 4,
+        "recommendation": "Follow checks-effects-interactions, or add a guard.",
+        "reference": "line 42, <<withdraw(uint256)>>",
+    }
+    report = {
+        "introduction": "The contract holds user deposits. " * 10,
+        "scope": "All contracts in the submitted source.",
+        "findings": {
+            level: [finding] * (n_findings // 4)
+            for level in ["critical", "high", "medium", "low"]
+        },
+        "conclusion": "Several issues were identified. " * 10,
+    }
+    # the reviewer occasionally adds leading text.
+    return "Here is the audit report:\n" + json.dumps(report)
+
+
+def legacy_decode(raw: str) -> SecurityOutputStructure:
+    raw_data = re.sub(r"<<(.*?)>>", r"`\1`", raw)
+    match = re.search(r"\{.*\}", raw_data, re.DOTALL)
+    if match:
+        raw_data = match.group(0)
+    return SecurityOutputStructure(**json.loads(raw_data))
+
+
+def legacy_read(raw: str) -> SecurityOutputStructure:
+    model = legacy_decode(raw)
+    for _, findings in model.findings:
+        for finding in findings:
+            for field in ["name", "explanation", "recommendation", "reference"]:
+                re.sub(r"<<(.*?)>>", r"`\1`", getattr(finding, field))
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--findings", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    raw = reviewer_output(args.findings)
+    assert legacy_decode(raw) == decode_findings(raw, SecurityOutputStructure)
+
+    decoded = timeit.timeit(
+        lambda: decode_findings(raw, SecurityOutputStructure), number=args.number
+    )
+
+    print(f"output size: {len(raw) / 1024:.0f} KiB, {args.findings} findings")
+    print(f"decode_findings: {decoded / args.number * 1000:.2f}ms")
+    for name, legacy_path in [("write", legacy_decode), ("read", legacy_read)]:
+        legacy = timeit.timeit(lambda: legacy_path(raw), number=args.number)
+        print(
+            f"legacy {name}: {legacy / args.number * 1000:.2f}ms, "
+            f"{legacy / decoded:.2f}x slower"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+# Add the parent directory to Python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# flake8: noqa: E402
+from app.lib.libraries import INDEX_PATH
+from app.utils.helpers.library_detector import fingerprint
+
+
+def index_library(name: str, version: str, root: str) -> dict:
+    entries = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(".sol"):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            with open(full_path) as f:
+                content = f.read()
+            entries[fingerprint(content)] = {
+                "library": name,
+                "version": version,
+                "path": os.path.relpath(full_path, root),
+            }
+    return entries
+
+
+def index_command():
+    parser = argparse.ArgumentParser(
+        description="Add a library release to the fingerprint index"
+    )
+    parser.add_argument("--name", required=True, help="ie. OpenZeppelin")
+    parser.add_argument("--version", required=True, help="ie. 4.9.3")
+    parser.add_argument(
+        "--root", required=True, help="path to the library's contracts directory"
+    )
+    args = parser.parse_args()
+
+    with open(INDEX_PATH) as f:
+        index = json.load(f)
+
+    entries = index_library(name=args.name, version=args.version, root=args.root)
+    # files unchanged between releases keep the version they were first indexed
+    # with, so releases are indexed oldest first.
+    n_added = 0
+    for content_hash, entry in entries.items():
+        if content_hash not in index:
+            index[content_hash] = entry
+            n_added += 1
+
+    with open(INDEX_PATH, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print(f"Indexed {len(entries)} files, {n_added} new, {len(index)} total")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(index_command())
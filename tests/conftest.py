@@ -3,6 +3,7 @@ import os
 import sys
 from typing import AsyncGenerator
 
+import fakeredis
 import pytest_asyncio
 
 from app.api.app.interface import AppUpsertBody
@@ -31,10 +32,16 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 from tortoise import Tortoise
 
+from app.api.pipeline.inflight import inflight_audits
+from app.api.pipeline.prompt_registry import prompt_registry
+from app.api.pricing.estimator import quote_estimator
 from app.db.models import App, Auth, Permission  # Replace with your actual model
+from app.lib.clients import llm_limiter, source_code_cache
+from app.lib.clients.explorer import explorer_limiters
 from app.main import app
 from app.utils.schema.dependencies import AuthState
 from app.utils.types.enums import AppTypeEnum, AuthScopeEnum, ClientTypeEnum, RoleEnum
+from app.worker.queues import fair_share
 
 TEST_DB_URL = "sqlite://:memory:"
 
@@ -73,6 +80,30 @@ def in_memory_db(request, event_loop):
     request.addfinalizer(finalizer)
 
 
+@pytest.fixture(autouse=True)
+def sqlite_lock():
+    # the connection is shared for the session, while tests may each run on their
+    # own event loop. Its lock binds to the first loop it's contended on.
+    Tortoise.get_connection("default")._lock = asyncio.Lock()
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    # there's no redis instance in tests, limiters, the prompt registry, quotes,
+    # in-flight audits, the fair share scheduler and cached explorer responses share
+    # an in-memory one instead.
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(llm_limiter, "redis", redis)
+    monkeypatch.setattr(prompt_registry, "redis", redis)
+    monkeypatch.setattr(quote_estimator, "redis", redis)
+    monkeypatch.setattr(inflight_audits, "redis", redis)
+    monkeypatch.setattr(fair_share, "redis", redis)
+    monkeypatch.setattr(source_code_cache, "redis", redis)
+    for limiter in explorer_limiters.values():
+        monkeypatch.setattr(limiter, "redis", redis)
+    return redis
+
+
 @pytest.fixture(scope="module")
 async def async_client() -> AsyncGenerator:
 
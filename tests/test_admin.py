@@ -1,11 +1,28 @@
+import asyncio
+
 import pytest
 import pytest_asyncio
 
 from app.api.auth.service import AuthService
+from app.api.pipeline.prompt_registry import PromptRegistry
 from app.api.user.service import UserService
-from app.db.models import Auth, Permission
+from app.db.models import (
+    Audit,
+    Auth,
+    Contract,
+    IntermediateResponse,
+    Permission,
+    Prompt,
+)
 from app.utils.schema.dependencies import AuthState
-from app.utils.types.enums import AuthScopeEnum, ClientTypeEnum, RoleEnum
+from app.utils.types.enums import (
+    AuditStatusEnum,
+    AuditTypeEnum,
+    AuthScopeEnum,
+    ClientTypeEnum,
+    ContractMethodEnum,
+    RoleEnum,
+)
 from tests.constants import FIRST_PARTY_APP_API_KEY
 
 USER_WITH_ADMIN_ADDRESS = "0xuserwithadmin"
@@ -115,3 +132,111 @@ async def test_fail_if_not_admin(
         },
     )
     assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_invalidate_audit_cache(
+    async_client, first_party_app, user_with_auth_and_admin
+):
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code="contract Invalidate {}"
+    )
+    other_contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code="contract KeepCached {}"
+    )
+
+    audit = await Audit.create(
+        contract=contract,
+        audit_type=AuditTypeEnum.SECURITY,
+        status=AuditStatusEnum.SUCCESS,
+        cache_key="a" * 64,
+    )
+    other_audit = await Audit.create(
+        contract=other_contract,
+        audit_type=AuditTypeEnum.SECURITY,
+        status=AuditStatusEnum.SUCCESS,
+        cache_key="b" * 64,
+    )
+    memoized = await IntermediateResponse.create(
+        audit=audit,
+        step="candidate",
+        status=AuditStatusEnum.SUCCESS,
+        result="memoized",
+        cache_key="c" * 64,
+    )
+    other_memoized = await IntermediateResponse.create(
+        audit=other_audit,
+        step="candidate",
+        status=AuditStatusEnum.SUCCESS,
+        result="memoized",
+        cache_key="d" * 64,
+    )
+
+    response = await async_client.post(
+        "/admin/cache/invalidate",
+        headers={
+            "Authorization": f"Bearer {FIRST_PARTY_APP_API_KEY}",
+            "Bevor-User-Identifier": str(user_with_auth_and_admin.id),
+        },
+        json={"hash_code": contract.hash_code},
+    )
+    assert response.status_code == 202
+    assert response.json()["invalidated"] == 1
+
+    audit = await Audit.get(id=audit.id)
+    other_audit = await Audit.get(id=other_audit.id)
+    assert audit.cache_key is None
+    assert other_audit.cache_key is not None
+
+    memoized = await IntermediateResponse.get(id=memoized.id)
+    other_memoized = await IntermediateResponse.get(id=other_memoized.id)
+    assert memoized.cache_key is None
+    assert other_memoized.cache_key is not None
+
+    await audit.delete()
+    await other_audit.delete()
+    await contract.delete()
+    await other_contract.delete()
+
+
+@pytest.mark.anyio
+async def test_prompt_edits_invalidate_registry(
+    async_client, first_party_app, user_with_auth_and_admin, fake_redis
+):
+    prompt = await Prompt.create(
+        audit_type=AuditTypeEnum.GAS,
+        tag="registry",
+        version="0.1",
+        content="cached",
+        is_active=True,
+    )
+    # stands in for a worker's registry, warmed on startup.
+    registry = PromptRegistry(redis=fake_redis)
+    await registry.start()
+
+    try:
+        # served from memory, until an admin edit invalidates it.
+        await Prompt.filter(id=prompt.id).update(content="edited directly")
+        candidates, _ = await registry.get(AuditTypeEnum.GAS)
+        assert "cached" in [candidate.content for candidate in candidates]
+
+        response = await async_client.patch(
+            f"/admin/prompt/{prompt.id}",
+            headers={
+                "Authorization": f"Bearer {FIRST_PARTY_APP_API_KEY}",
+                "Bevor-User-Identifier": str(user_with_auth_and_admin.id),
+            },
+            json={"content": "edited"},
+        )
+        assert response.status_code == 202
+
+        for _ in range(50):
+            if AuditTypeEnum.GAS not in registry.prompts:
+                break
+            await asyncio.sleep(0.05)
+
+        candidates, _ = await registry.get(AuditTypeEnum.GAS)
+        assert "edited" in [candidate.content for candidate in candidates]
+    finally:
+        await registry.stop()
+        await prompt.delete()
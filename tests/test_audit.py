@@ -1,13 +1,23 @@
+import asyncio
 import json
+from datetime import datetime, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import fakeredis
 import pytest
 import pytest_asyncio
+from arq.connections import ArqRedis
 
 from app.api.audit.interface import CreateEvalResponse, EvalBody
 from app.api.audit.service import AuditService
 from app.api.auth.service import AuthService
+from app.api.dependencies import create_job_pool, get_job_pool
+from app.api.pipeline.audit_generation import LlmPipeline
+from app.api.pipeline.inflight import inflight_audits
+from app.api.pricing.estimator import quote_estimator
+from app.api.pricing.service import Usage
 from app.api.user.service import UserService
+from app.config import job_pool_size
 from app.db.models import (
     Audit,
     Auth,
@@ -16,10 +26,14 @@ from app.db.models import (
     IntermediateResponse,
     Permission,
     Prompt,
+    Transaction,
     User,
 )
 from app.lib.gas.v1.response import FindingsStructure, FindingType, OutputStructure
+from app.main import app
 from app.utils.schema.dependencies import AuthState
+from app.utils.schema.llm import TokenQuote
+from app.utils.templates import template_version
 from app.utils.types.enums import (
     AuditStatusEnum,
     AuditTypeEnum,
@@ -29,6 +43,12 @@ from app.utils.types.enums import (
     NetworkEnum,
     RoleEnum,
 )
+from app.worker.queues import (
+    BULK_QUEUE,
+    INTERACTIVE_QUEUE,
+    fair_share,
+    route_audit,
+)
 from tests.constants import THIRD_PARTY_APP_API_KEY, USER_API_KEY
 
 USER_WITH_CREDITS_ADDRESS = "0xuserwithcredits"
@@ -74,6 +94,24 @@ async def user_with_auth_and_credits():
     return user
 
 
+class MockQueue:
+    def __init__(self):
+        self.job = None
+        self.queue_name = None
+
+    async def enqueue_job(self, function: str, _job_id: str, *args, **kwargs):
+        self.job = {"job_id": _job_id, "function": function}
+        self.queue_name = kwargs.get("_queue_name")
+
+
+@pytest.fixture
+def job_pool():
+    pool = MockQueue()
+    app.dependency_overrides[get_job_pool] = lambda: pool
+    yield pool
+    del app.dependency_overrides[get_job_pool]
+
+
 @pytest_asyncio.fixture(scope="module")
 async def mock_prompts():
     await Prompt.create(
@@ -125,7 +163,7 @@ async def test_fail_if_no_credits(user_with_auth, async_client):
 
 
 @pytest.mark.anyio
-async def test_succeed_if_credits(user_with_auth_and_credits, async_client):
+async def test_succeed_if_credits(user_with_auth_and_credits, async_client, job_pool):
     assert user_with_auth_and_credits.total_credits > 0
 
     mock_body = EvalBody(contract_id="some-fake-id", audit_type=AuditTypeEnum.SECURITY)
@@ -153,7 +191,7 @@ async def test_succeed_if_credits(user_with_auth_and_credits, async_client):
 
 
 @pytest.mark.anyio
-async def test_fail_if_no_contract(user_with_auth_and_credits, async_client):
+async def test_fail_if_no_contract(user_with_auth_and_credits, async_client, job_pool):
     mock_body = EvalBody(contract_id="some-fake-id", audit_type=AuditTypeEnum.SECURITY)
 
     # Make request to create an audit
@@ -168,7 +206,7 @@ async def test_fail_if_no_contract(user_with_auth_and_credits, async_client):
 
 
 @pytest.mark.anyio
-async def test_fail_if_invalid_body(user_with_auth_and_credits, async_client):
+async def test_fail_if_invalid_body(user_with_auth_and_credits, async_client, job_pool):
     # Make request to create an audit
     response = await async_client.post(
         "/audit",
@@ -184,7 +222,9 @@ async def test_fail_if_invalid_body(user_with_auth_and_credits, async_client):
 
 
 @pytest.mark.anyio
-async def test_successfully_creates_audit(user_with_auth_and_credits, async_client):
+async def test_successfully_creates_audit(
+    user_with_auth_and_credits, async_client, job_pool
+):
     assert user_with_auth_and_credits.total_credits > 0
 
     # Create a contract for testing
@@ -200,51 +240,181 @@ async def test_successfully_creates_audit(user_with_auth_and_credits, async_clie
         contract_id=str(contract.id), audit_type=AuditTypeEnum.SECURITY
     )
 
-    # Mock the redis pool to avoid actual job enqueuing
-    with patch("app.api.audit.service.create_pool") as mock_create_pool:
-        mock_redis_pool = MagicMock()
-        mock_redis_pool.enqueue_job = AsyncMock()
-        mock_create_pool.return_value = mock_redis_pool
+    # Make request to create an audit
+    response = await async_client.post(
+        "/audit",
+        headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
+        json=mock_body.model_dump(),
+    )
 
-        # Make request to create an audit
+    # Assertions
+    assert response.status_code == 201
+    data = response.json()
+    assert "id" in data
+    assert data["status"] == AuditStatusEnum.WAITING.value
+
+    # Verify redis job was enqueued
+    assert job_pool.job == {"job_id": data["id"], "function": "process_eval"}
+    assert job_pool.queue_name == INTERACTIVE_QUEUE
+
+    # Verify audit was created in database
+    audit = await Audit.get(id=data["id"])
+    assert audit.contract_id == contract.id
+    assert audit.audit_type == AuditTypeEnum.SECURITY
+
+    # Clean up
+    await contract.delete()
+    await audit.delete()
+
+
+@pytest.mark.anyio
+async def test_quote_audit(user_with_auth_and_credits, async_client, mock_prompts):
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD,
+        raw_code="contract Test {\n    uint256 public value;\n}\n",
+        hash_code="quote-hash",
+    )
+    mock_body = EvalBody(
+        contract_id=str(contract.id), audit_type=AuditTypeEnum.SECURITY
+    )
+
+    response = await async_client.post(
+        "/audit/quote",
+        headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
+        json=mock_body.model_dump(),
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["input_tokens"] > 0
+    # two candidates and the reviewer, each up to their max completion tokens.
+    assert data["output_tokens"] == 3 * LlmPipeline.MAX_COMPLETION_TOKENS
+    assert data["credits"] == Usage.estimate_pricing(
+        input_tokens=data["input_tokens"], output_tokens=data["output_tokens"]
+    )
+
+    # cached per contract hash, the source isn't prepared again.
+    with patch.object(LlmPipeline, "quote") as mock_quote:
+        response = await async_client.post(
+            "/audit/quote",
+            headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
+            json=mock_body.model_dump(),
+        )
+        mock_quote.assert_not_called()
+    assert response.json() == data
+
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_fail_if_quote_exceeds_credits(
+    user_with_auth_and_credits, async_client, job_pool
+):
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD,
+        raw_code="contract Test {}",
+    )
+    mock_body = EvalBody(
+        contract_id=str(contract.id), audit_type=AuditTypeEnum.SECURITY
+    )
+    quote = TokenQuote(input_tokens=10_000_000, output_tokens=0, tokenizer="estimate")
+
+    with patch.object(quote_estimator, "quote", AsyncMock(return_value=quote)):
         response = await async_client.post(
             "/audit",
             headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
             json=mock_body.model_dump(),
         )
 
-        # Assertions
-        assert response.status_code == 201
-        data = response.json()
-        assert "id" in data
-        assert data["status"] == AuditStatusEnum.WAITING.value
+    assert response.status_code == 402
+    assert job_pool.job is None
+    assert not await Audit.exists(contract_id=contract.id)
+
+    await contract.delete()
 
-        # Verify redis job was enqueued
-        mock_redis_pool.enqueue_job.assert_called_once_with(
-            "process_eval", _job_id=data["id"]
+
+@pytest.mark.anyio
+async def test_job_pool_connections_stay_flat(user_with_auth_and_credits, async_client):
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD,
+        raw_code="contract Load {}",
+    )
+    mock_body = EvalBody(contract_id=str(contract.id), audit_type=AuditTypeEnum.GAS)
+
+    pool = create_job_pool(
+        connection_class=fakeredis.aioredis.FakeConnection,
+        server=fakeredis.FakeServer(),
+    )
+    app.dependency_overrides[get_job_pool] = lambda: pool
+
+    def n_connections() -> int:
+        connections = pool.connection_pool
+        return len(connections._available_connections) + len(
+            connections._in_use_connections
         )
 
-        # Verify audit was created in database
-        audit = await Audit.get(id=data["id"])
-        assert audit.contract_id == contract.id
-        assert audit.audit_type == AuditTypeEnum.SECURITY
+    async def submit():
+        response = await async_client.post(
+            "/audit",
+            headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
+            json=mock_body.model_dump(),
+        )
+        assert response.status_code == 201
 
-    # Clean up
+    try:
+        counts = []
+        for _ in range(3):
+            await asyncio.gather(*(submit() for _ in range(50)))
+            counts.append(n_connections())
+
+        # connections are reused across bursts, never more than the pool size.
+        assert counts[0] == counts[-1]
+        assert counts[0] <= job_pool_size
+        assert len(await pool.queued_jobs()) == 150
+    finally:
+        del app.dependency_overrides[get_job_pool]
+        await pool.aclose(close_connection_pool=True)
+
+    await Audit.filter(contract_id=contract.id).delete()
     await contract.delete()
-    await audit.delete()
 
 
-class MockQueue:
-    def __init__(self):
-        self.job = None
+def test_route_audit_by_role():
+    def auth(role: RoleEnum) -> AuthState:
+        return AuthState(role=role, consumes_credits=True, user_id="user")
 
-    async def enqueue_job(self, function: str, _job_id: str, *args):
-        self.job = {"job_id": _job_id, "function": function}
+    assert route_audit(auth(RoleEnum.USER)) == INTERACTIVE_QUEUE
+    assert route_audit(auth(RoleEnum.APP_FIRST_PARTY)) == INTERACTIVE_QUEUE
+    assert route_audit(auth(RoleEnum.APP)) == BULK_QUEUE
+
+
+@pytest.mark.anyio
+async def test_fair_share_interleaves_bulk_submissions(fake_redis):
+    pool = ArqRedis(connection_pool=fake_redis.connection_pool)
+
+    async def enqueue(owner: str, i: int):
+        await pool.enqueue_job(
+            "process_eval",
+            _job_id=f"{owner}-{i}",
+            _queue_name=BULK_QUEUE,
+            _defer_until=await fair_share.schedule(BULK_QUEUE, owner),
+        )
+
+    for i in range(10):
+        await enqueue("bulk-app", i)
+    await enqueue("other-app", 0)
+
+    queued = [job_id.decode() for job_id in await fake_redis.zrange(BULK_QUEUE, 0, -1)]
+    # the other app's audit isn't stuck behind the whole batch.
+    assert queued.index("other-app-0") == 1
+    # none of them are scheduled ahead of time, so they run as soon as possible.
+    now = datetime.now(tz=timezone.utc).timestamp() * 1000
+    assert await fake_redis.zcount(BULK_QUEUE, "-inf", now) == 11
 
 
 @pytest.mark.anyio
 async def test_audit_processing_with_intermediate_states(
-    user_with_auth_and_credits, async_client, mock_prompts
+    user_with_auth_and_credits, async_client, mock_prompts, job_pool
 ):
     """This is intentionally a very large e2e test with the worker"""
     assert user_with_auth_and_credits.total_credits > 0
@@ -269,110 +439,105 @@ async def test_audit_processing_with_intermediate_states(
 
     from app.worker.main import process_eval
 
-    # Mock the arq Redis pool creation
-    with patch("app.api.audit.service.create_pool") as mock_create_pool:
-        mock_redis_pool = MockQueue()
-        mock_create_pool.return_value = mock_redis_pool
-
-        # Make request to create an audit
-        response = await async_client.post(
-            "/audit",
-            headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
-            json=mock_body.model_dump(),
-        )
+    # Make request to create an audit
+    response = await async_client.post(
+        "/audit",
+        headers={"Authorization": f"Bearer {USER_WITH_CREDITS_API_KEY}"},
+        json=mock_body.model_dump(),
+    )
 
-        # Assertions for response
-        assert response.status_code == 201
-        data = response.json()
+    # Assertions for response
+    assert response.status_code == 201
+    data = response.json()
 
-        audit_id = data["id"]
-
-        assert mock_redis_pool.job is not None
-
-        job = mock_redis_pool.job
-
-        # Verify job was enqueued with correct parameters
-        audit_id_job = job["job_id"]
-        assert audit_id == audit_id_job
-
-        mock_structure = OutputStructure(
-            introduction="test intro",
-            scope="mock scope",
-            conclusion="mock conclusion",
-            findings=FindingsStructure(
-                critical=[
-                    FindingType(
-                        name="fake name",
-                        explanation="fake exp",
-                        recommendation="fake ex",
-                        reference="fake ref",
-                    )
-                ],
-                high=[],
-                medium=[],
-                low=[
-                    FindingType(
-                        name="fake name",
-                        explanation="fake exp",
-                        recommendation="fake ex",
-                        reference="fake ref",
-                    )
-                ],
-            ),
-        )
+    audit_id = data["id"]
+
+    assert job_pool.job is not None
+
+    job = job_pool.job
+
+    # Verify job was enqueued with correct parameters
+    audit_id_job = job["job_id"]
+    assert audit_id == audit_id_job
+
+    mock_structure = OutputStructure(
+        introduction="test intro",
+        scope="mock scope",
+        conclusion="mock conclusion",
+        findings=FindingsStructure(
+            critical=[
+                FindingType(
+                    name="fake name",
+                    explanation="fake exp",
+                    recommendation="fake ex",
+                    reference="fake ref",
+                )
+            ],
+            high=[],
+            medium=[],
+            low=[
+                FindingType(
+                    name="fake name",
+                    explanation="fake exp",
+                    recommendation="fake ex",
+                    reference="fake ref",
+                )
+            ],
+        ),
+    )
 
-        mock_str = json.dumps(mock_structure.model_dump())
+    mock_str = json.dumps(mock_structure.model_dump())
 
-        # Create mock methods that check state before and after
-        # Counter to track number of calls to mock_chat_completions_create
-        # Use a thread-safe counter for async calls
-        inter_responses = []
+    # Create mock methods that check state before and after
+    # Counter to track number of calls to mock_chat_completions_create
+    # Use a thread-safe counter for async calls
+    inter_responses = []
 
-        # Use a shared set to track which calls have failed
-        failed_calls = set()
+    # Use a shared set to track which calls have failed
+    failed_calls = set()
 
-        async def mock_chat_completions_create(*args, **kwargs):
-            # intermediate state would've been created already, in processing.
-            last_added = await IntermediateResponse.filter(audit_id=audit_id)
-            assert last_added[0].status == AuditStatusEnum.PROCESSING
+    async def mock_chat_completions_create(*args, **kwargs):
+        # intermediate state would've been created already, in processing.
+        last_added = await IntermediateResponse.filter(audit_id=audit_id)
+        assert last_added[0].status == AuditStatusEnum.PROCESSING
 
-            # Get the current intermediate response ID
-            current_id = last_added[0].id
-            inter_responses.append(current_id)
+        # Get the current intermediate response ID
+        current_id = last_added[0].id
+        inter_responses.append(current_id)
 
-            # Fail exactly one call based on the ID
-            # This ensures deterministic failure even with async execution
-            if current_id not in failed_calls and not failed_calls:
-                failed_calls.add(current_id)
-                raise Exception("Simulated error in llm request")
+        # Fail exactly one call based on the ID
+        # This ensures deterministic failure even with async execution
+        if current_id not in failed_calls and not failed_calls:
+            failed_calls.add(current_id)
+            raise Exception("Simulated error in llm request")
 
-            # Return mock response for other calls
-            mock_response = AsyncMock(
-                choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
-                usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
-            )
+        # Return mock response for other calls
+        mock_response = AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
+            usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
+        )
 
-            return mock_response
+        return mock_response
 
-        async def mock_chat_completions_parse(*args, **kwargs):
-            # audit should still be processing
-            audit_before = await Audit.get(id=audit_id)
-            assert audit_before.status == AuditStatusEnum.PROCESSING
+    async def mock_chat_completions_parse(*args, **kwargs):
+        # audit should still be processing
+        audit_before = await Audit.get(id=audit_id)
+        assert audit_before.status == AuditStatusEnum.PROCESSING
 
-            # Return mock response with the structure needed
-            return AsyncMock(
-                choices=[AsyncMock(message=AsyncMock(content=mock_str))],
-                usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
-            )
+        # Return mock response with the structure needed
+        return AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content=mock_str))],
+            usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
+        )
 
-        # # Mock the LLM client methods
-        with patch("app.api.pipeline.audit_generation.llm_client") as mock_llm_client:
-            # Configure the mock methods
-            mock_llm_client.chat.completions.create = mock_chat_completions_create
-            mock_llm_client.beta.chat.completions.parse = mock_chat_completions_parse
+    # # Mock the LLM client methods
+    with patch("app.api.pipeline.audit_generation.llm_client") as mock_llm_client:
+        # Configure the mock methods
+        mock_llm_client.chat.completions.create = mock_chat_completions_create
+        mock_llm_client.beta.chat.completions.parse = mock_chat_completions_parse
 
-            # Process the evaluation
-            await process_eval(job)
+        # Process the evaluation
+        await process_eval(job)
 
     # Verify the audit status changes
     updated_audit = await Audit.get(id=audit_id)
@@ -381,6 +546,8 @@ async def test_audit_processing_with_intermediate_states(
     assert updated_audit.status == AuditStatusEnum.SUCCESS
     assert updated_audit.raw_output is not None
     assert updated_audit.processing_time_seconds is not None
+    assert "mock conclusion" in updated_audit.markdown
+    assert updated_audit.markdown_version == template_version
 
     inter_responses_db = await IntermediateResponse.filter(audit_id=audit_id)
     assert (
@@ -408,6 +575,510 @@ async def test_audit_processing_with_intermediate_states(
     await user_with_auth_and_credits.save()
 
 
+@pytest.mark.anyio
+async def test_audit_reuses_cached_result(user_with_auth_and_credits, mock_prompts):
+    from app.worker.tasks import handle_eval
+
+    contract = await Contract.create(
+        address="0xCACHETESTCONTRACT",
+        network=NetworkEnum.ETH,
+        method=ContractMethodEnum.SCAN,
+        raw_code="contract CacheTest {}",
+        is_available=True,
+    )
+
+    mock_structure = OutputStructure(
+        introduction="test intro",
+        scope="mock scope",
+        conclusion="mock conclusion",
+        findings=FindingsStructure(
+            critical=[],
+            high=[
+                FindingType(
+                    name="fake name",
+                    explanation="fake exp",
+                    recommendation="fake ex",
+                    reference="fake ref",
+                )
+            ],
+            medium=[],
+            low=[],
+        ),
+    )
+    mock_str = json.dumps(mock_structure.model_dump())
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        return_value=AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
+            usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
+        )
+    )
+    mock_llm_client.beta.chat.completions.parse = AsyncMock(
+        return_value=AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content=mock_str))],
+            usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
+        )
+    )
+
+    audit_first = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+    audit_second = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await handle_eval(audit_id=str(audit_first.id))
+
+        n_create_calls = mock_llm_client.chat.completions.create.call_count
+        n_parse_calls = mock_llm_client.beta.chat.completions.parse.call_count
+        assert n_create_calls == 2
+        assert n_parse_calls == 1
+
+        await handle_eval(audit_id=str(audit_second.id))
+
+        # no additional LLM calls were made for the second audit.
+        assert mock_llm_client.chat.completions.create.call_count == n_create_calls
+        assert mock_llm_client.beta.chat.completions.parse.call_count == n_parse_calls
+
+    audit_first = await Audit.get(id=audit_first.id)
+    audit_second = await Audit.get(id=audit_second.id)
+
+    assert audit_second.status == AuditStatusEnum.SUCCESS
+    assert audit_second.cache_key == audit_first.cache_key
+    assert audit_second.raw_output == audit_first.raw_output
+
+    findings = await Finding.filter(audit_id=audit_second.id)
+    assert len(findings) == 1
+    assert findings[0].level == FindingLevelEnum.HIGH
+
+    steps = await IntermediateResponse.filter(audit_id=audit_second.id)
+    assert len(steps) == 3
+
+    await audit_first.delete()
+    await audit_second.delete()
+    await contract.delete()
+
+    user_with_auth_and_credits.total_credits = 100
+    user_with_auth_and_credits.used_credits = 0
+    await user_with_auth_and_credits.save()
+
+
+@pytest.mark.anyio
+async def test_audit_coalesces_identical_inflight_audits(
+    user_with_auth_and_credits, user_with_auth, mock_prompts, monkeypatch
+):
+    from app.worker.tasks import handle_eval
+
+    monkeypatch.setattr(inflight_audits, "POLL_INTERVAL", 0.01)
+
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD,
+        raw_code="contract CoalesceTest {}",
+        hash_code="coalesce-hash",
+    )
+
+    mock_structure = OutputStructure(
+        introduction="test intro",
+        scope="mock scope",
+        conclusion="mock conclusion",
+        findings=FindingsStructure(
+            critical=[],
+            high=[
+                FindingType(
+                    name="fake name",
+                    explanation="fake exp",
+                    recommendation="fake ex",
+                    reference="fake ref",
+                )
+            ],
+            medium=[],
+            low=[],
+        ),
+    )
+    mock_str = json.dumps(mock_structure.model_dump())
+
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def create(*args, **kwargs):
+        started.set()
+        await release.wait()
+        return AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
+            usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
+        )
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(side_effect=create)
+    mock_llm_client.beta.chat.completions.parse = AsyncMock(
+        return_value=AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content=mock_str))],
+            usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
+        )
+    )
+
+    # submitted by different users, each is billed for their own audit.
+    audit_first = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+    audit_second = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+
+    users = [user_with_auth_and_credits, user_with_auth]
+    n_transactions = [
+        await Transaction.filter(user_id=user.id).count() for user in users
+    ]
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        first = asyncio.create_task(handle_eval(audit_id=str(audit_first.id)))
+        await started.wait()
+        second = asyncio.create_task(handle_eval(audit_id=str(audit_second.id)))
+        # the second audit is waiting on the first, which is still in flight.
+        await asyncio.sleep(0.05)
+        assert not second.done()
+
+        release.set()
+        await asyncio.gather(first, second)
+
+    # a single LLM run for both audits.
+    assert mock_llm_client.chat.completions.create.call_count == 2
+    assert mock_llm_client.beta.chat.completions.parse.call_count == 1
+
+    audit_second = await Audit.get(id=audit_second.id)
+    assert audit_second.status == AuditStatusEnum.SUCCESS
+    assert audit_second.raw_output == (await Audit.get(id=audit_first.id)).raw_output
+    findings = await Finding.filter(audit_id=audit_second.id)
+    assert [finding.level for finding in findings] == [FindingLevelEnum.HIGH]
+
+    used_credits = []
+    for user, n in zip(users, n_transactions):
+        assert await Transaction.filter(user_id=user.id).count() == n + 1
+        user = await User.get(id=user.id)
+        used_credits.append(user.used_credits)
+        user.used_credits = 0
+        await user.save()
+    assert all(used > 0 for used in used_credits)
+
+    await audit_first.delete()
+    await audit_second.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_audit_skips_cache_for_partial_result(
+    user_with_auth_and_credits, mock_prompts
+):
+    from app.worker.tasks import handle_eval
+
+    contract = await Contract.create(
+        address="0xPARTIALTESTCONTRACT",
+        network=NetworkEnum.ETH,
+        method=ContractMethodEnum.SCAN,
+        raw_code="contract PartialTest {}",
+        is_available=True,
+    )
+
+    mock_structure = OutputStructure(
+        introduction="test intro",
+        scope="mock scope",
+        conclusion="mock conclusion",
+        findings=FindingsStructure(critical=[], high=[], medium=[], low=[]),
+    )
+
+    completion = AsyncMock(
+        choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
+        usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
+    )
+    mock_llm_client = MagicMock()
+    # the first candidate of the first audit fails, the rest succeed.
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=[
+            ValueError("malformed request"),
+            completion,
+            completion,
+            completion,
+        ]
+    )
+    mock_llm_client.beta.chat.completions.parse = AsyncMock(
+        return_value=AsyncMock(
+            choices=[
+                AsyncMock(
+                    message=AsyncMock(content=json.dumps(mock_structure.model_dump()))
+                )
+            ],
+            usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
+        )
+    )
+
+    audit_first = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+    audit_second = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await handle_eval(audit_id=str(audit_first.id))
+        await handle_eval(audit_id=str(audit_second.id))
+
+        # the partial report wasn't reused, the failed candidate was recomputed.
+        assert mock_llm_client.chat.completions.create.call_count == 3
+        assert mock_llm_client.beta.chat.completions.parse.call_count == 2
+
+    audit_first = await Audit.get(id=audit_first.id)
+    audit_second = await Audit.get(id=audit_second.id)
+
+    assert audit_first.status == AuditStatusEnum.SUCCESS
+    assert audit_first.cache_key is None
+    assert audit_second.cache_key is not None
+
+    await contract.delete()
+
+    user_with_auth_and_credits.total_credits = 100
+    user_with_auth_and_credits.used_credits = 0
+    await user_with_auth_and_credits.save()
+
+
+@pytest.mark.anyio
+async def test_audit_reruns_only_changed_candidates(
+    user_with_auth_and_credits, mock_prompts
+):
+    from app.api.admin.interface import UpdatePromptBody
+    from app.api.admin.service import AdminService
+    from app.worker.tasks import handle_eval
+
+    contract = await Contract.create(
+        address="0xMEMOTESTCONTRACT",
+        network=NetworkEnum.ETH,
+        method=ContractMethodEnum.SCAN,
+        raw_code="contract MemoTest {}",
+        is_available=True,
+    )
+
+    mock_structure = OutputStructure(
+        introduction="test intro",
+        scope="mock scope",
+        conclusion="mock conclusion",
+        findings=FindingsStructure(critical=[], high=[], medium=[], low=[]),
+    )
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        return_value=AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content="Mock LLM response"))],
+            usage=AsyncMock(prompt_tokens=100, completion_tokens=100),
+        )
+    )
+    mock_llm_client.beta.chat.completions.parse = AsyncMock(
+        return_value=AsyncMock(
+            choices=[
+                AsyncMock(
+                    message=AsyncMock(content=json.dumps(mock_structure.model_dump()))
+                )
+            ],
+            usage=AsyncMock(prompt_tokens=500, completion_tokens=500),
+        )
+    )
+
+    audit_first = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+    audit_second = await Audit.create(
+        contract=contract,
+        user_id=user_with_auth_and_credits.id,
+        audit_type=AuditTypeEnum.GAS,
+    )
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await handle_eval(audit_id=str(audit_first.id))
+        assert mock_llm_client.chat.completions.create.call_count == 2
+
+        prompt = await Prompt.get(audit_type=AuditTypeEnum.GAS, tag="test-1")
+        original_content = prompt.content
+        await AdminService().update_prompt(
+            id=str(prompt.id),
+            body=UpdatePromptBody(content=f"{original_content} (revised)"),
+        )
+
+        try:
+            await handle_eval(audit_id=str(audit_second.id))
+        finally:
+            await AdminService().update_prompt(
+                id=str(prompt.id),
+                body=UpdatePromptBody(content=original_content),
+            )
+
+        # only the revised candidate, and the reviewer, were recomputed.
+        assert mock_llm_client.chat.completions.create.call_count == 3
+        assert mock_llm_client.beta.chat.completions.parse.call_count == 2
+
+    steps = await IntermediateResponse.filter(audit_id=audit_second.id)
+    assert len(steps) == 3
+    for step in steps:
+        assert step.status == AuditStatusEnum.SUCCESS
+
+    await contract.delete()
+
+    user_with_auth_and_credits.total_credits = 100
+    user_with_auth_and_credits.used_credits = 0
+    await user_with_auth_and_credits.save()
+
+
+class MockCompletionStream:
+    def __init__(self, deltas: list[str], completion, error: Exception = None):
+        self.deltas = deltas
+        self.completion = completion
+        # raised part way through the stream, once every delta was yielded.
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            yield MagicMock(type="content.delta", delta=delta)
+        if self.error:
+            raise self.error
+
+    async def get_final_completion(self):
+        return self.completion
+
+
+@pytest.mark.anyio
+async def test_pipeline_streams_batched_deltas(mock_prompts):
+    from app.api.pipeline.audit_generation import LlmPipeline
+
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code="contract StreamTest {}"
+    )
+    audit = await Audit.create(contract=contract, audit_type=AuditTypeEnum.GAS)
+    audit = await Audit.get(id=audit.id).select_related("contract")
+
+    deltas = [f"token-{i} " for i in range(20)]
+    completion = AsyncMock(
+        choices=[AsyncMock(message=AsyncMock(content="".join(deltas)))],
+        usage=AsyncMock(prompt_tokens=100, completion_tokens=20),
+    )
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.beta.chat.completions.stream = MagicMock(
+        side_effect=lambda **kwargs: MockCompletionStream(deltas, completion)
+    )
+    mock_redis_client = MagicMock()
+    mock_redis_client.publish = AsyncMock()
+
+    pipeline = LlmPipeline(
+        audit=audit, input=contract.raw_code, should_publish=True, should_stream=True
+    )
+    pipeline.STREAM_FLUSH_CHARS = 40
+
+    with (
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+        patch("app.api.pipeline.audit_generation.redis_client", mock_redis_client),
+    ):
+        await pipeline.load_prompts()
+        result = await pipeline._generate_candidate(pipeline.candidate_prompts[0])
+
+    assert result == "".join(deltas)
+
+    messages = [json.loads(c.args[1]) for c in mock_redis_client.publish.call_args_list]
+    streamed = [m["content"] for m in messages if m["status"] == "delta"]
+
+    # deltas are batched, but nothing is lost.
+    assert 1 < len(streamed) < len(deltas)
+    assert "".join(streamed) == "".join(deltas)
+    assert all(m["shard"] is None and m["attempt"] == 1 for m in messages[1:-1])
+    assert messages[-1]["status"] == "done"
+
+    assert pipeline.usage.input_tokens == 100
+    assert pipeline.usage.output_tokens == 20
+
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_resets_stream_on_retry(mock_prompts):
+    from openai import APIConnectionError
+
+    from app.api.pipeline.audit_generation import LlmPipeline
+
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code="contract StreamRetryTest {}"
+    )
+    audit = await Audit.create(contract=contract, audit_type=AuditTypeEnum.GAS)
+    audit = await Audit.get(id=audit.id).select_related("contract")
+
+    deltas = ["partial ", "response"]
+    completion = AsyncMock(
+        choices=[AsyncMock(message=AsyncMock(content="".join(deltas)))],
+        usage=AsyncMock(prompt_tokens=100, completion_tokens=20),
+    )
+    dropped = APIConnectionError(request=MagicMock())
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.beta.chat.completions.stream = MagicMock(
+        side_effect=[
+            MockCompletionStream(deltas[:1], completion, error=dropped),
+            MockCompletionStream(deltas, completion),
+        ]
+    )
+    mock_redis_client = MagicMock()
+    mock_redis_client.publish = AsyncMock()
+
+    pipeline = LlmPipeline(
+        audit=audit, input=contract.raw_code, should_publish=True, should_stream=True
+    )
+    pipeline.BACKOFF_BASE = 0
+    pipeline.STREAM_FLUSH_CHARS = 1
+
+    with (
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+        patch("app.api.pipeline.audit_generation.redis_client", mock_redis_client),
+    ):
+        await pipeline.load_prompts()
+        result = await pipeline._generate_candidate(pipeline.candidate_prompts[0])
+
+    assert result == "".join(deltas)
+
+    messages = [json.loads(c.args[1]) for c in mock_redis_client.publish.call_args_list]
+    statuses = [(m["status"], m.get("attempt")) for m in messages]
+    assert statuses == [
+        ("start", None),
+        ("delta", 1),
+        ("reset", 2),
+        ("delta", 2),
+        ("delta", 2),
+        ("done", None),
+    ]
+
+    # replaying the events after the last reset gives the final response.
+    reset = statuses.index(("reset", 2))
+    streamed = [m["content"] for m in messages[reset:] if m["status"] == "delta"]
+    assert "".join(streamed) == result
+
+    await contract.delete()
+
+
 @pytest.mark.anyio
 async def test_get_audit(user_with_auth, async_client):
     """Test retrieving a specific audit through the API endpoint"""
@@ -457,6 +1128,26 @@ async def test_get_audit(user_with_auth, async_client):
     assert data["contract"]["id"] == str(contract.id)
     assert data["user"]["id"] == str(user.id)
 
+    # rendered once, then served as stored.
+    audit = await Audit.get(id=audit.id)
+    assert audit.markdown == data["result"]
+    assert audit.markdown_version == template_version
+
+    await Audit.filter(id=audit.id).update(markdown="stored report")
+    response = await async_client.get(
+        f"/audit/{audit.id}",
+        headers={"Authorization": f"Bearer {USER_API_KEY}"},
+    )
+    assert response.json()["result"] == "stored report"
+
+    # re-rendered once the templates changed.
+    await Audit.filter(id=audit.id).update(markdown_version="outdated")
+    response = await async_client.get(
+        f"/audit/{audit.id}",
+        headers={"Authorization": f"Bearer {USER_API_KEY}"},
+    )
+    assert response.json()["result"] == data["result"]
+
     # Clean up
     await audit.delete()
     await contract.delete()
@@ -1,17 +1,28 @@
+import asyncio
 import json
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
 import pytest_asyncio
-from httpx import Request, Response
+from httpx import AsyncClient, MockTransport, Request, Response
 
 from app.api.auth.service import AuthService
 from app.api.contract.interface import ContractScanBody
+from app.api.contract.service import ContractService
 from app.api.user.service import UserService
 from app.db.models import Auth, Contract, Permission
-from app.lib.clients import ExplorerClient
+from app.lib.clients import ExplorerClient, Web3Client
+from app.lib.clients.explorer import explorer_limiters
+from app.utils.constants.mappers import network_rpc_mapper
 from app.utils.schema.dependencies import AuthState
-from app.utils.types.enums import ClientTypeEnum, NetworkEnum, RoleEnum
+from app.utils.types.enums import (
+    ClientTypeEnum,
+    ContractMethodEnum,
+    NetworkEnum,
+    RoleEnum,
+)
+from app.worker.scanner import DeploymentScanner
 from tests.constants import USER_API_KEY
 
 USER_WITH_CREDITS_ADDRESS = "0xuserwithcredits"
@@ -393,3 +404,222 @@ async def test_contract_scan_different_responses(user_with_auth, async_client):
             assert non_eth_contract is None
 
     await Contract.all().delete()
+
+
+class FakeChain:
+    """Blocks with a deployment each, as returned by Web3Client."""
+
+    def __init__(self, head: int):
+        self.head = head
+        self.fetched = []
+
+    async def get_block_number(self):
+        return self.head
+
+    async def get_blocks_receipts(self, blocks):
+        self.fetched.append(list(blocks))
+        return [
+            [
+                {"to": "0xrecipient", "contractAddress": None},
+                {"to": None, "contractAddress": f"0xdeployed{block}"},
+            ]
+            for block in blocks
+        ]
+
+
+@pytest.mark.anyio
+async def test_deployment_scanner_backfills_from_cursor(fake_redis):
+    async def mock_get_source_code(self, client, address, network):
+        return {
+            "network": network,
+            "address": address,
+            "exists": True,
+            "is_available": address != "0xdeployed97",
+            "code": "contract Deployed {}",
+            "is_proxy": False,
+            "contract_name": "Deployed",
+        }
+
+    chain = FakeChain(head=100)
+    scanner = DeploymentScanner(
+        network=NetworkEnum.ETH,
+        redis=fake_redis,
+        web3_client=chain,
+        confirmations=5,
+        batch_size=2,
+        concurrency=2,
+        max_blocks=5,
+    )
+
+    with patch(
+        "app.api.blockchain.service.BlockchainService.get_source_code",
+        new=mock_get_source_code,
+    ):
+        # starts from the confirmed head.
+        assert await scanner.run() == 0
+        assert await scanner.get_cursor() == 95
+
+        # blocks missed meanwhile are backfilled, a bounded range at a time.
+        chain.head = 106
+        assert await scanner.run() == 5
+        assert await scanner.get_cursor() == 100
+        assert await scanner.run() == 1
+        assert await scanner.get_cursor() == 101
+        # in batches, up to 2 at once.
+        assert chain.fetched == [[96, 97], [98, 99], [100], [101]]
+
+        # scanned again, ie. after a failure, without saving duplicates.
+        await fake_redis.set(scanner.cursor_key, 95)
+        await scanner.run()
+
+    contracts = await Contract.filter(
+        method=ContractMethodEnum.SCAN, network=NetworkEnum.ETH
+    ).order_by("address")
+    # unverified sources aren't saved.
+    assert [contract.address for contract in contracts] == [
+        f"0xdeployed{block}" for block in [100, 101, 96, 98, 99]
+    ]
+    assert all(contract.hash_code for contract in contracts)
+
+    await Contract.filter(method=ContractMethodEnum.SCAN).delete()
+
+
+@pytest.mark.anyio
+async def test_web3_client_batches_receipts_on_pooled_provider():
+    client = Web3Client(network=NetworkEnum.ETH)
+    # sessions, and their connections, are shared.
+    assert Web3Client(network=NetworkEnum.ETH).provider is client.provider
+    assert Web3Client(network=NetworkEnum.BASE).provider is not client.provider
+
+    async def mock_post(endpoint_uri, data, **kwargs):
+        return json.dumps(
+            [
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "result": [
+                        {
+                            "to": None,
+                            "contractAddress": f"0x{int(request['params'][0], 16):040}",
+                        }
+                    ],
+                }
+                for request in json.loads(data)
+            ]
+        ).encode()
+
+    session_manager = client.provider.provider._request_session_manager
+    with patch.object(
+        session_manager, "async_make_post_request", side_effect=mock_post
+    ) as post:
+        receipts = await client.get_blocks_receipts([1, 2, 3])
+
+    assert post.call_count == 1
+    assert [block[0]["contractAddress"][-1] for block in receipts] == ["1", "2", "3"]
+
+
+@pytest.mark.anyio
+async def test_explorer_caches_source_code(fake_redis):
+    VERIFIED, UNVERIFIED, RATE_LIMITED = "0xverified", "0xunverified", "0xlimited"
+    requests = []
+
+    async def handler(request):
+        address = request.url.params["address"]
+        requests.append(address)
+        # lets concurrent lookups pile up.
+        await asyncio.sleep(0.05)
+        if address == RATE_LIMITED:
+            result = "Max rate limit reached"
+        else:
+            result = [{"SourceCode": "contract A {}" if address == VERIFIED else ""}]
+        return Response(status_code=200, json={"result": result})
+
+    explorer_client = ExplorerClient()
+    async with AsyncClient(transport=MockTransport(handler)) as client:
+
+        async def get_source_code(address: str):
+            response = await explorer_client.get_source_code(
+                client=client, network=NetworkEnum.ETH, address=address
+            )
+            response.raise_for_status()
+            return response.json()["result"]
+
+        # concurrent lookups share a single request.
+        results = await asyncio.gather(*[get_source_code(VERIFIED) for _ in range(3)])
+        assert requests == [VERIFIED]
+        assert results[0] == results[2]
+
+        for address in [VERIFIED, UNVERIFIED, UNVERIFIED, RATE_LIMITED, RATE_LIMITED]:
+            await get_source_code(address)
+
+    assert requests == [VERIFIED, UNVERIFIED, RATE_LIMITED, RATE_LIMITED]
+    assert await fake_redis.ttl(f"source_code|eth|{VERIFIED}") == 604_800
+    assert await fake_redis.ttl(f"source_code|eth|{UNVERIFIED}") == 600
+
+
+@pytest.mark.anyio
+async def test_contract_lookup_detects_networks_first(monkeypatch):
+    monkeypatch.setattr("app.api.blockchain.service.detect_networks", True)
+    queried = []
+
+    async def mock_has_code(self, address):
+        url = self.provider.provider.endpoint_uri
+        if network_rpc_mapper[NetworkEnum.ARB] in url:
+            raise TimeoutError()
+        return network_rpc_mapper[NetworkEnum.ETH] in url
+
+    async def mock_get_source_code(self, client, network, address):
+        queried.append(network)
+        return Response(
+            request=Request("GET", "https://mocked.url"),
+            status_code=200,
+            json={"result": [{"SourceCode": "contract A {}"}]},
+        )
+
+    with patch.object(Web3Client, "has_code", new=mock_has_code), patch.object(
+        ExplorerClient, "get_source_code", new=mock_get_source_code
+    ):
+        contracts = await ContractService()._get_or_create_contract(
+            code=None, address=STANDARD_JSON_ADDRESS, network=None
+        )
+
+    # networks that couldn't be checked are still queried.
+    assert sorted(queried) == sorted([NetworkEnum.ETH, NetworkEnum.ARB])
+    assert {contract.network for contract in contracts} == set(queried)
+
+    await Contract.filter(address=STANDARD_JSON_ADDRESS).delete()
+
+
+@pytest.mark.anyio
+async def test_explorer_queues_on_rate_limit(monkeypatch):
+    limiter = explorer_limiters["api.etherscan.io"]
+    # shorter windows, so that the test doesn't wait on them.
+    monkeypatch.setattr(limiter, "window", 0.1)
+    monkeypatch.setattr(limiter, "rpm", 2)
+    requests = []
+
+    async def handler(request):
+        requests.append(time.monotonic())
+        if len(requests) == 1:
+            return Response(
+                status_code=200,
+                json={"status": "0", "message": "NOTOK", "result": "Max rate limit"},
+            )
+        return Response(status_code=200, json={"status": "1", "result": []})
+
+    explorer_client = ExplorerClient()
+    async with AsyncClient(transport=MockTransport(handler)) as client:
+        responses = await asyncio.gather(
+            *[
+                explorer_client.get_source_code(
+                    client=client, network=NetworkEnum.ETH, address=f"0x{i}"
+                )
+                for i in range(4)
+            ]
+        )
+
+    # the rejected request is retried rather than surfaced.
+    assert len(requests) == 5
+    assert all(response.json()["status"] == "1" for response in responses)
+    # held back once rejected, and 2 per window after.
+    assert requests[-1] - requests[0] >= 0.1
@@ -0,0 +1,1015 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from openai import APITimeoutError, RateLimitError
+
+from app.api.pipeline.audit_generation import LlmPipeline, step_latencies
+from app.api.pipeline.checkpoint_writer import CheckpointWriter
+from app.db.models import Audit, Contract, Finding, IntermediateResponse, Prompt
+from app.lib.clients.fake_llm import DEFAULT_RECORDINGS, FakeLlmClient
+from app.utils.helpers.code_normalizer import (
+    SourceNormalizer,
+    remap_line_references,
+)
+from app.utils.helpers.code_sharder import (
+    SourceCodeSharder,
+    estimate_tokens,
+    fit_to_budget,
+)
+from app.utils.helpers.findings_merger import merge_findings
+from app.utils.helpers.findings_parser import decode_findings
+from app.utils.helpers.library_detector import LibraryDetector, fingerprint
+from app.utils.helpers.rate_limit import RateLimiter
+from app.utils.schema.output import (
+    CandidateFindingType,
+    CandidateOutputStructure,
+    SecurityOutputStructure,
+)
+from app.utils.types.enums import AuditStatusEnum, AuditTypeEnum, ContractMethodEnum
+
+MULTI_FILE_SOURCE = """// File: contracts/interfaces/IVault.sol
+
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+interface IVault {
+    function deposit(uint256 amount) external;
+}
+
+// File: contracts/Vault.sol
+
+pragma solidity ^0.8.20;
+
+import "./interfaces/IVault.sol";
+
+/// @notice braces in comments are ignored: {
+contract Vault is IVault {
+    string private constant NAME = "vault }";
+
+    function deposit(uint256 amount) external {
+        if (amount == 0) {
+            revert();
+        }
+    }
+}
+
+// File: contracts/Helper.sol
+
+pragma solidity ^0.8.20;
+
+library Helper {
+    function double(uint256 x) internal pure returns (uint256) {
+        return x * 2;
+    }
+}"""
+
+
+def test_sharder_keeps_small_source_whole():
+    shards = SourceCodeSharder(source=MULTI_FILE_SOURCE, token_budget=10_000).shard()
+
+    assert len(shards) == 1
+    assert shards[0]["content"] == MULTI_FILE_SOURCE
+    assert shards[0]["files"] == [
+        "contracts/interfaces/IVault.sol",
+        "contracts/Vault.sol",
+        "contracts/Helper.sol",
+    ]
+
+
+def test_sharder_splits_on_definitions_with_shared_header():
+    budget = 100
+    shards = SourceCodeSharder(source=MULTI_FILE_SOURCE, token_budget=budget).shard()
+
+    assert len(shards) == 2
+    assert shards[0]["files"] == ["contracts/Vault.sol"]
+    assert shards[1]["files"] == ["contracts/Helper.sol"]
+
+    for shard in shards:
+        # header is shared, and deduplicated.
+        assert shard["content"].count("pragma solidity ^0.8.20;") == 1
+        assert "interface IVault" in shard["content"]
+        assert shard["n_tokens"] <= budget
+
+    # definitions are never split when they fit.
+    assert 'string private constant NAME = "vault }";' in shards[0]["content"]
+    assert "library Helper" not in shards[0]["content"]
+    assert "contract Vault" not in shards[1]["content"]
+
+    # every line can be traced back to the source, file markers to their file.
+    original = MULTI_FILE_SOURCE.split("\n")
+    for shard in shards:
+        lines = shard["content"].split("\n")
+        assert len(shard["line_map"]) == len(lines)
+        for line, source_line in zip(lines, shard["line_map"]):
+            if line and not line.startswith("// File:"):
+                assert original[source_line - 1].strip() == line.strip()
+    helper = shards[1]["content"].split("\n").index("// File: contracts/Helper.sol")
+    assert original[shards[1]["line_map"][helper] - 1] == "library Helper {"
+
+
+def test_sharder_chunks_oversized_definitions():
+    body = "\n".join(f"    uint256 public value{i};" for i in range(200))
+    source = f"pragma solidity ^0.8.20;\n\ncontract Large {{\n{body}\n}}"
+
+    budget = 500
+    shards = SourceCodeSharder(source=source, token_budget=budget).shard()
+
+    assert len(shards) > 1
+    original = source.split("\n")
+    for shard in shards:
+        assert shard["content"].startswith("pragma solidity ^0.8.20;")
+        assert estimate_tokens(shard["content"]) <= budget
+        for line, source_line in zip(shard["content"].split("\n"), shard["line_map"]):
+            if line:
+                assert original[source_line - 1].strip() == line.strip()
+
+
+def test_fit_to_budget_shares_unused_budget():
+    short = "short finding"
+    long = "\n".join(f"finding {i}: reentrancy in withdraw()" for i in range(500))
+    texts = [long, short, long]
+
+    budget = 1000
+    fitted = fit_to_budget(texts, budget)
+
+    assert sum(estimate_tokens(text) for text in fitted) <= budget
+    # short texts are kept whole, the rest share what they leave.
+    assert fitted[1] == short
+    for text in [fitted[0], fitted[2]]:
+        assert text.endswith("\n[truncated]")
+        assert estimate_tokens(text) > budget // 3
+        # cut on a line boundary.
+        assert long.startswith(text.removesuffix("\n[truncated]") + "\n")
+
+    assert fit_to_budget(texts, 10**6) == texts
+
+
+def test_library_detector_stubs_unmodified_files():
+    helper = MULTI_FILE_SOURCE.split("// File: contracts/Helper.sol")[1]
+    # explorers don't preserve line endings, these shouldn't affect matching.
+    index = {
+        fingerprint(helper.replace("\n", "\r\n")): {
+            "library": "Solmate",
+            "version": "6.2.0",
+            "path": "utils/Helper.sol",
+        }
+    }
+
+    detector = LibraryDetector(source=MULTI_FILE_SOURCE, index=index)
+    stubbed = detector.stub()
+
+    assert detector.matches == [index[fingerprint(helper)]]
+    assert "// Solmate utils/Helper.sol v6.2.0, unmodified" in stubbed
+    assert "library Helper" not in stubbed
+    # other files, and their markers, are untouched.
+    assert "// File: contracts/Helper.sol" in stubbed
+    assert "contract Vault is IVault" in stubbed
+    assert detector.bytes_saved == len(MULTI_FILE_SOURCE) - len(stubbed)
+    assert detector.tokens_saved > 0
+
+    modified = MULTI_FILE_SOURCE.replace("x * 2", "x * 3")
+    detector = LibraryDetector(source=modified, index=index)
+    assert detector.stub() == modified
+    assert detector.bytes_saved == 0
+
+
+# utils/Context.sol, as published in @openzeppelin/contracts 5.0.0.
+OPENZEPPELIN_CONTEXT = """// SPDX-License-Identifier: MIT
+// OpenZeppelin Contracts (last updated v5.0.0) (utils/Context.sol)
+
+pragma solidity ^0.8.20;
+
+/**
+ * @dev Provides information about the current execution context, including the
+ * sender of the transaction and its data. While these are generally available
+ * via msg.sender and msg.data, they should not be accessed in such a direct
+ * manner, since when dealing with meta-transactions the account sending and
+ * paying for execution may not be the actual sender (as far as an application
+ * is concerned).
+ *
+ * This contract is only required for intermediate, library-like contracts.
+ */
+abstract contract Context {
+    function _msgSender() internal view virtual returns (address) {
+        return msg.sender;
+    }
+
+    function _msgData() internal view virtual returns (bytes calldata) {
+        return msg.data;
+    }
+}
+"""
+
+
+def test_library_detector_matches_seeded_index():
+    source = (
+        "// File: @openzeppelin/contracts/utils/Context.sol\n\n"
+        f"{OPENZEPPELIN_CONTEXT}\n"
+        "// File: contracts/Token.sol\n\n"
+        "pragma solidity ^0.8.20;\n\n"
+        'import "@openzeppelin/contracts/utils/Context.sol";\n\n'
+        "contract Token is Context {}\n"
+    )
+
+    detector = LibraryDetector(source=source)
+    stubbed = detector.stub()
+
+    assert detector.matches == [
+        {"library": "OpenZeppelin", "path": "utils/Context.sol", "version": "5.0.0"}
+    ]
+    assert "// OpenZeppelin utils/Context.sol v5.0.0, unmodified" in stubbed
+    assert "abstract contract Context" not in stubbed
+    assert "contract Token is Context {}" in stubbed
+
+
+def test_decode_findings_skips_surrounding_text():
+    raw = (
+        "Here is the report:\n"
+        '{"introduction": "Uses <<transfer>>", "scope": "", "conclusion": "", '
+        '"findings": {"critical": [], "high": [{"name": "Unchecked <<call>>", '
+        '"explanation": "<<a>> and <<b>>, while x >> 2 is left as is", '
+        '"recommendation": "", "reference": "line 3"}], "medium": [], "low": []}}'
+        "\nLet me know if you need anything else."
+    )
+
+    model = decode_findings(raw, SecurityOutputStructure)
+
+    assert model.introduction == "Uses `transfer`"
+    finding = model.findings.high[0]
+    assert finding.name == "Unchecked `call`"
+    assert finding.explanation == "`a` and `b`, while x >> 2 is left as is"
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "no findings",
+        '{"introduction": "missing fields"}',
+        '{"introduction": "truncated", "findings": {',
+    ],
+)
+def test_decode_findings_rejects_invalid_output(raw):
+    with pytest.raises(ValueError):
+        decode_findings(raw, SecurityOutputStructure)
+
+
+def test_normalizer_strips_comments_and_maps_lines():
+    normalizer = SourceNormalizer(source=MULTI_FILE_SOURCE)
+    normalized = normalizer.normalize()
+
+    assert "SPDX-License-Identifier" not in normalized
+    assert "@notice" not in normalized
+    assert "\n\n" not in normalized
+    # markers and strings that look like comments are kept.
+    assert "// File: contracts/Vault.sol" in normalized
+    assert 'string private constant NAME = "vault }";' in normalized
+    assert normalizer.compression_ratio < 1
+
+    original = MULTI_FILE_SOURCE.split("\n")
+    for i, line in enumerate(normalized.split("\n")):
+        assert original[normalizer.line_map[i] - 1].strip() == line
+
+    line = normalized.split("\n").index("revert();") + 1
+    original_line = original.index("            revert();") + 1
+    reference = remap_line_references(
+        f"Line {line}, lines 1-{line}", normalizer.line_map
+    )
+    assert reference == f"Line {original_line}, lines 1-{original_line}"
+
+
+def test_line_map_composes_through_library_stubs():
+    helper = MULTI_FILE_SOURCE.split("// File: contracts/Helper.sol")[1]
+    vault = MULTI_FILE_SOURCE.split("// File: contracts/Vault.sol")[1]
+    source = (
+        f"// File: contracts/Helper.sol{helper}\n\n// File: contracts/Vault.sol{vault}"
+    )
+    index = {
+        fingerprint(helper): {
+            "library": "Solmate",
+            "version": "6.2.0",
+            "path": "utils/Helper.sol",
+        }
+    }
+
+    with patch("app.utils.helpers.library_detector.library_index", index):
+        pipeline = LlmPipeline(
+            audit=Audit(audit_type=AuditTypeEnum.SECURITY),
+            input=source,
+            should_normalize=True,
+        )
+
+    assert "library Helper" not in pipeline.input
+    assert "// Solmate utils/Helper.sol v6.2.0, unmodified" in pipeline.input
+    original = source.split("\n")
+    for i, line in enumerate(pipeline.input.split("\n")):
+        if line.endswith("unmodified"):
+            assert original[pipeline.line_map[i] - 2] == "// File: contracts/Helper.sol"
+            continue
+        assert original[pipeline.line_map[i] - 1].strip() == line
+
+
+def test_pipeline_fits_candidates_to_reviewer_budget():
+    pipeline = LlmPipeline(
+        audit=Audit(audit_type=AuditTypeEnum.SECURITY), input=MULTI_FILE_SOURCE
+    )
+    findings = "\n".join(f"finding {i}: unchecked return value" for i in range(2000))
+
+    with patch.object(LlmPipeline, "REVIEWER_TOKEN_BUDGET", 4000):
+        constructed = pipeline._construct_candidate_prompt(
+            {0: findings, 1: None, 2: findings}
+        )
+
+    assert estimate_tokens(constructed) <= 4000
+    assert "Auditor #1 Findings:" in constructed
+    assert "Auditor #2 Findings:" not in constructed
+    assert "Auditor #3 Findings:" in constructed
+    assert constructed.count("[truncated]") == 2
+
+
+@pytest.mark.anyio
+async def test_pipeline_fans_out_shards_per_candidate():
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code=MULTI_FILE_SOURCE
+    )
+    audit = await Audit.create(contract=contract, audit_type=AuditTypeEnum.SECURITY)
+    audit = await Audit.get(id=audit.id).select_related("contract")
+    prompt = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="sharded",
+        version="0.1",
+        content="fake prompt",
+        is_active=False,
+    )
+
+    async def mock_chat_completions_create(*args, **kwargs):
+        lines = kwargs["messages"][1]["content"].split("\n")
+        definition = "library Helper {" if "library Helper {" in lines else "contract"
+        line = next(i for i, text in enumerate(lines) if text.startswith(definition))
+        name = "Helper" if definition == "library Helper {" else "Vault"
+        content = f"findings for {name} at line {line + 1}"
+        return AsyncMock(
+            choices=[AsyncMock(message=AsyncMock(content=content))],
+            usage=AsyncMock(prompt_tokens=100, completion_tokens=10),
+        )
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=mock_chat_completions_create
+    )
+
+    with (
+        patch.object(LlmPipeline, "SHARD_TOKEN_BUDGET", 100),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+        result = await pipeline._generate_candidate(prompt)
+        await pipeline.checkpoints.flush()
+
+    assert len(pipeline.shards) == 2
+    assert mock_llm_client.chat.completions.create.call_count == 2
+    # line numbers are resolved from the shard to the original source.
+    original = MULTI_FILE_SOURCE.split("\n")
+    vault = original.index("contract Vault is IVault {") + 1
+    helper = original.index("library Helper {") + 1
+    assert (
+        f"Shard 1/2 (contracts/Vault.sol):\nfindings for Vault at line {vault}"
+        in result
+    )
+    assert (
+        f"Shard 2/2 (contracts/Helper.sol):\nfindings for Helper at line {helper}"
+        in result
+    )
+    assert pipeline.usage.input_tokens == 200
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    assert checkpoint.status == AuditStatusEnum.SUCCESS
+    assert checkpoint.result == result
+
+    await prompt.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_queues_until_capacity(fake_redis):
+    limiter = RateLimiter(name="test", rpm=1, tpm=1_000, redis=fake_redis)
+
+    await limiter.acquire(tokens=100)
+    assert await limiter._try_acquire(tokens=100) > 0
+
+    async def roll_window(seconds):
+        # the next window starts with a clean slate.
+        for key in await fake_redis.keys("llm_limit|test|requests|*"):
+            await fake_redis.delete(key)
+
+    with patch(
+        "app.utils.helpers.rate_limit.asyncio.sleep", AsyncMock(side_effect=roll_window)
+    ) as mock_sleep:
+        await limiter.acquire(tokens=100)
+
+    assert mock_sleep.call_count == 1
+    assert mock_sleep.call_args.args[0] <= limiter.WINDOW_SECONDS + 0.25
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_adapts_to_headers(fake_redis):
+    limiter = RateLimiter(name="test", rpm=1, tpm=1_000, redis=fake_redis)
+
+    await limiter.adapt(
+        {
+            "x-ratelimit-limit-requests": "5000",
+            "x-ratelimit-limit-tokens": "4000000",
+            "x-ratelimit-remaining-requests": "4999",
+            "x-ratelimit-remaining-tokens": "0",
+            "x-ratelimit-reset-tokens": "6m0s",
+        }
+    )
+
+    assert await limiter._get_limits() == (5000, 4_000_000)
+    # tokens are exhausted until they reset.
+    wait = await limiter._try_acquire(tokens=100)
+    assert 355 < wait <= 360
+
+
+async def _create_candidate_audit(tag: str):
+    contract = await Contract.create(
+        method=ContractMethodEnum.UPLOAD, raw_code=MULTI_FILE_SOURCE
+    )
+    audit = await Audit.create(contract=contract, audit_type=AuditTypeEnum.SECURITY)
+    audit = await Audit.get(id=audit.id).select_related("contract")
+    prompt = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag=tag,
+        version="0.1",
+        content="fake prompt",
+        is_active=False,
+    )
+    return contract, audit, prompt
+
+
+def _mock_completion(content: str):
+    return AsyncMock(
+        choices=[AsyncMock(message=AsyncMock(content=content))],
+        usage=AsyncMock(prompt_tokens=100, completion_tokens=10),
+    )
+
+
+@pytest.mark.anyio
+async def test_pipeline_retries_transient_failures():
+    contract, audit, prompt = await _create_candidate_audit("retried")
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=[APITimeoutError(request=request), _mock_completion("findings")]
+    )
+
+    with (
+        patch.object(LlmPipeline, "BACKOFF_BASE", 0),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+        result = await pipeline._generate_candidate(prompt)
+        await pipeline.checkpoints.flush()
+
+    assert result == "findings"
+    assert mock_llm_client.chat.completions.create.call_count == 2
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    assert checkpoint.status == AuditStatusEnum.SUCCESS
+    assert [(a["attempt"], a["status"]) for a in checkpoint.attempts] == [
+        (1, "failed"),
+        (2, "success"),
+    ]
+    assert checkpoint.attempts[0]["error"] == "APITimeoutError"
+
+    await prompt.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_stops_requeueing_rate_limited_calls():
+    contract, audit, prompt = await _create_candidate_audit("rate-limited")
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=RateLimitError("rate limited", response=response, body=None)
+    )
+
+    async def block(seconds):
+        await asyncio.sleep(0.01)
+
+    mock_limiter = MagicMock(acquire=AsyncMock(), block=AsyncMock(side_effect=block))
+
+    with (
+        patch.object(LlmPipeline, "MAX_REQUEUE_SECONDS", 0.05),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+        patch("app.api.pipeline.audit_generation.llm_limiter", mock_limiter),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+        result = await pipeline._generate_candidate(prompt)
+        await pipeline.checkpoints.flush()
+
+    assert result is None
+    assert pipeline.n_failed == 1
+    # requeued, but only until the deadline.
+    assert mock_limiter.block.await_count > 0
+    assert (
+        mock_llm_client.chat.completions.create.call_count
+        == mock_limiter.block.await_count + 1
+    )
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    assert checkpoint.status == AuditStatusEnum.FAILED
+
+    await prompt.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_hedges_slow_candidates():
+    contract, audit, prompt = await _create_candidate_audit("hedged")
+    step_latencies[prompt.tag].extend([0.01] * LlmPipeline.HEDGE_MIN_SAMPLES)
+
+    calls = 0
+
+    async def mock_chat_completions_create(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+            return _mock_completion("slow findings")
+        return _mock_completion("hedged findings")
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=mock_chat_completions_create
+    )
+
+    with (
+        patch.object(LlmPipeline, "HEDGE_MIN_DELAY", 0),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code, should_hedge=True)
+        result = await asyncio.wait_for(pipeline._generate_candidate(prompt), 5)
+        await pipeline.checkpoints.flush()
+
+    assert result == "hedged findings"
+    assert pipeline.usage.input_tokens == 100
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    attempts = {a["hedge"]: a["status"] for a in checkpoint.attempts}
+    assert attempts == {False: "cancelled", True: "success"}
+
+    step_latencies.pop(prompt.tag)
+    await prompt.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "n_queued, call_duration", [(0, 0.01), (1, 0.1)], ids=["queued", "backlog"]
+)
+async def test_pipeline_hedges_only_sent_requests(n_queued, call_duration):
+    contract, audit, prompt = await _create_candidate_audit("hedged-queued")
+    step_latencies[prompt.tag].extend([0.05] * LlmPipeline.HEDGE_MIN_SAMPLES)
+
+    async def acquire(tokens):
+        # queued for longer than the hedging threshold.
+        await asyncio.sleep(0.2)
+
+    async def mock_chat_completions_create(*args, **kwargs):
+        await asyncio.sleep(call_duration)
+        return _mock_completion("findings")
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=mock_chat_completions_create
+    )
+    mock_limiter = MagicMock(acquire=AsyncMock(side_effect=acquire), n_queued=n_queued)
+
+    with (
+        patch.object(LlmPipeline, "HEDGE_MIN_DELAY", 0),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+        patch("app.api.pipeline.audit_generation.llm_limiter", mock_limiter),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code, should_hedge=True)
+        result = await pipeline._generate_candidate(prompt)
+        await pipeline.checkpoints.flush()
+
+    # the threshold runs from when the call is sent, and calls aren't hedged while
+    # others are queued.
+    assert result == "findings"
+    assert mock_llm_client.chat.completions.create.call_count == 1
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    [attempt] = checkpoint.attempts
+    assert attempt["hedge"] is False
+    # time spent queued isn't counted.
+    assert call_duration <= attempt["latency"] < 0.2
+    assert call_duration <= step_latencies[prompt.tag][-1] < 0.2
+
+    step_latencies.pop(prompt.tag)
+    await prompt.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_cancels_sibling_shards_on_failure():
+    contract, audit, prompt = await _create_candidate_audit("sibling")
+
+    completed = []
+
+    async def mock_chat_completions_create(*args, **kwargs):
+        if "library Helper" in kwargs["messages"][1]["content"]:
+            raise ValueError("malformed request")
+        await asyncio.sleep(10)
+        completed.append(kwargs)
+        return _mock_completion("findings")
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=mock_chat_completions_create
+    )
+
+    with (
+        patch.object(LlmPipeline, "SHARD_TOKEN_BUDGET", 100),
+        patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client),
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+        result = await asyncio.wait_for(pipeline._generate_candidate(prompt), 5)
+        await pipeline.checkpoints.flush()
+
+    assert result is None
+    assert not completed
+    assert pipeline.usage.input_tokens == 0
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id)
+    assert checkpoint.status == AuditStatusEnum.FAILED
+    statuses = sorted(a["status"] for a in checkpoint.attempts)
+    assert statuses == ["cancelled", "failed"]
+
+    await prompt.delete()
+    await contract.delete()
+
+
+REPORT = (
+    '{"introduction": "", "scope": "", "conclusion": "", '
+    '"findings": {"critical": [], "high": [], "medium": [], "low": []}}'
+)
+
+REVISED_REPORT = (
+    '{"introduction": "", "scope": "", "conclusion": "", '
+    '"findings": {"critical": [], "high": [{"name": "late", "explanation": "", '
+    '"recommendation": "", "reference": ""}], "medium": [], "low": []}}'
+)
+
+
+async def _create_quorum_pipeline(
+    slow_delay: float, quorum: int = 2, deadline: float = 0, late_policy="discard"
+):
+    contract, audit, fast = await _create_candidate_audit("fast")
+    prompts = [fast]
+    for tag in ["fast", "slow"]:
+        prompts.append(
+            await Prompt.create(
+                audit_type=AuditTypeEnum.SECURITY,
+                tag=tag,
+                version="0.1",
+                content=f"{tag} prompt",
+                is_active=False,
+            )
+        )
+    reviewer = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="reviewer",
+        version="0.1",
+        content="reviewer prompt",
+        is_active=False,
+    )
+
+    async def mock_chat_completions_create(*args, **kwargs):
+        if kwargs["messages"][0]["content"] == "slow prompt":
+            await asyncio.sleep(slow_delay)
+            return _mock_completion("slow findings")
+        return _mock_completion("fast findings")
+
+    mock_llm_client = MagicMock()
+    mock_llm_client.chat.completions.create = AsyncMock(
+        side_effect=mock_chat_completions_create
+    )
+    mock_llm_client.beta.chat.completions.parse = AsyncMock(
+        side_effect=[_mock_completion(REPORT), _mock_completion(REVISED_REPORT)]
+    )
+
+    pipeline = LlmPipeline(
+        audit=audit,
+        input=contract.raw_code,
+        quorum=quorum,
+        quorum_deadline=deadline,
+        late_policy=late_policy,
+    )
+    pipeline.candidate_prompts = prompts
+    pipeline.reviewer_prompt = reviewer
+
+    return pipeline, mock_llm_client, [*prompts, reviewer, contract]
+
+
+@pytest.mark.anyio
+async def test_pipeline_quorum_discards_late_candidates():
+    pipeline, mock_llm_client, cleanup = await _create_quorum_pipeline(slow_delay=10)
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await asyncio.wait_for(pipeline.generate_candidates(), 5)
+        await pipeline.generate_report()
+
+    assert pipeline.n_discarded == 1
+    assert "Auditor #1 Findings" in pipeline.candidate_prompt
+    assert "Auditor #2 Findings" in pipeline.candidate_prompt
+    assert "Auditor #3 Findings" not in pipeline.candidate_prompt
+    assert mock_llm_client.beta.chat.completions.parse.call_count == 1
+
+    slow = await IntermediateResponse.get(audit_id=pipeline.audit.id, step="slow")
+    assert slow.status == AuditStatusEnum.FAILED
+
+    for obj in cleanup:
+        await obj.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_quorum_deadline_caps_wait():
+    # the quorum can't be met in time, the deadline bounds the wait instead.
+    pipeline, mock_llm_client, cleanup = await _create_quorum_pipeline(
+        slow_delay=10, quorum=3, deadline=0.1
+    )
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await asyncio.wait_for(pipeline.generate_candidates(), 5)
+
+    assert pipeline.n_discarded == 1
+    assert "Auditor #2 Findings" in pipeline.candidate_prompt
+    assert "Auditor #3 Findings" not in pipeline.candidate_prompt
+
+    for obj in cleanup:
+        await obj.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_quorum_rereviews_late_candidates():
+    pipeline, mock_llm_client, cleanup = await _create_quorum_pipeline(
+        slow_delay=0.1, late_policy="rereview"
+    )
+
+    with patch("app.api.pipeline.audit_generation.llm_client", mock_llm_client):
+        await pipeline.generate_candidates()
+        assert "Auditor #3 Findings" not in pipeline.candidate_prompt
+
+        # the first report is delivered without waiting on late candidates.
+        assert await pipeline.generate_report() == REPORT
+        assert not await Finding.filter(audit_id=pipeline.audit.id).exists()
+
+        assert await pipeline.rereview() == REVISED_REPORT
+
+    assert pipeline.n_discarded == 0
+
+    parse = mock_llm_client.beta.chat.completions.parse
+    assert parse.call_count == 2
+    rereview = parse.call_args.kwargs["messages"][1]["content"]
+    assert rereview.startswith(f"Prior Review:\n{REPORT}")
+    assert "Auditor #3 Findings:\nslow findings" in rereview
+    assert "Auditor #1 Findings" not in rereview
+
+    findings = await Finding.filter(audit_id=pipeline.audit.id)
+    assert [finding.name for finding in findings] == ["late"]
+
+    reviewer = await IntermediateResponse.get(
+        audit_id=pipeline.audit.id, step="reviewer"
+    )
+    assert reviewer.status == AuditStatusEnum.SUCCESS
+    assert reviewer.result == REVISED_REPORT
+
+    for obj in cleanup:
+        await obj.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_runs_against_fake_llm():
+    contract, audit, prompt = await _create_candidate_audit("offline")
+    reviewer = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="reviewer",
+        version="0.1",
+        content="reviewer prompt",
+        is_active=False,
+    )
+
+    with patch(
+        "app.api.pipeline.audit_generation.llm_client", FakeLlmClient(latency=0)
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+        pipeline.candidate_prompts = [prompt]
+        pipeline.reviewer_prompt = reviewer
+
+        await pipeline.generate_candidates()
+        report = await pipeline.generate_report()
+
+    assert report == DEFAULT_RECORDINGS["reviewer"][0]
+    assert (
+        "Auditor #1 Findings:\n1. Unchecked return value" in pipeline.candidate_prompt
+    )
+    assert pipeline.usage.input_tokens > 0
+
+    findings = await Finding.filter(audit_id=audit.id).order_by("name")
+    assert [finding.name for finding in findings] == [
+        "Reentrancy in withdraw",
+        "Unchecked transfer",
+    ]
+
+    await prompt.delete()
+    await reviewer.delete()
+    await contract.delete()
+
+
+@pytest.mark.anyio
+async def test_pipeline_resumes_from_checkpoints():
+    contract, audit, done = await _create_candidate_audit("done")
+    missing = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="missing",
+        version="0.1",
+        content="missing prompt",
+        is_active=False,
+    )
+    reviewer = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="reviewer",
+        version="0.1",
+        content="reviewer prompt",
+        is_active=False,
+    )
+
+    pipeline = LlmPipeline(audit=audit, input=contract.raw_code)
+    pipeline.candidate_prompts = [done, missing]
+    pipeline.reviewer_prompt = reviewer
+
+    # as left by the interrupted run.
+    await IntermediateResponse.create(
+        audit=audit,
+        prompt=done,
+        step=done.tag,
+        status=AuditStatusEnum.SUCCESS,
+        result="checkpointed findings",
+        cache_key=pipeline.candidate_cache_key(done),
+    )
+    await IntermediateResponse.create(
+        audit=audit,
+        prompt=missing,
+        step=missing.tag,
+        status=AuditStatusEnum.FAILED,
+    )
+    await Finding.create(
+        audit=audit, audit_type=AuditTypeEnum.SECURITY, level="high", name="stale"
+    )
+
+    llm_client = FakeLlmClient(latency=0)
+    with patch(
+        "app.api.pipeline.audit_generation.llm_client", llm_client
+    ), patch.object(llm_client, "complete", wraps=llm_client.complete) as complete:
+        await pipeline.resume()
+        await pipeline.generate_candidates()
+        await pipeline.generate_report()
+
+    # only the failed candidate and the reviewer ran again.
+    assert complete.call_count == 2
+    assert "checkpointed findings" in pipeline.candidate_prompt
+    findings = await Finding.filter(audit_id=audit.id)
+    assert "stale" not in [finding.name for finding in findings]
+
+    await done.delete()
+    await missing.delete()
+    await reviewer.delete()
+    await contract.delete()
+
+
+def test_fake_llm_latency_is_reproducible():
+    samples = [
+        [FakeLlmClient(seed=seed).sample_latency() for _ in range(5)]
+        for seed in [1, 1, 2]
+    ]
+    assert samples[0] == samples[1]
+    assert samples[0] != samples[2]
+
+
+@pytest.mark.anyio
+async def test_checkpoint_writer_coalesces_until_flushed():
+    contract, audit, prompt = await _create_candidate_audit("coalesced")
+    writer = CheckpointWriter(flush_interval=0.05)
+
+    def checkpoint(status: AuditStatusEnum, result: str | None = None):
+        return IntermediateResponse(
+            audit_id=audit.id,
+            prompt_id=prompt.id,
+            step=prompt.tag,
+            status=status,
+            result=result,
+        )
+
+    await writer.write(checkpoint(AuditStatusEnum.PROCESSING), durable=True)
+    stored = await IntermediateResponse.get(audit_id=audit.id)
+    assert stored.status == AuditStatusEnum.PROCESSING
+
+    await writer.write(checkpoint(AuditStatusEnum.FAILED))
+    await writer.write(checkpoint(AuditStatusEnum.SUCCESS, result="findings"))
+    stored = await IntermediateResponse.get(audit_id=audit.id)
+    assert stored.status == AuditStatusEnum.PROCESSING
+
+    # flushed within the interval, as a single upsert of the latest state.
+    await asyncio.sleep(0.1)
+    assert not writer.pending
+    stored = await IntermediateResponse.get(audit_id=audit.id)
+    assert stored.status == AuditStatusEnum.SUCCESS
+    assert stored.result == "findings"
+
+    await prompt.delete()
+    await contract.delete()
+
+
+def test_merge_findings_merges_near_duplicates():
+    def output(*findings):
+        return CandidateOutputStructure(
+            findings=[
+                CandidateFindingType(
+                    severity=severity, name=name, explanation=name, reference=ref
+                )
+                for severity, name, ref in findings
+            ]
+        )
+
+    merged = merge_findings(
+        {
+            1: output(
+                ("medium", "Reentrancy in withdraw", "line 14"),
+                ("low", "Owner could be immutable", "line 3"),
+            ),
+            2: output(
+                ("high", "Reentrancy in withdraw()", "lines 14-16"),
+                # same name, different code.
+                ("low", "Owner could be immutable", "line 40"),
+            ),
+        }
+    )
+
+    assert [(m["severity"], m["reference"], m["auditors"]) for m in merged] == [
+        ("high", "lines 14-16", [1, 2]),
+        ("low", "line 3", [1]),
+        ("low", "line 40", [2]),
+    ]
+
+
+@pytest.mark.anyio
+async def test_pipeline_reviews_structured_candidates():
+    contract, audit, prompt = await _create_candidate_audit("structured")
+    other = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="structured-2",
+        version="0.1",
+        content="fake prompt",
+        is_active=False,
+    )
+    reviewer = await Prompt.create(
+        audit_type=AuditTypeEnum.SECURITY,
+        tag="reviewer",
+        version="0.1",
+        content="reviewer prompt",
+        is_active=False,
+    )
+
+    with patch(
+        "app.api.pipeline.audit_generation.llm_client", FakeLlmClient(latency=0)
+    ):
+        pipeline = LlmPipeline(audit=audit, input=contract.raw_code, structured=True)
+        pipeline.candidate_prompts = [prompt, other]
+        pipeline.reviewer_prompt = reviewer
+
+        await pipeline.generate_candidates()
+        await pipeline.generate_report()
+
+    header, digest = pipeline.candidate_prompt.split("\n", 3)[2:]
+    assert header.startswith("Findings of auditors #1, #2")
+    findings = json.loads(digest)
+    # both candidates reported the reentrancy.
+    assert [(f["name"], f["auditors"]) for f in findings] == [
+        ("Reentrancy in withdraw", [1, 2]),
+        ("Unchecked transfer return value", [1]),
+    ]
+
+    checkpoint = await IntermediateResponse.get(audit_id=audit.id, step="structured")
+    assert CandidateOutputStructure.model_validate_json(checkpoint.result)
+    assert await Finding.filter(audit_id=audit.id).count() == 2
+
+    for obj in [prompt, other, reviewer, contract]:
+        await obj.delete()